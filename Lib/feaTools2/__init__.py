@@ -31,24 +31,108 @@ To Do:
 class FeaToolsError(Exception): pass
 
 
-def decompileBinaryToObject(pathOrFile, compress=True, excludeFeatures=None):
+def decompileBinaryToObject(pathOrFile, compress=True, excludeFeatures=None, cache=None, internPool=None, stats=None, processes=None):
+    """
+    cache may be a directory path or a feaTools2.cache.DiskCache.
+
+    internPool may be a feaTools2.interning.InternPool. The
+    lookups, subtables and classes that are the same as ones in
+    other tables in the pool are then shared with those tables.
+
+    stats may be a feaTools2.stats.DecompileStats. The time of
+    each phase and counts of the parsed objects are added to it.
+
+    processes may be a number of processes for parsing the
+    lookups of a font that is given as a path. This only helps
+    fonts with many or large lookups. See
+    feaTools2.parsers.binaryParser.parseLookupsInProcesses.
+    """
+    if stats is not None:
+        stats.startCounting()
+        try:
+            return _decompileBinaryToObject(pathOrFile, compress, excludeFeatures, cache, internPool, stats, processes)
+        finally:
+            stats.stopPhase()
+            stats.stopCounting()
+    return _decompileBinaryToObject(pathOrFile, compress, excludeFeatures, cache, internPool, stats, processes)
+
+
+def _decompileBinaryToObject(pathOrFile, compress, excludeFeatures, cache, internPool, stats, processes):
     from fontTools.ttLib import TTFont
     from feaTools2.objects import Tables
-    from feaTools2.parsers.binaryParser import parseTable
+    from feaTools2.parsers.binaryParser import parseTable, parseLookupsInProcesses
+    from feaTools2.cache import getMemoryCache
+    # look in the process cache
+    memoryCache = getMemoryCache()
+    if memoryCache is not None:
+        memoryKey = memoryCache.makeKey(pathOrFile, type="object", compress=compress, excludeFeatures=excludeFeatures)
+        tables = memoryCache.getTables(memoryKey)
+        if tables is not None:
+            if stats is not None:
+                stats.count("memoryCacheHits")
+            if internPool is not None:
+                internPool.internTables(tables)
+            return tables
     # load font
+    if stats is not None:
+        stats.startPhase("loadFont")
     closeFont = True
+    inProcesses = processes is not None and processes > 1 and isinstance(pathOrFile, basestring)
     if isinstance(pathOrFile, TTFont):
         font = pathOrFile
         closeFont = False
+    elif inProcesses:
+        # the lookups are only read by the processes
+        font = TTFont(pathOrFile, lazy=True)
     else:
         font = TTFont(pathOrFile)
+    # look in the cache
+    tables = None
+    if cache is not None:
+        from feaTools2.cache import DiskCache
+        if not isinstance(cache, DiskCache):
+            cache = DiskCache(cache)
+        if stats is not None:
+            stats.startPhase("diskCache")
+        cacheKey = cache.makeKey(font, compress=compress, excludeFeatures=excludeFeatures)
+        tables = cache.get(cacheKey)
+        if stats is not None and tables is not None:
+            stats.count("diskCacheHits")
     # decompile
-    tables = Tables()
-    if "GSUB" in font:
-        table = tables["GSUB"]
-        parseTable(table, font["GSUB"].table, "GSUB", excludeFeatures=excludeFeatures)
-        if compress:
-            table.compress()
+    if tables is None:
+        tables = Tables()
+        if "GSUB" in font:
+            table = tables["GSUB"]
+            if stats is not None:
+                # fontTools reads the table when it is first used
+                stats.startPhase("readGSUB")
+            gsub = font["GSUB"].table
+            parsedLookups = None
+            if inProcesses:
+                if stats is not None:
+                    stats.startPhase("parseLookups")
+                parsedLookups = parseLookupsInProcesses(pathOrFile, gsub, "GSUB", processes, excludeFeatures=excludeFeatures)
+            if stats is not None:
+                stats.startPhase("parseTable")
+            parseTable(table, gsub, "GSUB", excludeFeatures=excludeFeatures, parsedLookups=parsedLookups)
+            if stats is not None:
+                stats.stopPhase()
+                stats.countTable(table)
+            if compress:
+                table.compress(stats=stats)
+                if stats is not None:
+                    stats.countCompression(table)
+        if cache is not None:
+            if stats is not None:
+                stats.startPhase("diskCache")
+            cache.set(cacheKey, tables)
+    if memoryCache is not None:
+        memoryCache.setTables(memoryKey, tables)
+    # share objects with other tables
+    if internPool is not None:
+        if stats is not None:
+            stats.startPhase("intern")
+        internPool.internTables(tables)
     # close
     if closeFont:
         font.close()
@@ -56,14 +140,34 @@ def decompileBinaryToObject(pathOrFile, compress=True, excludeFeatures=None):
     return tables
 
 
-def decompileBinaryToFeaSyntax(pathOrFile, excludeFeatures=None):
+def decompileBinaryToFeaSyntax(pathOrFile, excludeFeatures=None, cache=None, stats=None, processes=None):
+    """
+    stats may be a feaTools2.stats.DecompileStats and processes
+    may be a number of processes, see decompileBinaryToObject.
+    """
     from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+    from feaTools2.cache import getMemoryCache
+    # look in the process cache
+    memoryCache = getMemoryCache()
+    if memoryCache is not None:
+        memoryKey = memoryCache.makeKey(pathOrFile, type="fea", excludeFeatures=excludeFeatures)
+        text = memoryCache.get(memoryKey)
+        if text is not None:
+            if stats is not None:
+                stats.count("memoryCacheHits")
+            return text
     # decompile
-    tables = decompileBinaryToObject(pathOrFile, excludeFeatures=excludeFeatures)
+    tables = decompileBinaryToObject(pathOrFile, excludeFeatures=excludeFeatures, cache=cache, stats=stats, processes=processes)
     # write
+    if stats is not None:
+        stats.startPhase("write")
     writer = FeaSyntaxWriter(filterRedundancies=True)
     tables["GSUB"].write(writer)
     tables["GPOS"].write(writer)
     text = writer.write()
+    if stats is not None:
+        stats.stopPhase()
+    if memoryCache is not None:
+        memoryCache.set(memoryKey, text)
     # done
     return text
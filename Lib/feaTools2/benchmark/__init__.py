@@ -0,0 +1,3 @@
+"""
+Benchmarks with synthetic fonts, see runner.
+"""
@@ -0,0 +1,3 @@
+from feaTools2.benchmark.runner import main
+
+main()
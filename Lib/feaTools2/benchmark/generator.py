@@ -0,0 +1,199 @@
+"""
+Synthetic fonts for benchmarking.
+
+The features are written as .fea text and compiled with the
+fontTools feaLib builder, so no external tools are needed.
+The same parameters and seed always make the same font.
+"""
+
+import random
+from cStringIO import StringIO
+
+
+scriptTags = ["latn", "cyrl", "grek", "armn", "geor", "hebr", "arab", "deva"]
+languageTags = ["TRK", "ROM", "MOL", "NLD", "PLK", "DEU", "FRA", "ESP", "CAT", "AZE"]
+
+defaultParameters = dict(
+    glyphCount=1000,
+    lookupCount=24,
+    scriptCount=2,
+    languageCount=3,
+    ligatureDepth=3,
+    contextualRuleCount=200,
+    classSize=20,
+    rulesPerLookup=50,
+    seed=0
+)
+
+sizes = dict(
+    small=dict(glyphCount=200, lookupCount=6, scriptCount=1, languageCount=2, contextualRuleCount=20, classSize=8, rulesPerLookup=20),
+    medium=dict(),
+    large=dict(glyphCount=3000, lookupCount=60, scriptCount=3, languageCount=4, ligatureDepth=4, contextualRuleCount=600, classSize=30, rulesPerLookup=150)
+)
+
+
+def getParameters(size="medium", **overrides):
+    parameters = dict(defaultParameters)
+    parameters.update(sizes[size])
+    parameters.update(overrides)
+    return parameters
+
+
+def makeFeatureText(glyphCount=1000, lookupCount=24, scriptCount=2, languageCount=3,
+        ligatureDepth=3, contextualRuleCount=200, classSize=20, rulesPerLookup=50, seed=0):
+    """
+    Make .fea text for a GSUB table. The lookups are single,
+    ligature and chaining contextual lookups in turn. Every
+    lookup is used by at least one feature and some are only
+    used by some of the languages. languageCount is the number
+    of languages per script, including the default language.
+    Ligatures have between 2 and ligatureDepth components.
+    """
+    generator = random.Random(seed)
+    glyphNames = makeGlyphOrder(glyphCount)[1:]
+    classSize = max(1, min(classSize, len(glyphNames) // 2))
+    ligatureDepth = max(2, ligatureDepth)
+    lines = []
+    # language systems
+    languageSystems = [("DFLT", "dflt")]
+    for scriptTag in scriptTags[:scriptCount]:
+        languageSystems.append((scriptTag, "dflt"))
+        for languageTag in languageTags[:languageCount - 1]:
+            languageSystems.append((scriptTag, languageTag))
+    for scriptTag, languageTag in languageSystems:
+        lines.append("languagesystem %s %s;" % (scriptTag, languageTag))
+    lines.append("")
+    # classes
+    classCount = max(2, lookupCount // 2)
+    classes = []
+    for index in range(classCount):
+        name = "@class%d" % index
+        members = generator.sample(glyphNames, classSize)
+        classes.append((name, members))
+        lines.append("%s = [%s];" % (name, " ".join(members)))
+    lines.append("")
+    # lookups
+    kinds = ["single", "ligature"]
+    if contextualRuleCount:
+        kinds.append("contextual")
+    lookupKinds = [kinds[index % len(kinds)] for index in range(max(lookupCount, len(kinds)))]
+    contextualLookupCount = lookupKinds.count("contextual")
+    singleLookups = []
+    lookupNames = []
+    for index, kind in enumerate(lookupKinds):
+        name = "%s%d" % (kind, index)
+        lookupNames.append(name)
+        lines.append("lookup %s {" % name)
+        if index % 5 == 4:
+            lines.append("    lookupflag IgnoreMarks;")
+        if kind == "single":
+            targets = _makeSingleRules(generator, glyphNames, classes, rulesPerLookup, lines)
+            singleLookups.append((name, targets))
+        elif kind == "ligature":
+            _makeLigatureRules(generator, glyphNames, ligatureDepth, rulesPerLookup, lines)
+        else:
+            ruleCount = contextualRuleCount // contextualLookupCount
+            if index == lookupKinds.index("contextual"):
+                ruleCount += contextualRuleCount % contextualLookupCount
+            _makeContextualRules(generator, classes, singleLookups, ruleCount, lines)
+        lines.append("} %s;" % name)
+        lines.append("")
+    # features
+    featureCount = max(1, len(lookupNames) // 3)
+    unused = list(lookupNames)
+    generator.shuffle(unused)
+    for index in range(featureCount):
+        tag = "ss%02d" % (index + 1)
+        lookups = [unused.pop() for i in range(min(2, len(unused)))]
+        if index == featureCount - 1:
+            lookups += unused
+        # global lookups are shared by features
+        lookups += generator.sample(lookupNames, min(2, len(lookupNames)))
+        lines.append("feature %s {" % tag)
+        for name in _unique(lookups):
+            lines.append("    lookup %s;" % name)
+        for scriptTag, languageTag in languageSystems[1:]:
+            if languageTag == "dflt" or generator.random() < 0.5:
+                continue
+            lines.append("    script %s;" % scriptTag)
+            lines.append("    language %s;" % languageTag)
+            lines.append("    lookup %s;" % generator.choice(lookupNames))
+        lines.append("} %s;" % tag)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _unique(items):
+    seen = set()
+    unique = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique
+
+
+def _makeSingleRules(generator, glyphNames, classes, ruleCount, lines):
+    targetClass, targetMembers = generator.choice(classes)
+    substitutionClass, substitutionMembers = generator.choice(classes)
+    lines.append("    sub %s by %s;" % (targetClass, substitutionClass))
+    targets = list(targetMembers)
+    used = set(targetMembers)
+    for glyphName in generator.sample(glyphNames, min(ruleCount, len(glyphNames))):
+        if glyphName in used:
+            continue
+        used.add(glyphName)
+        targets.append(glyphName)
+        lines.append("    sub %s by %s;" % (glyphName, generator.choice(glyphNames)))
+    return targets
+
+
+def _makeLigatureRules(generator, glyphNames, ligatureDepth, ruleCount, lines):
+    seen = set()
+    for index in range(ruleCount):
+        components = tuple(generator.sample(glyphNames, generator.randint(2, ligatureDepth)))
+        if components in seen:
+            continue
+        seen.add(components)
+        lines.append("    sub %s by %s;" % (" ".join(components), generator.choice(glyphNames)))
+
+
+def _makeContextualRules(generator, classes, singleLookups, ruleCount, lines):
+    for index in range(ruleCount):
+        lookupName, targets = generator.choice(singleLookups)
+        backtrack = generator.choice(classes)[0]
+        lookahead = generator.choice(classes)[0]
+        lines.append("    sub %s %s' lookup %s %s;" % (backtrack, generator.choice(targets), lookupName, lookahead))
+
+
+def makeGlyphOrder(glyphCount):
+    return [".notdef"] + ["g%05d" % index for index in range(glyphCount)]
+
+
+def makeFont(size="medium", **parameters):
+    """
+    Make a TTFont with a GSUB table made from the parameters.
+    The font is compiled and read back in so that it is the
+    same as a font read from a file.
+    """
+    from fontTools.ttLib import TTFont
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    parameters = getParameters(size, **parameters)
+    glyphOrder = makeGlyphOrder(parameters["glyphCount"])
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(glyphOrder)
+    builder.setupCharacterMap({0x20 : glyphOrder[1]})
+    glyph = TTGlyphPen(None).glyph()
+    builder.setupGlyf(dict([(glyphName, glyph) for glyphName in glyphOrder]))
+    builder.setupHorizontalMetrics(dict([(glyphName, (500, 0)) for glyphName in glyphOrder]))
+    builder.setupHorizontalHeader()
+    builder.setupNameTable(dict(familyName="Benchmark", styleName="Regular"))
+    builder.setupOS2()
+    builder.setupPost()
+    addOpenTypeFeaturesFromString(builder.font, makeFeatureText(**parameters))
+    stream = StringIO()
+    builder.save(stream)
+    stream.seek(0)
+    return TTFont(stream)
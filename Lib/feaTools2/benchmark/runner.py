@@ -0,0 +1,147 @@
+"""
+Time the stages of decompiling and writing a GSUB table.
+
+    python -m feaTools2.benchmark --size large --repeat 5 --output results.json
+
+Every repetition starts from a new parse of the same font.
+The times are in seconds.
+"""
+
+import sys
+import json
+import time
+import platform
+from optparse import OptionParser
+from feaTools2.benchmark.generator import sizes, getParameters, makeFont
+
+
+stageNames = [
+    "parseTable",
+    "_compressLookups",
+    "_compressClasses",
+    "FeaSyntaxWriter.write",
+    "DumpWriter.dump"
+]
+
+
+def runBenchmark(size="medium", repeat=3, font=None, **parameters):
+    """
+    Run the benchmark and return the results as a dict that
+    can be written as JSON. A font may be given instead of
+    the parameters of a synthetic font.
+    """
+    from fontTools import version as fontToolsVersion
+    from feaTools2.objects import Table
+    from feaTools2.parsers.binaryParser import parseTable
+    from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+    from feaTools2.writers.dumpWriter import DumpWriter
+    if font is None:
+        parameters = getParameters(size, **parameters)
+        start = time.time()
+        font = makeFont(**parameters)
+        buildTime = time.time() - start
+    else:
+        size = None
+        buildTime = None
+    # fontTools reads the table when it is first used
+    gsub = font["GSUB"].table
+    times = dict([(stageName, []) for stageName in stageNames])
+    for index in range(repeat):
+        table = Table()
+        table.tag = "GSUB"
+        start = time.time()
+        parseTable(table, gsub, "GSUB")
+        times["parseTable"].append(time.time() - start)
+        # the steps of Table.compress
+        start = time.time()
+        table._compressLookups()
+        times["_compressLookups"].append(time.time() - start)
+        start = time.time()
+        table._compressClasses()
+        times["_compressClasses"].append(time.time() - start)
+        table._compressed = True
+        table._clearDirty()
+        # writing includes walking the table
+        start = time.time()
+        writer = FeaSyntaxWriter()
+        table.write(writer)
+        writer.write()
+        times["FeaSyntaxWriter.write"].append(time.time() - start)
+        start = time.time()
+        writer = DumpWriter()
+        table.write(writer)
+        writer.dump()
+        times["DumpWriter.dump"].append(time.time() - start)
+    stages = {}
+    for stageName, stageTimes in times.items():
+        stages[stageName] = dict(
+            min=min(stageTimes),
+            mean=sum(stageTimes) / len(stageTimes),
+            max=max(stageTimes),
+            times=stageTimes
+        )
+    return dict(
+        size=size,
+        parameters=parameters,
+        repeat=repeat,
+        build=buildTime,
+        stages=stages,
+        table=_getTableCounts(table),
+        environment=dict(
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            platform=platform.platform(),
+            fontTools=fontToolsVersion
+        )
+    )
+
+
+def _getTableCounts(table):
+    from feaTools2.objects import Lookup
+    lookups = list(table.lookups)
+    languageCount = 0
+    for feature in table:
+        for script in feature.scripts:
+            for language in script.languages:
+                languageCount += 1
+                lookups += [lookup for lookup in language.lookups if isinstance(lookup, Lookup)]
+    return dict(
+        features=len(table),
+        globalLookups=len(table.lookups),
+        lookups=len(lookups),
+        languages=languageCount,
+        subtables=sum([len(lookup.subtables) for lookup in lookups]),
+        classes=len(table.classes) + sum([len(feature.classes) for feature in table])
+    )
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options] [font]")
+    parser.add_option("--size", default="medium", choices=sorted(sizes.keys()),
+        help="The size of the synthetic font: %s. The default is medium." % ", ".join(sorted(sizes.keys())))
+    parser.add_option("--repeat", type="int", default=3,
+        help="The number of times that each stage is run.")
+    parser.add_option("--output", default=None,
+        help="Write the JSON to a file instead of stdout.")
+    for name in sorted(getParameters()):
+        parser.add_option("--" + name, type="int", default=None)
+    options, arguments = parser.parse_args(args)
+    font = None
+    if arguments:
+        from fontTools.ttLib import TTFont
+        font = TTFont(arguments[0])
+    parameters = {}
+    for name in getParameters():
+        value = getattr(options, name)
+        if value is not None:
+            parameters[name] = value
+    results = runBenchmark(size=options.size, repeat=options.repeat, font=font, **parameters)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if options.output is None:
+        sys.stdout.write(text + "\n")
+    else:
+        f = open(options.output, "w")
+        try:
+            f.write(text + "\n")
+        finally:
+            f.close()
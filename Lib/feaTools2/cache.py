@@ -0,0 +1,265 @@
+"""
+Caches for decompiled Tables objects.
+"""
+
+import os
+import sys
+import zlib
+import errno
+import struct
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from feaTools2 import FeaToolsError
+from feaTools2.serialization import dumpsTables, loadsTables, dataFormatVersion
+
+
+class DiskCache(object):
+
+    """
+    A directory of decompiled Tables objects. The entries are
+    keyed by the GSUB and GPOS data in the font and the options
+    that were used for decompiling. The least recently used
+    entries are removed when the total size of the entries is
+    larger than maxSize bytes.
+
+    Entries are written to temporary files that are renamed into
+    place, so more than one process can use the same directory.
+    """
+
+    fileExtension = ".tables"
+
+    def __init__(self, directory, maxSize=256 * 1024 * 1024):
+        self.directory = directory
+        self.maxSize = maxSize
+        try:
+            os.makedirs(directory)
+        except OSError, error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def makeKey(self, font, **options):
+        digest = hashlib.sha1()
+        # the marshal format can change between python versions
+        digest.update("%d %d.%d" % (dataFormatVersion, sys.version_info[0], sys.version_info[1]))
+        _hashFontTables(font, digest)
+        digest.update(repr(_normalizeOptions(options)))
+        return digest.hexdigest()
+
+    def _getPath(self, key):
+        return os.path.join(self.directory, key + self.fileExtension)
+
+    def get(self, key):
+        path = self._getPath(key)
+        try:
+            f = open(path, "rb")
+            try:
+                data = f.read()
+            finally:
+                f.close()
+        except IOError:
+            return None
+        try:
+            tables = loadsTables(zlib.decompress(data))
+        except (zlib.error, EOFError, ValueError, TypeError, IndexError, FeaToolsError):
+            # a truncated or corrupt entry is a miss
+            self._remove(path)
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return tables
+
+    def set(self, key, tables):
+        data = zlib.compress(dumpsTables(tables), 1)
+        handle, tempPath = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            os.write(handle, data)
+        finally:
+            os.close(handle)
+        path = self._getPath(key)
+        try:
+            os.rename(tempPath, path)
+        except OSError:
+            # another process wrote the same entry
+            os.remove(tempPath)
+        self._evict()
+
+    def clear(self):
+        for fileName in os.listdir(self.directory):
+            if fileName.endswith(self.fileExtension):
+                self._remove(os.path.join(self.directory, fileName))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        totalSize = 0
+        for fileName in os.listdir(self.directory):
+            if not fileName.endswith(self.fileExtension):
+                continue
+            path = os.path.join(self.directory, fileName)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+            totalSize += info.st_size
+        if totalSize <= self.maxSize:
+            return
+        for modified, size, path in sorted(entries):
+            self._remove(path)
+            totalSize -= size
+            if totalSize <= self.maxSize:
+                break
+
+
+class MemoryCache(object):
+
+    """
+    A least recently used cache of serialized Tables objects and
+    .fea text. Entries are removed when there are more than
+    maxEntries or when their total size is larger than maxBytes.
+    The serialized form of an object is stored, so every hit gets
+    a new copy that can be changed without changing the cache.
+    """
+
+    def __init__(self, maxEntries=32, maxBytes=64 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        self._lock.acquire()
+        try:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries[key] = value
+                self.hits += 1
+            return value
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        if len(value) > self.maxBytes:
+            return
+        self._lock.acquire()
+        try:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while len(self._entries) > self.maxEntries or self._size > self.maxBytes:
+                key, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+                self.evictions += 1
+        finally:
+            self._lock.release()
+
+    def getTables(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        return loadsTables(data)
+
+    def setTables(self, key, tables):
+        self.set(key, dumpsTables(tables))
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._size = 0
+        finally:
+            self._lock.release()
+
+    def getStats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(self._entries),
+            bytes=self._size
+        )
+
+    def makeKey(self, pathOrFile, **options):
+        """
+        Paths are keyed by their location, modification time
+        and size. Fonts and file objects are keyed by a digest.
+        """
+        from fontTools.ttLib import TTFont
+        options = _normalizeOptions(options)
+        if isinstance(pathOrFile, basestring):
+            info = os.stat(pathOrFile)
+            return (os.path.abspath(pathOrFile), info.st_mtime, info.st_size, options)
+        digest = hashlib.sha1()
+        if isinstance(pathOrFile, TTFont):
+            _hashFontTables(pathOrFile, digest)
+        else:
+            position = pathOrFile.tell()
+            digest.update(pathOrFile.read())
+            pathOrFile.seek(position)
+        return (digest.hexdigest(), options)
+
+
+# ---------------------
+# Process Level Caching
+# ---------------------
+
+_memoryCache = None
+
+def enableMemoryCache(maxEntries=32, maxBytes=64 * 1024 * 1024):
+    """
+    Cache the results of decompileBinaryToObject and
+    decompileBinaryToFeaSyntax for this process.
+    """
+    global _memoryCache
+    _memoryCache = MemoryCache(maxEntries=maxEntries, maxBytes=maxBytes)
+    return _memoryCache
+
+def disableMemoryCache():
+    global _memoryCache
+    _memoryCache = None
+
+def getMemoryCache():
+    return _memoryCache
+
+
+# -------
+# Hashing
+# -------
+
+def _hashFontTables(font, digest):
+    for tag in ("GSUB", "GPOS"):
+        data = ""
+        if tag in font:
+            data = font.getTableData(tag)
+        digest.update(tag)
+        digest.update(struct.pack(">L", len(data)))
+        digest.update(data)
+
+def _normalizeOptions(options):
+    normalized = []
+    for name, value in sorted(options.items()):
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(value))
+        normalized.append((name, value))
+    return tuple(normalized)
@@ -0,0 +1,333 @@
+"""
+Decompile the features of many fonts.
+
+    featools2 fonts/ extra/*.otf --output-dir features --jobs 4
+
+Files, directories and glob patterns can be given. Directories
+are searched for fonts. Collections get one output file for each
+font in them, with the font number added to the name. The output
+is .fea syntax or, with --format dump, the DumpWriter format.
+
+Fonts are skipped when their output is up to date. The options
+that change the output are stored in a ".featools2" file next
+to the output. By default the output is up to date when it is
+newer than the font and was made with the same options. With
+--check hash the SHA-1 of the font is stored too and the output
+is up to date when the hash and the options are the same.
+--force decompiles every font.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+from optparse import OptionParser
+
+
+fontExtensions = [".otf", ".ttf", ".otc", ".ttc", ".woff", ".woff2"]
+collectionExtensions = [".otc", ".ttc"]
+outputExtensions = dict(fea=".fea", dump=".dump")
+manifestFileName = ".featools2"
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options] font|directory|pattern ...")
+    parser.add_option("-o", "--output-dir", dest="outputDirectory", default=None,
+        help="Write the output files to this directory. By default they are written next to the fonts.")
+    parser.add_option("-f", "--format", default="fea", choices=sorted(outputExtensions.keys()),
+        help="fea or dump. The default is fea.")
+    parser.add_option("-j", "--jobs", type="int", default=1,
+        help="The number of fonts to decompile at the same time.")
+    parser.add_option("--features", default=None,
+        help="Comma separated feature tags to include.")
+    parser.add_option("--exclude-features", dest="excludeFeatures", default=None,
+        help="Comma separated feature tags to exclude.")
+    parser.add_option("--scripts", default=None,
+        help="Comma separated script tags to include.")
+    parser.add_option("--check", default="mtime", choices=["mtime", "hash"],
+        help="How to find outputs that are up to date: mtime or hash. The default is mtime.")
+    parser.add_option("--force", action="store_true", default=False,
+        help="Decompile fonts that are up to date.")
+    parser.add_option("--cache", default=None,
+        help="A directory for a feaTools2.cache.DiskCache.")
+    parser.add_option("-q", "--quiet", action="store_true", default=False,
+        help="Only report errors.")
+    options, arguments = parser.parse_args(args)
+    if not arguments:
+        parser.error("No fonts were given.")
+    settings = dict(
+        format=options.format,
+        features=_splitTags(options.features),
+        excludeFeatures=_splitTags(options.excludeFeatures),
+        scripts=_splitTags(options.scripts),
+        cache=options.cache
+    )
+    # find the work
+    jobs = []
+    skipped = 0
+    manifests = _Manifests()
+    for path, relativePath in findFonts(arguments):
+        sourceHash = None
+        if options.check == "hash":
+            sourceHash = _hashFile(path)
+        for fontNumber, outputPath in _getOutputPaths(path, relativePath, options.outputDirectory, options.format):
+            if not options.force and _isUpToDate(path, outputPath, options.check, sourceHash, settings, manifests):
+                skipped += 1
+                continue
+            jobs.append((path, fontNumber, outputPath, settings, sourceHash))
+    # do the work
+    start = time.time()
+    failed = 0
+    for index, (path, fontNumber, outputPath, sourceHash, seconds, error) in enumerate(_run(jobs, options.jobs)):
+        if error is not None:
+            failed += 1
+            sys.stderr.write("[%d/%d] %s failed: %s\n" % (index + 1, len(jobs), _describeFont(path, fontNumber), error))
+            continue
+        manifests.set(outputPath, sourceHash, settings)
+        if not options.quiet:
+            sys.stderr.write("[%d/%d] %s -> %s (%.2fs)\n" % (index + 1, len(jobs), _describeFont(path, fontNumber), outputPath, seconds))
+    manifests.save()
+    if not options.quiet:
+        sys.stderr.write("%d decompiled, %d up to date, %d failed in %.2fs\n" % (len(jobs) - failed, skipped, failed, time.time() - start))
+    if failed:
+        return 1
+    return 0
+
+
+def _splitTags(text):
+    if text is None:
+        return None
+    return [tag.strip() for tag in text.split(",") if tag.strip()]
+
+
+def _describeFont(path, fontNumber):
+    if fontNumber is None:
+        return path
+    return "%s#%d" % (path, fontNumber)
+
+
+# -----
+# Fonts
+# -----
+
+def findFonts(arguments):
+    """
+    Get (path, relativePath) for the fonts in arguments. The
+    relative path of a font in a directory is relative to the
+    directory. Otherwise it is the file name.
+    """
+    found = []
+    seen = set()
+    for argument in arguments:
+        if os.path.isdir(argument):
+            for directory, directoryNames, fileNames in os.walk(argument):
+                directoryNames.sort()
+                for fileName in sorted(fileNames):
+                    if os.path.splitext(fileName)[1].lower() not in fontExtensions:
+                        continue
+                    path = os.path.join(directory, fileName)
+                    found.append((path, os.path.relpath(path, argument)))
+        elif os.path.exists(argument):
+            found.append((argument, os.path.basename(argument)))
+        else:
+            paths = sorted(glob.glob(argument))
+            if not paths:
+                raise SystemExit("No fonts match %s." % argument)
+            for path in paths:
+                if os.path.isfile(path):
+                    found.append((path, os.path.basename(path)))
+    fonts = []
+    for path, relativePath in found:
+        key = os.path.abspath(path)
+        if key in seen:
+            continue
+        seen.add(key)
+        fonts.append((path, relativePath))
+    return fonts
+
+
+def _getOutputPaths(path, relativePath, outputDirectory, format):
+    base = os.path.splitext(relativePath)[0]
+    if outputDirectory is None:
+        base = os.path.splitext(path)[0]
+    else:
+        base = os.path.join(outputDirectory, base)
+    extension = outputExtensions[format]
+    if os.path.splitext(path)[1].lower() not in collectionExtensions:
+        return [(None, base + extension)]
+    from fontTools.ttLib.sfnt import readTTCHeader
+    f = open(path, "rb")
+    try:
+        count = readTTCHeader(f).numFonts
+    finally:
+        f.close()
+    return [(fontNumber, "%s-%d%s" % (base, fontNumber, extension)) for fontNumber in range(count)]
+
+
+# ----------
+# Up to Date
+# ----------
+
+def _hashFile(path):
+    digest = hashlib.sha1()
+    f = open(path, "rb")
+    try:
+        while True:
+            data = f.read(1024 * 1024)
+            if not data:
+                break
+            digest.update(data)
+    finally:
+        f.close()
+    return digest.hexdigest()
+
+
+def _settingsKey(settings):
+    return repr(sorted([(key, value) for key, value in settings.items() if key != "cache"]))
+
+
+def _isUpToDate(path, outputPath, check, sourceHash, settings, manifests):
+    if not os.path.exists(outputPath):
+        return False
+    entry = manifests.get(outputPath)
+    if entry is None or entry[1] != _settingsKey(settings):
+        return False
+    if check == "mtime":
+        return os.path.getmtime(outputPath) >= os.path.getmtime(path)
+    return entry[0] == sourceHash
+
+
+class _Manifests(object):
+
+    """
+    The options and, with --check hash, the hashes of the
+    fonts that the outputs in each output directory were
+    made with.
+    """
+
+    def __init__(self):
+        self._manifests = {}
+        self._changed = set()
+
+    def _getManifest(self, directory):
+        if directory not in self._manifests:
+            manifest = {}
+            path = os.path.join(directory, manifestFileName)
+            if os.path.exists(path):
+                f = open(path, "r")
+                try:
+                    try:
+                        manifest = json.load(f)
+                    except ValueError:
+                        manifest = {}
+                finally:
+                    f.close()
+            self._manifests[directory] = manifest
+        return self._manifests[directory]
+
+    def get(self, outputPath):
+        directory, fileName = os.path.split(os.path.abspath(outputPath))
+        return self._getManifest(directory).get(fileName)
+
+    def set(self, outputPath, sourceHash, settings):
+        directory, fileName = os.path.split(os.path.abspath(outputPath))
+        self._getManifest(directory)[fileName] = [sourceHash, _settingsKey(settings)]
+        self._changed.add(directory)
+
+    def save(self):
+        for directory in sorted(self._changed):
+            f = open(os.path.join(directory, manifestFileName), "w")
+            try:
+                json.dump(self._manifests[directory], f, indent=1, sort_keys=True)
+            finally:
+                f.close()
+        self._changed = set()
+
+
+# ----------
+# Processing
+# ----------
+
+def _run(jobs, processes):
+    if processes <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _processFont(job)
+        return
+    from multiprocessing import Pool
+    pool = Pool(min(processes, len(jobs)))
+    try:
+        for result in pool.imap_unordered(_processFont, jobs):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def _processFont(job):
+    path, fontNumber, outputPath, settings, sourceHash = job
+    start = time.time()
+    try:
+        text = decompileFont(path, fontNumber, **settings)
+        directory = os.path.dirname(outputPath)
+        if directory and not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process made it
+                if not os.path.isdir(directory):
+                    raise
+        f = open(outputPath, "w")
+        try:
+            f.write(text)
+        finally:
+            f.close()
+    except Exception, error:
+        return path, fontNumber, outputPath, sourceHash, time.time() - start, "%s: %s" % (error.__class__.__name__, error)
+    return path, fontNumber, outputPath, sourceHash, time.time() - start, None
+
+
+def decompileFont(path, fontNumber=None, format="fea", features=None, excludeFeatures=None, scripts=None, cache=None):
+    """
+    Get the .fea or dump text for a font. features and scripts
+    are lists of the tags to include. excludeFeatures is a list
+    of the feature tags to leave out.
+    """
+    from fontTools.ttLib import TTFont
+    from feaTools2 import decompileBinaryToObject
+    from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+    from feaTools2.writers.dumpWriter import DumpWriter
+    if fontNumber is None:
+        font = TTFont(path)
+    else:
+        font = TTFont(path, fontNumber=fontNumber)
+    try:
+        excluded = set(excludeFeatures or [])
+        if features is not None and "GSUB" in font:
+            # the other features don't need to be parsed
+            featureList = font["GSUB"].table.FeatureList
+            if featureList is not None:
+                tags = set([record.FeatureTag for record in featureList.FeatureRecord])
+                excluded |= tags - set(features)
+        tables = decompileBinaryToObject(font, excludeFeatures=sorted(excluded), cache=cache)
+    finally:
+        font.close()
+    gsub = tables["GSUB"]
+    if scripts is not None:
+        gsub = gsub.subset(scripts=scripts)
+    if format == "dump":
+        writer = DumpWriter()
+        gsub.write(writer)
+        return writer.dump()
+    writer = FeaSyntaxWriter(filterRedundancies=True)
+    gsub.write(writer)
+    tables["GPOS"].write(writer)
+    return writer.write()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Structural differences between two Table objects.
+
+Features that are the same are skipped when the classes and
+global lookups of the tables are the same. The other features
+are resolved before they are compared. Lookup references are
+replaced by the lookups and class references are expanded, so
+lookups and classes that were only renamed are not reported.
+Every resolved language and lookup gets a digest that combines
+the digests of its children. The digests are only used to find
+differences quickly. Objects with the same digest are compared
+before they are skipped, since different content can have the
+same hash.
+
+Features are aligned by tag and languages by script and
+language tag. The lookups of a language include the lookups
+that it inherits, so tables that only differ in where the
+lookups are registered are equal. Lookups within a language are first aligned by
+digest. The remaining lookups are paired with the lookup that
+they share the most rules with and anything left after that is
+reported as added or removed.
+
+Rules are keyed by their type, context and input. Single,
+multiple and alternate substitutions are split into one rule
+per glyph so that the grouping of the glyphs into subtables
+and classes doesn't matter.
+"""
+
+from feaTools2.objects import _resolveSequence, findFeatureLookups, _findLocalLookups, _resolveLookupReference
+
+
+def diffTables(table1, table2):
+    tableDiff = TableDiff()
+    # when the classes and global lookups are the same,
+    # features that are the same don't need to be resolved
+    sameContext = _sameContext(table1, table2)
+    content1 = _TableContent(table1)
+    content2 = _TableContent(table2)
+    features1 = _groupFeatures(table1)
+    features2 = _groupFeatures(table2)
+    for tag, features in features1:
+        others = dict(features2).get(tag, [])
+        for index, feature in enumerate(features):
+            if index >= len(others):
+                tableDiff.removedFeatures.append(tag)
+                continue
+            other = others[index]
+            if sameContext and _sameFeatureObjects(feature, other):
+                continue
+            feature = content1.getFeature(feature)
+            other = content2.getFeature(other)
+            if _sameFeatures(feature, other):
+                continue
+            featureDiff = _diffFeatures(feature, other)
+            if featureDiff:
+                tableDiff.changedFeatures.append(featureDiff)
+    for tag, features in features2:
+        others = dict(features1).get(tag, [])
+        for index in range(len(others), len(features)):
+            tableDiff.addedFeatures.append(tag)
+    return tableDiff
+
+
+# -------
+# Results
+# -------
+
+class TableDiff(object):
+
+    def __init__(self):
+        self.addedFeatures = []
+        self.removedFeatures = []
+        self.changedFeatures = []
+
+    def __nonzero__(self):
+        return bool(self.addedFeatures or self.removedFeatures or self.changedFeatures)
+
+    def dump(self):
+        lines = []
+        for tag in self.addedFeatures:
+            lines.append("+ feature %s" % tag)
+        for tag in self.removedFeatures:
+            lines.append("- feature %s" % tag)
+        for featureDiff in self.changedFeatures:
+            featureDiff._dump(lines)
+        return "\n".join(lines)
+
+
+class FeatureDiff(object):
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.addedLanguages = []
+        self.removedLanguages = []
+        self.changedLanguages = []
+
+    def __nonzero__(self):
+        return bool(self.addedLanguages or self.removedLanguages or self.changedLanguages)
+
+    def _dump(self, lines):
+        lines.append("~ feature %s" % self.tag)
+        for scriptTag, languageTag in self.addedLanguages:
+            lines.append("  + language %s %s" % (scriptTag, languageTag))
+        for scriptTag, languageTag in self.removedLanguages:
+            lines.append("  - language %s %s" % (scriptTag, languageTag))
+        for languageDiff in self.changedLanguages:
+            languageDiff._dump(lines)
+
+
+class LanguageDiff(object):
+
+    def __init__(self, script, language):
+        self.script = script
+        self.language = language
+        self.reordered = False
+        self.addedLookups = []
+        self.removedLookups = []
+        self.changedLookups = []
+
+    def __nonzero__(self):
+        return bool(self.reordered or self.addedLookups or self.removedLookups or self.changedLookups)
+
+    def _dump(self, lines):
+        lines.append("  ~ language %s %s" % (self.script, self.language))
+        if self.reordered:
+            lines.append("    ~ lookup order")
+        for name in self.addedLookups:
+            lines.append("    + lookup %s" % name)
+        for name in self.removedLookups:
+            lines.append("    - lookup %s" % name)
+        for lookupDiff in self.changedLookups:
+            lookupDiff._dump(lines)
+
+
+class LookupDiff(object):
+
+    """
+    The rules are (key, value) tuples. changedRules
+    contains (key, oldValue, newValue) tuples.
+    """
+
+    def __init__(self, name1, name2):
+        self.name1 = name1
+        self.name2 = name2
+        self.flag = None
+        self.reordered = False
+        self.addedRules = []
+        self.removedRules = []
+        self.changedRules = []
+
+    def __nonzero__(self):
+        return bool(self.flag is not None or self.reordered or self.addedRules or self.removedRules or self.changedRules)
+
+    def _dump(self, lines):
+        lines.append("    ~ lookup %s -> %s" % (self.name1, self.name2))
+        if self.flag is not None:
+            lines.append("      ~ flag %r -> %r" % self.flag)
+        if self.reordered:
+            lines.append("      ~ rule order")
+        for key, value in self.addedRules:
+            lines.append("      + %s" % _formatRule(key, value))
+        for key, value in self.removedRules:
+            lines.append("      - %s" % _formatRule(key, value))
+        for key, oldValue, newValue in self.changedRules:
+            lines.append("      ~ %s" % _formatRule(key, oldValue))
+            lines.append("        %s" % _formatRule(key, newValue))
+
+
+# -------
+# Content
+# -------
+
+class _TableContent(object):
+
+    def __init__(self, table):
+        self.classes = table.classes
+        self.globalLookups = {}
+        for lookup in table.lookups:
+            self.globalLookups[lookup.name] = lookup
+        self._lookups = {}
+
+    def getFeature(self, feature):
+        classes = dict(self.classes)
+        classes.update(feature.classes)
+        # the table classes are the same for all features
+        # so the feature classes tell the class dicts apart
+        classesKey = tuple(sorted([(name, tuple(members)) for name, members in feature.classes.items()]))
+        return _FeatureContent(feature, classes, classesKey, self)
+
+    def getLookup(self, lookup, classes, classesKey):
+        # lookups that are referenced more than once are
+        # only resolved once for each set of classes
+        key = (id(lookup), classesKey)
+        content = self._lookups.get(key)
+        if content is None:
+            content = _LookupContent(lookup, classes)
+            self._lookups[key] = content
+        return content
+
+
+class _FeatureContent(object):
+
+    def __init__(self, feature, classes, classesKey, tableContent):
+        self.tag = feature.tag
+        localLookups = _findLocalLookups(feature, tableContent.globalLookups)
+        self.languages = []
+        for script in feature.scripts:
+            for language in script.languages:
+                lookups = []
+                for lookup in findFeatureLookups(feature, script.tag, language.tag):
+                    lookup = _resolveLookupReference(lookup, localLookups)
+                    lookups.append(tableContent.getLookup(lookup, classes, classesKey))
+                self.languages.append(_LanguageContent((script.tag, language.tag), lookups))
+        self.digest = hash((self.tag, tuple([language.digest for language in self.languages])))
+
+
+class _LanguageContent(object):
+
+    def __init__(self, key, lookups):
+        self.key = key
+        self.lookups = lookups
+        self.digest = hash((key, tuple([lookup.digest for lookup in lookups])))
+
+
+class _LookupContent(object):
+
+    def __init__(self, lookup, classes):
+        self.name = lookup.name
+        flag = lookup.flag
+        self.flag = (flag.rightToLeft, flag.ignoreBaseGlyphs, flag.ignoreLigatures, flag.ignoreMarks, flag.markAttachmentType)
+        self.rules = []
+        for subtable in lookup.subtables:
+            self.rules += _findRules(subtable, classes)
+        self.digest = hash((self.flag, tuple(self.rules)))
+        self._ruleMap = None
+
+    def getRuleMap(self):
+        # the first rule for a key is the one that is used
+        if self._ruleMap is None:
+            self._ruleMap = {}
+            for key, value in self.rules:
+                if key not in self._ruleMap:
+                    self._ruleMap[key] = value
+        return self._ruleMap
+
+
+# -----
+# Rules
+# -----
+
+def _findRules(subtable, classes):
+    rules = []
+    type = subtable.type
+    backtrack = _resolveSequence(subtable.backtrack, classes)
+    lookahead = _resolveSequence(subtable.lookahead, classes)
+    for index, targetSequence in enumerate(subtable.target):
+        if index < len(subtable.substitution):
+            substitution = _resolveSequence(subtable.substitution[index], classes)
+        else:
+            substitution = ()
+        target = _resolveSequence(targetSequence, classes)
+        # one rule per glyph
+        if type in (1, 2, 3) and len(target) == 1:
+            glyphs = target[0]
+            if type == 1:
+                replacements = substitution[0]
+                if len(replacements) == 1:
+                    replacements = replacements * len(glyphs)
+                values = [((glyphName,),) for glyphName in replacements]
+            else:
+                values = [substitution] * len(glyphs)
+            for glyphName, value in zip(glyphs, values):
+                rules.append(((type, backtrack, ((glyphName,),), lookahead), value))
+        else:
+            rules.append(((type, backtrack, target, lookahead), substitution))
+    return rules
+
+def _formatSequence(sequence):
+    text = []
+    for group in sequence:
+        if len(group) == 1:
+            text.append(group[0])
+        else:
+            text.append("[%s]" % " ".join(group))
+    return " ".join(text)
+
+def _formatRule(key, value):
+    type, backtrack, target, lookahead = key
+    text = _formatSequence(target)
+    if backtrack or lookahead:
+        text = " ".join([part for part in (_formatSequence(backtrack), "'%s'" % text, _formatSequence(lookahead)) if part])
+    if value:
+        text += " -> " + _formatSequence(value)
+    return "type %s: %s" % (type, text)
+
+
+# ---------
+# Alignment
+# ---------
+
+def _sameLookupObjects(lookups1, lookups2):
+    if len(lookups1) != len(lookups2):
+        return False
+    for lookup1, lookup2 in zip(lookups1, lookups2):
+        # Lookup.__eq__ doesn't compare the names
+        if lookup1.name != lookup2.name or lookup1 != lookup2:
+            return False
+    return True
+
+def _sameContext(table1, table2):
+    if table1.classes.digest() != table2.classes.digest():
+        return False
+    return table1.classes == table2.classes and _sameLookupObjects(table1.lookups, table2.lookups)
+
+def _sameFeatureObjects(feature1, feature2):
+    if feature1.digest() != feature2.digest():
+        return False
+    if feature1.tag != feature2.tag or feature1.classes != feature2.classes:
+        return False
+    languages1 = [(script.tag, language) for script in feature1.scripts for language in script.languages]
+    languages2 = [(script.tag, language) for script in feature2.scripts for language in script.languages]
+    if len(languages1) != len(languages2):
+        return False
+    for (scriptTag1, language1), (scriptTag2, language2) in zip(languages1, languages2):
+        if (scriptTag1, language1.tag, language1.includeDefault) != (scriptTag2, language2.tag, language2.includeDefault):
+            return False
+        if not _sameLookupObjects(language1.lookups, language2.lookups):
+            return False
+    return True
+
+def _sameFeatures(feature1, feature2):
+    if feature1.digest != feature2.digest or feature1.tag != feature2.tag:
+        return False
+    if len(feature1.languages) != len(feature2.languages):
+        return False
+    for language1, language2 in zip(feature1.languages, feature2.languages):
+        if not _sameLanguages(language1, language2):
+            return False
+    return True
+
+def _sameLanguages(language1, language2):
+    if language1.digest != language2.digest or language1.key != language2.key:
+        return False
+    if len(language1.lookups) != len(language2.lookups):
+        return False
+    for lookup1, lookup2 in zip(language1.lookups, language2.lookups):
+        if not _sameLookups(lookup1, lookup2):
+            return False
+    return True
+
+def _sameLookups(lookup1, lookup2):
+    if lookup1.digest != lookup2.digest:
+        return False
+    return lookup1.flag == lookup2.flag and lookup1.rules == lookup2.rules
+
+def _groupFeatures(features):
+    grouped = []
+    tags = {}
+    for feature in features:
+        if feature.tag not in tags:
+            tags[feature.tag] = []
+            grouped.append((feature.tag, tags[feature.tag]))
+        tags[feature.tag].append(feature)
+    return grouped
+
+def _diffFeatures(feature1, feature2):
+    featureDiff = FeatureDiff(feature1.tag)
+    languages1 = dict([(language.key, language) for language in feature1.languages])
+    languages2 = dict([(language.key, language) for language in feature2.languages])
+    for language in feature1.languages:
+        other = languages2.get(language.key)
+        if other is None:
+            featureDiff.removedLanguages.append(language.key)
+        elif not _sameLanguages(language, other):
+            languageDiff = _diffLanguages(language, other)
+            if languageDiff:
+                featureDiff.changedLanguages.append(languageDiff)
+    for language in feature2.languages:
+        if language.key not in languages1:
+            featureDiff.addedLanguages.append(language.key)
+    return featureDiff
+
+def _diffLanguages(language1, language2):
+    languageDiff = LanguageDiff(*language1.key)
+    # identical lookups
+    unmatched2 = {}
+    for lookup in language2.lookups:
+        if lookup.digest not in unmatched2:
+            unmatched2[lookup.digest] = []
+        unmatched2[lookup.digest].append(lookup)
+    unmatched1 = []
+    matched = []
+    for lookup in language1.lookups:
+        for candidate in unmatched2.get(lookup.digest, ()):
+            if _sameLookups(lookup, candidate):
+                unmatched2[lookup.digest].remove(candidate)
+                matched.append(candidate)
+                break
+        else:
+            unmatched1.append(lookup)
+    remaining2 = [lookup for lookup in language2.lookups if lookup in unmatched2.get(lookup.digest, ())]
+    if not unmatched1 and not remaining2:
+        if matched != language2.lookups:
+            languageDiff.reordered = True
+        return languageDiff
+    # pair the rest by shared rules
+    for lookup in unmatched1:
+        best = None
+        bestCount = 0
+        ruleMap = lookup.getRuleMap()
+        for other in remaining2:
+            count = len([key for key in other.getRuleMap() if key in ruleMap])
+            if count > bestCount:
+                best = other
+                bestCount = count
+        if best is None:
+            languageDiff.removedLookups.append(lookup.name)
+            continue
+        remaining2.remove(best)
+        lookupDiff = _diffLookups(lookup, best)
+        if lookupDiff:
+            languageDiff.changedLookups.append(lookupDiff)
+    for lookup in remaining2:
+        languageDiff.addedLookups.append(lookup.name)
+    return languageDiff
+
+def _diffLookups(lookup1, lookup2):
+    lookupDiff = LookupDiff(lookup1.name, lookup2.name)
+    if lookup1.flag != lookup2.flag:
+        lookupDiff.flag = (lookup1.flag, lookup2.flag)
+    rules1 = lookup1.getRuleMap()
+    rules2 = lookup2.getRuleMap()
+    seen = set()
+    for key, value in lookup1.rules:
+        if key in seen:
+            continue
+        seen.add(key)
+        if key not in rules2:
+            lookupDiff.removedRules.append((key, value))
+        elif rules2[key] != value:
+            lookupDiff.changedRules.append((key, value, rules2[key]))
+    seen = set()
+    for key, value in lookup2.rules:
+        if key in seen:
+            continue
+        seen.add(key)
+        if key not in rules1:
+            lookupDiff.addedRules.append((key, value))
+    if not lookupDiff and lookup1.rules != lookup2.rules:
+        lookupDiff.reordered = True
+    return lookupDiff
@@ -0,0 +1,224 @@
+"""
+Undo and redo for tables.
+
+A TableHistory keeps a list of frozen versions of a table, see
+Table.freeze. An edit makes a new version that shares all of
+the objects that didn't change with the previous version. Only
+the objects on the path from the table to the changed object
+are copied. Undo and redo move between the versions.
+
+The set methods take objects from the current version. Any
+edit can be made by changing a thawed copy of the current
+version and passing it to commit, but that copies every
+feature, script and language container.
+"""
+
+from feaTools2 import FeaToolsError
+from feaTools2.objects import Table, Feature, Script, Language, Lookup,\
+    GSUBSubtable, Sequence, Class, _NodeList
+
+
+class TableHistory(object):
+
+    def __init__(self, table, maxVersions=None):
+        self.maxVersions = maxVersions
+        self._versions = [table.freeze()]
+        self._index = 0
+
+    def _get_table(self):
+        return self._versions[self._index]
+
+    table = property(_get_table)
+
+    # versions
+
+    def commit(self, table):
+        """
+        Make a table the current version. The objects that it
+        shares with the current version are not copied.
+        """
+        return self._addVersion(table.freeze())
+
+    def canUndo(self):
+        return self._index > 0
+
+    def canRedo(self):
+        return self._index < len(self._versions) - 1
+
+    def undo(self):
+        if not self.canUndo():
+            raise FeaToolsError, "There is nothing to undo."
+        self._index -= 1
+        return self.table
+
+    def redo(self):
+        if not self.canRedo():
+            raise FeaToolsError, "There is nothing to redo."
+        self._index += 1
+        return self.table
+
+    def _addVersion(self, table):
+        # the versions that could be redone are replaced
+        del self._versions[self._index + 1:]
+        self._versions.append(table)
+        if self.maxVersions is not None and len(self._versions) > self.maxVersions:
+            del self._versions[:len(self._versions) - self.maxVersions]
+        self._index = len(self._versions) - 1
+        return table
+
+    # edits
+
+    def setScripts(self, feature, scripts):
+        new = _copyFeature(feature)
+        new.scripts = scripts
+        return self._replace(feature, new)
+
+    def setLookups(self, language, lookups):
+        new = _copyLanguage(language)
+        new.lookups = lookups
+        return self._replace(language, new)
+
+    def setSubtables(self, lookup, subtables):
+        new = _copyLookup(lookup)
+        new.subtables = subtables
+        return self._replace(lookup, new)
+
+    def setSequences(self, subtable, backtrack=None, lookahead=None, target=None, substitution=None):
+        """
+        Set any of the sequences of a subtable. The sequences
+        are lists of lists of glyph names and class references.
+        """
+        new = GSUBSubtable()
+        new.type = subtable.type
+        new._backtrack = subtable._backtrack
+        new._lookahead = subtable._lookahead
+        new._target = _NodeList(new, subtable._target, "target")
+        new._substitution = _NodeList(new, subtable._substitution, "substitution")
+        new._manipulationResultedInEmptySubstitution = subtable._manipulationResultedInEmptySubstitution
+        if backtrack is not None:
+            new.backtrack = _makeSequence(backtrack)
+        if lookahead is not None:
+            new.lookahead = _makeSequence(lookahead)
+        if target is not None:
+            new.target = [_makeSequence(sequence) for sequence in target]
+        if substitution is not None:
+            new.substitution = [_makeSequence(sequence) for sequence in substitution]
+        return self._replace(subtable, new)
+
+    def _replace(self, old, new):
+        new._share()
+        table = _pathCopy(self.table, old, new, _levels[old.__class__])
+        if table is self.table:
+            raise FeaToolsError, "The %s is not in the current version." % old.__class__.__name__
+        table.digest()
+        return self._addVersion(table)
+
+
+# ------------
+# Path Copying
+# ------------
+
+_levels = {
+    Feature : 1,
+    Script : 2,
+    Language : 3,
+    Lookup : 4,
+    GSUBSubtable : 5
+}
+
+def _pathCopy(node, old, new, level):
+    """
+    Get node with every occurrence of old replaced with new.
+    Only the objects that contain old are copied. node is
+    returned if it doesn't contain old.
+    """
+    if node is old:
+        return new
+    if isinstance(node, Table):
+        lookups = _pathCopyList(node.lookups, old, new, level)
+        features = _pathCopyList(node, old, new, level)
+        if lookups is None and features is None:
+            return node
+        copy = Table()
+        copy.tag = node.tag
+        copy.classes = node.classes
+        copy.lookups = _choose(lookups, node.lookups)
+        copy.extend(_choose(features, node))
+        copy._compressed = node._compressed
+    elif isinstance(node, Feature):
+        scripts = _pathCopyList(node.scripts, old, new, level)
+        if scripts is None:
+            return node
+        copy = _copyFeature(node)
+        copy.scripts = scripts
+    elif isinstance(node, Script):
+        languages = _pathCopyList(node.languages, old, new, level)
+        if languages is None:
+            return node
+        copy = Script()
+        copy.tag = node.tag
+        copy.languages = languages
+    elif isinstance(node, Language):
+        lookups = _pathCopyList(node.lookups, old, new, level)
+        if lookups is None:
+            return node
+        copy = _copyLanguage(node)
+        copy.lookups = lookups
+    elif isinstance(node, Lookup):
+        subtables = _pathCopyList(node.subtables, old, new, level)
+        if subtables is None:
+            return node
+        copy = _copyLookup(node)
+        copy.subtables = subtables
+    else:
+        return node
+    copy._shared = True
+    return copy
+
+def _pathCopyList(nodes, old, new, level):
+    # returns None if nothing changed
+    changed = False
+    copies = []
+    for node in nodes:
+        copy = node
+        if _levels.get(node.__class__, level) < level or node is old:
+            copy = _pathCopy(node, old, new, level)
+        if copy is not node:
+            changed = True
+        copies.append(copy)
+    if not changed:
+        return None
+    return copies
+
+def _choose(copies, nodes):
+    if copies is None:
+        return list(nodes)
+    return copies
+
+def _copyFeature(feature):
+    copy = Feature()
+    copy.tag = feature.tag
+    copy.classes = feature.classes
+    copy.scripts = feature.scripts
+    copy._dirty = True
+    return copy
+
+def _copyLanguage(language):
+    copy = Language()
+    copy.tag = language.tag
+    copy.includeDefault = language.includeDefault
+    copy.lookups = language.lookups
+    return copy
+
+def _copyLookup(lookup):
+    copy = Lookup()
+    copy.name = lookup.name
+    copy.flag = lookup.flag
+    copy.subtables = lookup.subtables
+    copy._dirty = True
+    return copy
+
+def _makeSequence(sequence):
+    if isinstance(sequence, Sequence):
+        return sequence
+    return Sequence([Class(group) for group in sequence])
@@ -0,0 +1,131 @@
+"""
+Share identical objects between tables.
+
+Fonts in a family usually have many lookups that are the
+same. An InternPool keeps one copy of each lookup, subtable,
+sequence and class that it has seen and replaces the objects
+in the tables that it is given with those copies. The shared
+objects don't change. The Table manipulation methods replace
+the shared objects that they need to change with private
+copies and Table.unshare replaces all of them. A shared
+object that is changed directly is replaced with a private
+copy in the table that it was taken from, see _Node in
+feaTools2.objects.
+
+The pool only holds weak references to the objects, so an
+object is removed from the pool when no table uses it.
+"""
+
+import threading
+import weakref
+from feaTools2.objects import Lookup, LookupReference, LookupFlag, GSUBSubtable,\
+    Sequence, Class, ClassReference, _NodeList
+
+
+class InternPool(object):
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def internTables(self, tables):
+        self.internTable(tables["GSUB"])
+        self.internTable(tables["GPOS"])
+
+    def internTable(self, table):
+        self._lock.acquire()
+        try:
+            for name, members in table.classes.items():
+                table.classes[name] = self._internClass(members)
+            table.lookups = [self._internLookup(lookup) for lookup in table.lookups]
+            for feature in table:
+                for name, members in feature.classes.items():
+                    feature.classes[name] = self._internClass(members)
+                for script in feature.scripts:
+                    for language in script.languages:
+                        language.lookups = [self._internLookup(lookup) for lookup in language.lookups]
+        finally:
+            self._lock.release()
+
+    # objects
+
+    def _get(self, key, node):
+        # the keys are digests so the content is compared
+        # too. an object that only has the digest of a
+        # shared object is kept private and returned as is.
+        shared = self._objects.get(key)
+        if shared is None or shared == node:
+            return shared
+        return node
+
+    def _add(self, key, node):
+        node._shared = True
+        node._owners = None
+        self._objects[key] = node
+        return node
+
+    def _internLookup(self, lookup):
+        if isinstance(lookup, LookupReference):
+            return lookup
+        # lookups are referenced by name
+        key = (Lookup, lookup.name, lookup.digest())
+        shared = self._get(key, lookup)
+        if shared is not None:
+            return shared
+        lookup.flag = self._internFlag(lookup.flag)
+        lookup.subtables = [self._internSubtable(subtable) for subtable in lookup.subtables]
+        lookup._dirty = False
+        return self._add(key, lookup)
+
+    def _internFlag(self, flag):
+        key = (LookupFlag, flag.digest())
+        shared = self._get(key, flag)
+        if shared is not None:
+            return shared
+        return self._add(key, flag)
+
+    def _internSubtable(self, subtable):
+        key = (GSUBSubtable, subtable.digest(), subtable._manipulationResultedInEmptySubstitution)
+        shared = self._get(key, subtable)
+        if shared is not None:
+            return shared
+        # the content doesn't change so the digest is still valid
+        subtable._backtrack = self._internSequence(subtable._backtrack)
+        subtable._lookahead = self._internSequence(subtable._lookahead)
+        subtable._target = _NodeList(subtable, [self._internSequence(sequence) for sequence in subtable._target], "target")
+        subtable._substitution = _NodeList(subtable, [self._internSequence(sequence) for sequence in subtable._substitution], "substitution")
+        subtable._dirty = False
+        return self._add(key, subtable)
+
+    def _internSequence(self, sequence):
+        key = (Sequence, sequence.digest())
+        shared = self._get(key, sequence)
+        if shared is not None:
+            return shared
+        sequence[:] = [self._internClass(group) for group in sequence]
+        return self._add(key, sequence)
+
+    def _internClass(self, group):
+        key = (Class, group.digest())
+        shared = self._get(key, group)
+        if shared is not None:
+            return shared
+        members = []
+        for member in group:
+            if isinstance(member, ClassReference):
+                member = self._internClassReference(member)
+            elif type(member) is str:
+                member = intern(member)
+            members.append(member)
+        group[:] = members
+        return self._add(key, group)
+
+    def _internClassReference(self, reference):
+        key = (ClassReference, reference.name)
+        shared = self._get(key, reference)
+        if shared is not None:
+            return shared
+        return self._add(key, reference)
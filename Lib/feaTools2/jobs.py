@@ -0,0 +1,377 @@
+"""
+Decompile, compress and write in the background.
+
+    job = submitDecompile(path, executor="process")
+    job.addDoneCallback(reactor.callFromThread, fontDecompiled)
+    ...
+    job = submitWrite(table, chunkCallback=sendChunk)
+    for chunk in job.iterChunks():
+        ...
+
+Each function starts the work in a new thread or, with
+executor="process", in a new process and returns a Job right
+away, so an event loop isn't blocked by the work. Jobs work like
+futures: result waits for the result, done callbacks are called
+when the job ends and cancel stops the job. Callbacks are called
+in the thread that runs or watches the job, so event loops should
+pass them on with their thread safe call, as above.
+
+A cancelled job stops at the next checkpoint. There are
+checkpoints before each feature is parsed and written, between
+the steps of compression and before each chunk of output.
+
+Process jobs get their input and send their results in the
+feaTools2.serialization format. They take a path, not a font,
+and return a new table instead of compressing the given one.
+"""
+
+import sys
+import Queue
+import threading
+from feaTools2 import FeaToolsError
+from feaTools2.stats import DecompileStats
+
+
+class JobCancelled(FeaToolsError): pass
+
+
+executors = ["thread", "process"]
+
+
+def submitDecompile(pathOrFile, compress=True, excludeFeatures=None, executor="thread"):
+    """
+    Decompile the GSUB table of a font. The result is a
+    feaTools2.objects.Tables object.
+    """
+    if executor == "process":
+        if not isinstance(pathOrFile, basestring):
+            raise FeaToolsError, "Process jobs need the path of a font."
+        return _submit(executor, _decompileInProcess, (pathOrFile, compress, excludeFeatures), decode=_loadTables)
+    return _submit(executor, _decompile, (pathOrFile, compress, excludeFeatures))
+
+def submitCompress(table, executor="thread"):
+    """
+    Compress a table. The result is the table, or
+    a compressed copy of it for process jobs.
+    """
+    if executor == "process":
+        return _submit(executor, _compressInProcess, (_dumpTable(table),), decode=_loadTable)
+    return _submit(executor, _compress, (table,))
+
+def submitWrite(table, filterRedundancies=True, chunkSize=65536, chunkCallback=None, executor="thread"):
+    """
+    Write a table as .fea text. The text is sent in chunks of
+    about chunkSize characters to chunkCallback or, when there
+    is no chunkCallback, to Job.iterChunks. The result is None.
+    """
+    if executor == "process":
+        table = _dumpTable(table)
+        function = _writeInProcess
+    else:
+        function = _write
+    return _submit(executor, function, (table, filterRedundancies, chunkSize), chunkCallback=chunkCallback)
+
+
+# ---
+# Job
+# ---
+
+class Job(object):
+
+    def __init__(self, cancelEvent, chunkCallback=None):
+        self._cancelEvent = cancelEvent
+        self._chunkCallback = chunkCallback
+        self._chunks = Queue.Queue()
+        self._doneEvent = threading.Event()
+        self._lock = threading.Lock()
+        self._doneCallbacks = []
+        self._result = None
+        self._error = None
+        self._cancelled = False
+
+    def cancel(self):
+        """
+        Ask the job to stop. Returns False if it has already ended.
+        """
+        if self.done():
+            return False
+        self._cancelEvent.set()
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        return self._doneEvent.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the job to end. Returns False if it
+        didn't end within timeout seconds.
+        """
+        return self._doneEvent.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+        Wait for the job to end and get its result. JobCancelled is
+        raised for a cancelled job and the error of a failed job is
+        raised again.
+        """
+        if not self.wait(timeout):
+            raise FeaToolsError, "The job did not end in %s seconds." % timeout
+        if self._cancelled:
+            raise JobCancelled, "The job was cancelled."
+        if self._error is not None:
+            errorType, error, traceback = self._error
+            raise errorType, error, traceback
+        return self._result
+
+    def addDoneCallback(self, callback, *args):
+        """
+        Call callback(*args + (job,)) when the job ends. It is
+        called right away if the job has already ended.
+        """
+        self._lock.acquire()
+        try:
+            if not self.done():
+                self._doneCallbacks.append((callback, args))
+                return
+        finally:
+            self._lock.release()
+        callback(*(args + (self,)))
+
+    def iterChunks(self, timeout=None):
+        """
+        Get the chunks of text as they are written. The errors
+        are raised as in result when the job has ended.
+        """
+        while True:
+            chunk = self._chunks.get(timeout=timeout)
+            if chunk is None:
+                break
+            yield chunk
+        self.result()
+
+    # worker side
+
+    def _addChunk(self, chunk):
+        if self._chunkCallback is not None:
+            self._chunkCallback(chunk)
+        else:
+            self._chunks.put(chunk)
+
+    def _finish(self, result=None, error=None, cancelled=False):
+        self._lock.acquire()
+        try:
+            if self.done():
+                return
+            self._result = result
+            self._error = error
+            self._cancelled = cancelled
+            self._chunks.put(None)
+            self._doneEvent.set()
+            callbacks = self._doneCallbacks
+            self._doneCallbacks = []
+        finally:
+            self._lock.release()
+        for callback, args in callbacks:
+            callback(*(args + (self,)))
+
+
+# -----------
+# Checkpoints
+# -----------
+
+class _Checkpoint(object):
+
+    def __init__(self, cancelEvent):
+        self.cancelEvent = cancelEvent
+
+    def check(self):
+        if self.cancelEvent.is_set():
+            raise JobCancelled, "The job was cancelled."
+
+
+class _CheckingWriter(object):
+
+    """
+    Checks for cancellation before each feature
+    is given to the wrapped writer.
+    """
+
+    def __init__(self, writer, checkpoint):
+        self._writer = writer
+        self._checkpoint = checkpoint
+
+    def addFeature(self, name):
+        self._checkpoint.check()
+        return self._writer.addFeature(name)
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+
+class _CheckingStats(DecompileStats):
+
+    """
+    Checks for cancellation at the start
+    of each step of compression.
+    """
+
+    def __init__(self, checkpoint):
+        super(_CheckingStats, self).__init__()
+        self._checkpoint = checkpoint
+
+    def startPhase(self, name):
+        self._checkpoint.check()
+        super(_CheckingStats, self).startPhase(name)
+
+
+# ----
+# Work
+# ----
+
+# Each function gets a _Checkpoint, a function that
+# sends a chunk of text and the arguments of the job.
+
+def _decompile(checkpoint, sendChunk, pathOrFile, compress, excludeFeatures):
+    from fontTools.ttLib import TTFont
+    from feaTools2.objects import Tables
+    from feaTools2.parsers.binaryParser import parseTable
+    closeFont = False
+    font = pathOrFile
+    if not isinstance(font, TTFont):
+        font = TTFont(pathOrFile)
+        closeFont = True
+    try:
+        tables = Tables()
+        if "GSUB" in font:
+            table = tables["GSUB"]
+            parseTable(_CheckingWriter(table, checkpoint), font["GSUB"].table, "GSUB", excludeFeatures=excludeFeatures)
+            if compress:
+                table.compress(stats=_CheckingStats(checkpoint))
+    finally:
+        if closeFont:
+            font.close()
+    return tables
+
+def _compress(checkpoint, sendChunk, table):
+    table.compress(stats=_CheckingStats(checkpoint))
+    return table
+
+def _write(checkpoint, sendChunk, table, filterRedundancies, chunkSize):
+    from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+    writer = FeaSyntaxWriter(filterRedundancies=filterRedundancies)
+    table.write(_CheckingWriter(writer, checkpoint))
+    for chunk in writer.iterWrite(chunkSize):
+        checkpoint.check()
+        sendChunk(chunk)
+
+def _decompileInProcess(checkpoint, sendChunk, path, compress, excludeFeatures):
+    from feaTools2.serialization import dumpsTables
+    return dumpsTables(_decompile(checkpoint, sendChunk, path, compress, excludeFeatures))
+
+def _compressInProcess(checkpoint, sendChunk, data):
+    return _dumpTable(_compress(checkpoint, sendChunk, _loadTable(data)))
+
+def _writeInProcess(checkpoint, sendChunk, data, filterRedundancies, chunkSize):
+    return _write(checkpoint, sendChunk, _loadTable(data), filterRedundancies, chunkSize)
+
+
+def _dumpTable(table):
+    from feaTools2.serialization import dumpsTable
+    return dumpsTable(table)
+
+def _loadTable(data):
+    from feaTools2.serialization import loadsTable
+    return loadsTable(data)
+
+def _loadTables(data):
+    from feaTools2.serialization import loadsTables
+    return loadsTables(data)
+
+
+# -------
+# Running
+# -------
+
+def _submit(executor, function, args, decode=None, chunkCallback=None):
+    if executor not in executors:
+        raise FeaToolsError, "Unknown executor %s." % executor
+    if executor == "process":
+        import multiprocessing
+        job = Job(multiprocessing.Event(), chunkCallback)
+        messages = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_runInProcess, args=(function, args, messages, job._cancelEvent))
+        process.daemon = True
+        process.start()
+        target = _watchProcess
+        args = (job, process, messages, decode)
+    else:
+        job = Job(threading.Event(), chunkCallback)
+        target = _runInThread
+        args = (job, function, args)
+    thread = threading.Thread(target=target, args=args, name="feaTools2 job")
+    thread.daemon = True
+    thread.start()
+    return job
+
+def _runInThread(job, function, args):
+    checkpoint = _Checkpoint(job._cancelEvent)
+    try:
+        result = function(checkpoint, job._addChunk, *args)
+    except JobCancelled:
+        job._finish(cancelled=True)
+    except Exception:
+        job._finish(error=sys.exc_info())
+    else:
+        job._finish(result)
+
+def _runInProcess(function, args, messages, cancelEvent):
+    checkpoint = _Checkpoint(cancelEvent)
+    def sendChunk(chunk):
+        messages.put(("chunk", chunk))
+    try:
+        result = function(checkpoint, sendChunk, *args)
+    except JobCancelled:
+        messages.put(("cancelled", None))
+    except Exception, error:
+        messages.put(("error", "%s: %s" % (error.__class__.__name__, error)))
+    else:
+        messages.put(("result", result))
+
+def _watchProcess(job, process, messages, decode):
+    outcome = {}
+    try:
+        while True:
+            try:
+                kind, value = messages.get(timeout=0.1)
+            except Queue.Empty:
+                if process.is_alive():
+                    continue
+                # the last message may still be on its way
+                try:
+                    kind, value = messages.get(timeout=1)
+                except Queue.Empty:
+                    raise FeaToolsError, "The job's process ended with exit code %s." % process.exitcode
+            if kind == "chunk":
+                job._addChunk(value)
+                continue
+            if kind == "cancelled":
+                outcome = dict(cancelled=True)
+            elif kind == "error":
+                raise FeaToolsError, value
+            elif decode is not None:
+                outcome = dict(result=decode(value))
+            else:
+                outcome = dict(result=value)
+            break
+    except Exception:
+        outcome = dict(error=sys.exc_info())
+        # it may be waiting to send more chunks
+        if process.is_alive():
+            process.terminate()
+    # the process has sent everything so it
+    # is joined before anyone is told
+    process.join()
+    job._finish(**outcome)
@@ -0,0 +1,229 @@
+"""
+Approximate memory use of a Table.
+
+The sizes come from sys.getsizeof, so they are the sizes of the
+objects themselves and not of the allocator's bookkeeping. Each
+object is counted once, no matter how many times it is used.
+The instance dicts of the objects are reported as "__dict__",
+the strings in classes as "glyph names" and the owner lists and
+cached digests of the content digests as "owners" and "digests".
+Weak references are counted but not followed.
+
+The size of a feature or a lookup includes everything that can
+be reached from it, so objects that are shared by features or
+lookups are included in the size of each of them.
+
+Duplicates are objects that are equal to an object that has
+already been seen but are not the same object. Interning, see
+feaTools2.interning, removes duplicate classes, sequences and
+subtables. Compression removes duplicate lookups and classes
+within a table.
+"""
+
+import sys
+import types
+import weakref
+from collections import OrderedDict
+from feaTools2.objects import LookupReference, GSUBSubtable, Sequence, Class, ClassReference
+
+
+def measureTable(table):
+    report = MemoryReport()
+    walker = _Walker(report)
+    walker.walk(table)
+    report.total = walker.total
+    for feature in table:
+        report.features.append((feature.tag, _measure(feature)))
+    for lookup in table.lookups:
+        report.lookups.append((lookup.name, _measure(lookup)))
+    for feature in table:
+        for script in feature.scripts:
+            for language in script.languages:
+                for index, lookup in enumerate(language.lookups):
+                    if isinstance(lookup, LookupReference):
+                        continue
+                    name = "%s/%s/%s/%d" % (feature.tag, script.tag, language.tag or "dflt", index)
+                    report.lookups.append((name, _measure(lookup)))
+    return report
+
+
+def _measure(node):
+    walker = _Walker(None)
+    walker.walk(node)
+    return walker.total
+
+
+# -------
+# Results
+# -------
+
+class MemoryReport(object):
+
+    """
+    total is the size of the table in bytes. types maps type
+    names to (count, bytes). features and lookups are lists of
+    (name, bytes). Inline lookups are named by their position:
+    feature/script/language/index. duplicates maps "classes",
+    "sequences", "subtables" and "glyph names" to (duplicates,
+    bytes) where bytes is the size of the duplicates.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.types = {}
+        self.features = []
+        self.lookups = []
+        self.duplicates = OrderedDict()
+        for name in ("classes", "sequences", "subtables", "glyph names"):
+            self.duplicates[name] = (0, 0)
+        self.glyphNameReferences = 0
+
+    def dump(self):
+        lines = ["Total: %d bytes" % self.total]
+        lines.append("")
+        lines.append("Types:")
+        for name, (count, size) in sorted(self.types.items(), key=lambda item: -item[1][1]):
+            lines.append("    %s: %d objects, %d bytes" % (name, count, size))
+        lines.append("")
+        lines.append("Features:")
+        for tag, size in self.features:
+            lines.append("    %s: %d bytes" % (tag, size))
+        lines.append("")
+        lines.append("Lookups:")
+        for name, size in sorted(self.lookups, key=lambda item: -item[1]):
+            lines.append("    %s: %d bytes" % (name, size))
+        lines.append("")
+        lines.append("Duplicates:")
+        for name, (count, size) in self.duplicates.items():
+            lines.append("    %s: %d duplicates, %d bytes" % (name, count, size))
+        lines.append("    glyph name references: %d" % self.glyphNameReferences)
+        return "\n".join(lines)
+
+
+# -------
+# Walking
+# -------
+
+_notFollowed = (types.FunctionType, types.MethodType, types.BuiltinFunctionType, types.ModuleType, type)
+
+class _Walker(object):
+
+    def __init__(self, report):
+        self.report = report
+        self.total = 0
+        self._seen = set()
+        # content key -> size for the duplicate counts
+        self._keys = dict(classes={}, sequences={}, subtables={})
+        self._glyphNames = {}
+
+    def walk(self, obj):
+        # the stack avoids recursion limits on big tables
+        stack = [(obj, None)]
+        while stack:
+            obj, typeName = stack.pop()
+            if obj is None or isinstance(obj, _notFollowed):
+                continue
+            if id(obj) in self._seen:
+                if typeName == "glyph names" and self.report is not None:
+                    self.report.glyphNameReferences += 1
+                continue
+            self._seen.add(id(obj))
+            if typeName is None:
+                typeName = obj.__class__.__name__
+            size = sys.getsizeof(obj)
+            self._add(typeName, size)
+            if isinstance(obj, basestring):
+                if typeName == "glyph names" and self.report is not None:
+                    self._addGlyphName(obj, size)
+                continue
+            if isinstance(obj, weakref.ref):
+                continue
+            if self.report is not None:
+                self._addDuplicateKey(obj, size)
+            self._addChildren(obj, stack)
+
+    def _addChildren(self, obj, stack):
+        if isinstance(obj, Class):
+            for member in obj:
+                if isinstance(member, basestring):
+                    stack.append((member, "glyph names"))
+                else:
+                    stack.append((member, None))
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            for item in obj:
+                stack.append((item, None))
+        elif isinstance(obj, dict):
+            for key, value in obj.items():
+                stack.append((key, None))
+                stack.append((value, None))
+        for name in getattr(obj.__class__, "__slots__", ()):
+            # lists of nodes point back to the node
+            if name in ("__weakref__", "_owner"):
+                continue
+            value = getattr(obj, name, None)
+            if name == "_owners":
+                stack.append((value, "owners"))
+            elif name == "_digest":
+                stack.append((value, "digests"))
+            else:
+                stack.append((value, None))
+        attributes = getattr(obj, "__dict__", None)
+        if attributes is not None and not isinstance(obj, type):
+            if id(attributes) not in self._seen:
+                self._seen.add(id(attributes))
+                self._add("__dict__", sys.getsizeof(attributes))
+            for name, value in attributes.items():
+                if name == "_owners":
+                    stack.append((value, "owners"))
+                elif name == "_digest":
+                    stack.append((value, "digests"))
+                else:
+                    stack.append((value, None))
+
+    def _add(self, typeName, size):
+        self.total += size
+        if self.report is not None:
+            count, total = self.report.types.get(typeName, (0, 0))
+            self.report.types[typeName] = (count + 1, total + size)
+
+    # duplicates
+
+    def _addDuplicateKey(self, obj, size):
+        if isinstance(obj, Class):
+            name = "classes"
+        elif isinstance(obj, Sequence):
+            name = "sequences"
+        elif isinstance(obj, GSUBSubtable):
+            name = "subtables"
+        else:
+            return
+        key = _contentKey(obj)
+        keys = self._keys[name]
+        if key in keys:
+            count, total = self.report.duplicates[name]
+            self.report.duplicates[name] = (count + 1, total + size)
+        else:
+            keys[key] = size
+
+    def _addGlyphName(self, glyphName, size):
+        self.report.glyphNameReferences += 1
+        if glyphName in self._glyphNames:
+            count, total = self.report.duplicates["glyph names"]
+            self.report.duplicates["glyph names"] = (count + 1, total + size)
+        else:
+            self._glyphNames[glyphName] = size
+
+
+def _contentKey(obj):
+    # a key for comparing content that doesn't
+    # compute and cache digests while measuring
+    if isinstance(obj, ClassReference):
+        return ("@", obj.name)
+    if isinstance(obj, basestring):
+        return obj
+    if isinstance(obj, GSUBSubtable):
+        return (obj.type, _contentKey(obj.backtrack), _contentKey(obj.lookahead),
+            tuple([_contentKey(sequence) for sequence in obj.target]),
+            tuple([_contentKey(sequence) for sequence in obj.substitution]),
+            obj._manipulationResultedInEmptySubstitution)
+    return tuple([_contentKey(item) for item in obj])
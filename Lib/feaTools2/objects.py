@@ -1,6 +1,404 @@
+import time
+import weakref
 from feaTools2 import FeaToolsError
 
 
+# -----
+# Nodes
+# -----
+
+class _Node(object):
+
+    """
+    Base class for the objects that have a content digest.
+
+    The digest is cached until the object or anything in it
+    changes. When an object computes its digest it registers
+    itself with its children, using weak references, so that
+    a change in a child clears the cached digests all the way
+    up to the table. Setting a public attribute counts as a
+    change. Attributes named in _listAttributes are stored as
+    lists that report their changes.
+
+    Shared objects are used by more than one table, see
+    feaTools2.interning. They don't change. The methods that
+    change the objects in a table replace the shared objects
+    that they need to change with private copies. A shared
+    object that is changed directly is replaced with a private
+    copy in the list or the classes that it was last taken
+    from, and the change, and later changes to the object,
+    are made to the copy. Shared objects that contain it are
+    replaced the same way. The objects of a frozen table can't
+    be changed.
+
+    The owners are also used to find the observers of a
+    change, see _Observable.
+    """
+
+    __slots__ = ()
+
+    _digest = None
+    _owners = None
+    _shared = False
+    _observers = None
+    _listAttributes = ()
+
+    def __setattr__(self, name, value):
+        if name[0] == "_":
+            object.__setattr__(self, name, value)
+            return
+        if self._shared:
+            copy = _privateCopy(self)
+            if copy is None:
+                _raiseSharedError(self)
+            setattr(copy, name, value)
+            return
+        if name in self._listAttributes:
+            value = _NodeList(self, value, name)
+        object.__setattr__(self, name, value)
+        if self._digest is not None:
+            self._invalidate()
+        if _observedCount:
+            _postChange(self, name)
+
+    def digest(self):
+        digest = self._digest
+        if digest is None:
+            digest = self._digest = self._computeDigest()
+        return digest
+
+    def _computeDigest(self):
+        raise NotImplementedError
+
+    def _share(self):
+        self._shared = True
+
+    def _childDigest(self, child):
+        if isinstance(child, _Node):
+            # shared objects don't change
+            if not child._shared:
+                child._addOwner(self)
+            return child.digest()
+        if isinstance(child, list):
+            return hash(tuple([self._childDigest(item) for item in child]))
+        return hash(child)
+
+    def _addOwner(self, owner):
+        owners = self._owners
+        if owners is None:
+            self._owners = [weakref.ref(owner)]
+            return
+        for reference in owners:
+            if reference() is owner:
+                return
+        owners.append(weakref.ref(owner))
+
+    def _invalidate(self):
+        # the digests of the owners are computed from
+        # this digest so they can't be set if this isn't
+        if self._digest is None:
+            return
+        self._digest = None
+        owners = self._owners
+        if owners:
+            live = []
+            for reference in owners:
+                owner = reference()
+                if owner is not None:
+                    owner._invalidate()
+                    live.append(reference)
+            self._owners = live
+
+
+class _NotifyingList(object):
+
+    """
+    List methods that report changes to a node.
+    """
+
+    __slots__ = ()
+
+    def _getNode(self):
+        return self
+
+    def _getName(self):
+        return None
+
+    def _willChange(self):
+        # returns the list that is changed, which is
+        # in a private copy if the node is shared
+        node = self._getNode()
+        if node._shared:
+            copy = _privateCopy(node)
+            if copy is None:
+                _raiseSharedError(node)
+            if node is self:
+                target = copy
+            else:
+                target = getattr(copy, self._getName())
+            return target._willChange()
+        if node._digest is not None:
+            node._invalidate()
+        return self
+
+    def _didChange(self):
+        if _observedCount:
+            _postChange(self._getNode(), self._getName())
+
+    def append(self, item):
+        target = self._willChange()
+        list.append(target, item)
+        target._didChange()
+
+    def extend(self, items):
+        target = self._willChange()
+        list.extend(target, items)
+        target._didChange()
+
+    def insert(self, index, item):
+        target = self._willChange()
+        list.insert(target, index, item)
+        target._didChange()
+
+    def remove(self, item):
+        target = self._willChange()
+        list.remove(target, item)
+        target._didChange()
+
+    def pop(self, *args):
+        target = self._willChange()
+        item = list.pop(target, *args)
+        target._didChange()
+        return item
+
+    def sort(self, *args, **kwargs):
+        target = self._willChange()
+        list.sort(target, *args, **kwargs)
+        target._didChange()
+
+    def reverse(self):
+        target = self._willChange()
+        list.reverse(target)
+        target._didChange()
+
+    def __setitem__(self, index, value):
+        target = self._willChange()
+        list.__setitem__(target, index, value)
+        target._didChange()
+
+    def __delitem__(self, index):
+        target = self._willChange()
+        list.__delitem__(target, index)
+        target._didChange()
+
+    def __setslice__(self, start, end, items):
+        target = self._willChange()
+        list.__setslice__(target, start, end, items)
+        target._didChange()
+
+    def __delslice__(self, start, end):
+        target = self._willChange()
+        list.__delslice__(target, start, end)
+        target._didChange()
+
+    def __iadd__(self, items):
+        target = self._willChange()
+        list.extend(target, items)
+        target._didChange()
+        return target
+
+    def __imul__(self, count):
+        target = self._willChange()
+        list.__imul__(target, count)
+        target._didChange()
+        return target
+
+
+class _NodeList(_NotifyingList, list):
+
+    """
+    A list attribute of a node.
+    """
+
+    __slots__ = ("_owner", "_name", "__weakref__")
+
+    def __init__(self, owner, items=(), name=None):
+        list.__init__(self, items)
+        self._owner = owner
+        self._name = name
+
+    def __getitem__(self, index):
+        item = list.__getitem__(self, index)
+        if getattr(item, "_shared", False):
+            _routes[id(item)] = self
+        return item
+
+    def _getNode(self):
+        return self._owner
+
+    def _getName(self):
+        return self._name
+
+
+# ---------
+# Observers
+# ---------
+
+_observedCount = 0
+
+class _Observable(object):
+
+    """
+    Objects that report their changes to observers.
+
+    An observer is called with a list of ChangeEvent objects
+    after this object or anything in it has changed. Outside
+    of a transaction the list has one event. Inside of one
+    the events are collected and the observers are called
+    once when the transaction ends. Repeated changes to the
+    same attribute of the same object are reported once.
+
+    A change is found by following the owners of the changed
+    object up to the observed object, see _Node. Shared
+    objects can't change so they are never reported.
+    """
+
+    __slots__ = ()
+
+    _transactionDepth = 0
+    _pendingEvents = None
+
+    def addObserver(self, callback):
+        global _observedCount
+        if self._observers is None:
+            self._observers = []
+            _observedCount += 1
+        self._observers.append(callback)
+        # computing the digest registers the
+        # owners of everything in this object
+        self.digest()
+
+    def removeObserver(self, callback):
+        global _observedCount
+        if self._observers is None or callback not in self._observers:
+            raise FeaToolsError, "The observer is not registered."
+        self._observers.remove(callback)
+        if not self._observers:
+            self._observers = None
+            _observedCount -= 1
+
+    def beginTransaction(self):
+        if not self._transactionDepth:
+            self._pendingEvents = ([], set())
+        self._transactionDepth += 1
+
+    def endTransaction(self):
+        if not self._transactionDepth:
+            raise FeaToolsError, "There is no transaction to end."
+        self._transactionDepth -= 1
+        if self._transactionDepth:
+            return
+        events = self._pendingEvents[0]
+        self._pendingEvents = None
+        if events and self._observers is not None:
+            self._notifyObservers(events)
+
+    def transaction(self):
+        """
+        Get a context manager for a transaction.
+
+            with table.transaction():
+                table.removeGlyphs(glyphNames)
+                table.cleanup()
+        """
+        return _Transaction(self)
+
+    def _postEvent(self, event):
+        if not self._transactionDepth:
+            self._notifyObservers([event])
+            return
+        events, keys = self._pendingEvents
+        if event.glyphMapping is None:
+            key = (id(event.node), event.name)
+            if key in keys:
+                return
+            keys.add(key)
+        events.append(event)
+
+    def _notifyObservers(self, events):
+        # the owners of objects that were
+        # added are registered before any
+        # other change can happen
+        self.digest()
+        for callback in list(self._observers):
+            callback(events)
+
+
+class _Transaction(object):
+
+    def __init__(self, node):
+        self._node = node
+
+    def __enter__(self):
+        self._node.beginTransaction()
+        return self._node
+
+    def __exit__(self, excType, excValue, traceback):
+        # the changes that were made before an
+        # error are reported
+        self._node.endTransaction()
+        return False
+
+
+class ChangeEvent(object):
+
+    """
+    A change to an object in an observed object.
+
+    node is the object that changed. name is the name of the
+    attribute that changed, the name of the class for changes
+    to Classes or None if the items of a table, a sequence or
+    a class changed or all classes were removed.
+
+    path is the list of objects from the observed object down
+    to node.
+
+    glyphMapping is only set by Table.removeGlyphs and
+    Table.renameGlyphs, with None as the new name of removed
+    glyphs. It is reported to the observers of the table in
+    addition to the changes.
+    """
+
+    def __init__(self, node, name, path, glyphMapping=None):
+        self.node = node
+        self.name = name
+        self.path = path
+        self.glyphMapping = glyphMapping
+
+    def __repr__(self):
+        return "<ChangeEvent %s %s>" % (self.node.__class__.__name__, self.name)
+
+
+def _postChange(node, name):
+    # every observed object that contains the node
+    # is found by following the owners upwards
+    found = set()
+    pending = [(node, [node])]
+    while pending:
+        current, path = pending.pop()
+        if id(current) in found:
+            continue
+        found.add(id(current))
+        if current._observers is not None:
+            current._postEvent(ChangeEvent(node, name, list(reversed(path))))
+        owners = current._owners
+        if owners:
+            for reference in owners:
+                owner = reference()
+                if owner is not None:
+                    pending.append((owner, path + [owner]))
+
+
 class Tables(object):
 
     def __init__(self):
@@ -16,13 +414,26 @@ class Tables(object):
             return self._gpos
         raise KeyError, "Unknonw table %s." % key
 
+    # storage
+
+    def save(self, stream):
+        from feaTools2.storage import saveTables
+        saveTables(self, stream)
+
+    def load(self, stream, features=None):
+        from feaTools2.storage import loadTables
+        loadTables(stream, self, features=features)
+
+
+class Table(_NotifyingList, _Observable, _Node, list):
 
-class Table(list):
+    _listAttributes = ("lookups",)
 
     def __init__(self):
         self.tag = None
         self.classes = Classes()
         self.lookups = []
+        self._compressed = False
 
     # writing
 
@@ -53,58 +464,264 @@ class Table(list):
             featureWriter = writer.addFeature(feature.tag)
             feature.write(featureWriter)
 
+    # storage
+
+    def save(self, stream):
+        from feaTools2.storage import saveTable
+        saveTable(self, stream)
+
+    def load(self, stream, features=None):
+        from feaTools2.storage import loadTable
+        loadTable(stream, self, features=features)
+
+    # comparison
+
+    def _computeDigest(self):
+        lookups = tuple([(lookup.name, self._childDigest(lookup)) for lookup in self.lookups])
+        features = tuple([self._childDigest(feature) for feature in self])
+        return hash((self.tag, self._childDigest(self.classes), lookups, features))
+
+    def diff(self, other):
+        from feaTools2.diff import diffTables
+        return diffTables(self, other)
+
+    # memory
+
+    def memoryReport(self):
+        """
+        Get a feaTools2.memory.MemoryReport with the approximate
+        sizes of the objects in the table by type, feature and
+        lookup and counts of duplicate objects.
+        """
+        from feaTools2.memory import measureTable
+        return measureTable(self)
+
     # manipulation
 
     def removeGlyphs(self, glyphNames):
-        self.classes.removeGlyphs(glyphNames)
+        self.beginTransaction()
+        try:
+            self.classes.removeGlyphs(glyphNames)
+            for index in range(len(self.lookups)):
+                lookup = _editable(self.lookups, index, glyphNames)
+                if lookup is not None:
+                    lookup.removeGlyphs(glyphNames)
+            for feature in self:
+                feature.removeGlyphs(glyphNames)
+            if self._observers is not None:
+                self._postEvent(ChangeEvent(self, None, [self], dict.fromkeys(glyphNames)))
+        finally:
+            self.endTransaction()
+
+    def renameGlyphs(self, glyphMapping):
+        self.beginTransaction()
+        try:
+            self.classes.renameGlyphs(glyphMapping)
+            for index in range(len(self.lookups)):
+                lookup = _editable(self.lookups, index, glyphMapping)
+                if lookup is not None:
+                    lookup.renameGlyphs(glyphMapping)
+            for feature in self:
+                feature.renameGlyphs(glyphMapping)
+            if self._observers is not None:
+                self._postEvent(ChangeEvent(self, None, [self], dict(glyphMapping)))
+        finally:
+            self.endTransaction()
+
+    def cleanup(self):
+        """
+        Remove empty objects in a single pass. The removals
+        cascade: empty class -> references to the class ->
+        empty subtable -> empty lookup -> references to the
+        lookup -> empty language -> empty script -> empty feature.
+        References to classes are counted along the way and
+        classes that were only referenced by removed rules
+        are removed after the pass.
+        """
+        self._cleanup({})
+
+    def _cleanup(self, classReferences):
+        removedClasses = self.classes._removeEmptyClasses()
+        removedLookups = set()
+        # global lookups come first so that
+        # references to them can be removed
+        lookups = []
         for lookup in self.lookups:
-            lookup.removeGlyphs(glyphNames)
+            lookup, keep = _cleanupCopy(lookup, removedClasses, removedLookups, classReferences)
+            if keep:
+                lookups.append(lookup)
+            else:
+                removedLookups.add(lookup.name)
+        self.lookups = lookups
+        # features
+        self[:] = [feature for feature in self if feature._cleanup(removedClasses, removedLookups, classReferences, self._compressed)]
+        # classes that are no longer referenced
+        self.classes._removeUnreferencedClasses(classReferences)
+
+    # lookup graph
+
+    def getLookupGraph(self):
+        return LookupGraph(self)
+
+    def pruneUnreachable(self):
+        """
+        Remove global lookups that are not referenced by any
+        feature and references to lookups that don't exist.
+        Anything that is empty as a result is removed with
+        cleanup. Returns a list of the removed lookup names.
+        """
+        graph = self.getLookupGraph()
+        unused = set(graph.getUnusedLookups())
+        dangling = set(graph.getDanglingReferences())
+        if unused:
+            self.lookups = [lookup for lookup in self.lookups if lookup.name not in unused]
+        if dangling:
+            for feature in self:
+                for script in feature.scripts:
+                    for language in script.languages:
+                        language.lookups = [lookup for lookup in language.lookups if not (isinstance(lookup, LookupReference) and lookup.name in dangling)]
+        if unused or dangling:
+            self.cleanup()
+        return [name for name in graph.getGlobalLookups() if name in unused]
+
+    # sharing
+
+    def unshare(self):
+        """
+        Replace the shared objects in the table with private
+        copies so that they can be changed directly.
+        """
+        for name, members in self.classes.items():
+            if members._shared:
+                self.classes[name] = members._copy()
+        copies = {}
+        self.lookups = [_unshareLookup(lookup, copies) for lookup in self.lookups]
         for feature in self:
-            feature.removeGlyphs(glyphNames)
+            feature._unshare(copies)
 
-    def renameGlyphs(self, glyphMapping):
-        self.classes.renameGlyphs(glyphMapping)
+    def freeze(self):
+        """
+        Get a copy of the table that can't be changed. All of
+        the objects in the copy are shared and their digests are
+        computed up front, so the copy can be read by more than
+        one thread at a time. The objects that are already
+        shared are not copied.
+        """
+        if self._shared:
+            return self
+        copies = {}
+        def copyLookup(lookup):
+            return _frozenLookup(lookup, copies)
+        def copyClass(members):
+            if members._shared:
+                return members
+            return members._copy()
+        table = self._copy(copyLookup, copyClass)
+        table._share()
+        table.digest()
+        return table
+
+    def thaw(self):
+        """
+        Get a copy of a frozen table that can be changed. The
+        lookups, subtables and classes are shared with the frozen
+        table until they are changed, see unshare.
+        """
+        if not self._shared:
+            raise FeaToolsError, "Only frozen tables can be thawed."
+        return self._copy(_sharedLookup, _sharedClass)
+
+    def copy(self):
+        """
+        Get a copy of the table. The copy has lookups of its
+        own but the subtables and classes become shared objects
+        that are used by both tables. They are replaced with
+        private copies when they change, see _Node.
+        """
+        self._shareContent()
+        copies = {}
+        def copyLookup(lookup):
+            # copies is {id(lookup) : (lookup, copy)}, see _unshareLookup
+            if isinstance(lookup, LookupReference):
+                return lookup._copy()
+            if id(lookup) not in copies:
+                copies[id(lookup)] = (lookup, lookup._copy())
+            return copies[id(lookup)][1]
+        return self._copy(copyLookup, _sharedClass)
+
+    def subset(self, glyphs=None, features=None, scripts=None):
+        """
+        Get a copy of the table that only has the given glyphs,
+        features and scripts. Rules that need a glyph that isn't
+        in glyphs are removed and so are the glyphs in classes,
+        alternates and single substitutions. glyphs is not
+        extended with the glyphs that the rules make. Only the
+        subtables that change are copied, the others are shared
+        with this table, see copy.
+        """
+        table = self.copy()
+        if features is not None:
+            features = set(features)
+            table[:] = [feature for feature in table if feature.tag in features]
+        if scripts is not None:
+            scripts = set(scripts)
+            for feature in table:
+                if "DFLT" not in scripts:
+                    _inheritDefaultScript(feature)
+                feature.scripts = [script for script in feature.scripts if script.tag in scripts]
+        # classes that were only used by the changed lookups
+        expandedClasses = set()
+        if glyphs is not None:
+            glyphs = set(glyphs)
+            copies = {}
+            table.lookups = [_subsetLookup(lookup, glyphs, table.classes, copies, expandedClasses) for lookup in table.lookups]
+            for feature in table:
+                classes = dict(table.classes)
+                classes.update(feature.classes)
+                for script in feature.scripts:
+                    for language in script.languages:
+                        language.lookups = [_subsetLookup(lookup, glyphs, classes, copies, expandedClasses) for lookup in language.lookups]
+            # the classes that have other glyphs are only used by
+            # the changed lookups and those don't reference
+            # classes anymore
+            for classes in [table.classes] + [feature.classes for feature in table]:
+                for name, members in classes.items():
+                    kept = [member for member in members if isinstance(member, ClassReference) or member in glyphs]
+                    if len(kept) != len(members):
+                        classes[name] = Class(kept)
+        table.pruneUnreachable()
+        table._cleanup(dict.fromkeys(expandedClasses, 0))
+        return table
+
+    def _shareContent(self):
+        # the lookups of this table stay private so that
+        # they can be changed. the shared objects in them
+        # are replaced in this table when they change.
+        self.classes._shareMembers()
         for lookup in self.lookups:
-            lookup.renameGlyphs(glyphMapping)
+            lookup._shareSubtables()
         for feature in self:
-            feature.renameGlyphs(glyphMapping)
+            feature.classes._shareMembers()
+            for lookup in feature._findInlineLookups():
+                lookup._shareSubtables()
 
-    def cleanup(self):
-        # remove empty classes
-        removedClasses = set()
+    def _copy(self, copyLookup, copyClass):
+        table = Table()
+        table.tag = self.tag
         for name, members in self.classes.items():
-            if not members:
-                removedClasses.add(name)
-                del self.classes[name]
-        # remove empty lookups
-        removedLookups = set()
-        newLookups = []
+            table.classes[name] = copyClass(members)
+        table.lookups = [copyLookup(lookup) for lookup in self.lookups]
+        table.extend([feature._copy(copyLookup, copyClass) for feature in self])
+        table._compressed = self._compressed
+        return table
+
+    def _share(self):
+        self._shared = True
+        self.classes._share()
         for lookup in self.lookups:
-            # remove the classes
-            lookup._removeClassReferences(removedClasses)
-            # clean up
-            lookup.cleanup()
-            # flag for removal
-            if lookup._shouldBeRemoved():
-                removedLookups.add(lookup.name)
-            else:
-                newLookups.append(lookup)
-        self.lookups = newLookups
-        # handle the features
-        toRemove = []
-        for index, feature in enumerate(self):
-            # remove the classes
-            feature._removeClassReferences(removedClasses)
-            # remove the lookups
-            feature._removeLookupReferences(removedLookups)
-            # clean up
-            feature.cleanup()
-            # flag for removal
-            if feature._shouldBeRemoved():
-                toRemove.append(index)
-        # remove
-        for index in reversed(toRemove):
-            del self[index]
+            lookup._share()
+        for feature in self:
+            feature._share()
 
     # writer API
 
@@ -129,11 +746,102 @@ class Table(list):
 
     # compression
 
-    def compress(self):
-        self._compressLookups()
-        self._compressClasses()
+    def compress(self, stats=None, processes=None, timeBudget=None, maxCandidates=None):
+        """
+        Compress the table. The first compression works on the
+        whole table. After that, only the features that have been
+        changed, and any features that share lookups with them,
+        are decompressed and compressed again. Existing lookup
+        and class names are kept whenever possible.
+
+        stats may be a feaTools2.stats.DecompileStats. The steps
+        are then timed as phases.
+
+        processes may be a number of processes for the first
+        compression. The lookups and the potential classes of
+        each feature are then found in a pool of processes. The
+        result is the same as the result without processes.
+
+        timeBudget may be a number of seconds and maxCandidates
+        a number of lookups or classes that each stage of the
+        first compression may look at. The stages are named
+        globalLookups, featureLookups, defaultLookups and classes.
+        When a budget runs out the stage stops, as do the stages
+        after it, and the table is left partially compressed.
+        The featureLookups and defaultLookups stages are done one
+        feature at a time, so they stop together. The budgets are
+        checked between features. The features that weren't
+        finished are compressed by the next call. With a budget,
+        processes are not used and the names of the stages that
+        were skipped or not finished are returned. They are also
+        given to stats.skipPhase.
+        """
+        budget = _CompressionBudget(timeBudget, maxCandidates)
+        unfinished = []
+        if self._compressed:
+            if stats is not None:
+                stats.startPhase("_recompress")
+            self._recompress()
+        else:
+            self.unshare()
+            featureCandidates = None
+            if stats is not None:
+                stats.startPhase("_compressLookups")
+            if processes is not None and processes > 1 and not budget.isLimited() and self._canCompressInProcesses():
+                featureCandidates = self._compressLookupsInProcesses(processes)
+            else:
+                unfinished = self._compressLookups(budget)
+            if stats is not None:
+                stats.startPhase("_compressClasses")
+            if budget.skipped:
+                budget.skip("classes")
+            else:
+                self._compressClasses(featureCandidates, budget)
+            self._compressed = True
+        self._clearDirty()
+        for feature in unfinished:
+            feature._dirty = True
+        if stats is not None:
+            stats.stopPhase()
+            for stage in budget.skipped:
+                stats.skipPhase(stage)
+        if budget.isLimited():
+            return budget.skipped
+
+    def _clearDirty(self):
+        for feature in self:
+            feature._clearDirty()
+        for lookup in self.lookups:
+            lookup._clearDirty()
 
-    def _compressLookups(self):
+    def _compressLookups(self, budget=None):
+        """
+        Returns the features that a budget stopped.
+        """
+        if budget is None:
+            budget = _CompressionBudget()
+        self._compressGlobalLookups(budget)
+        # compress feature level lookups
+        compressed = 0
+        count = 0
+        unfinished = []
+        for feature in self:
+            if budget.skipped or budget.exhausted(count):
+                break
+            count += feature._compressLookups(budget)
+            compressed += 1
+            if budget.skipped:
+                unfinished.append(feature)
+        if compressed < len(self):
+            budget.skip("featureLookups")
+            budget.skip("defaultLookups")
+            # the other features still need names
+            for feature in self[compressed:]:
+                feature._nameLookups()
+                unfinished.append(feature)
+        return unfinished
+
+    def _compressGlobalLookups(self, budget):
         """
         Locate lookups that occur in more than one feature.
         These can be promoted to global lookups.
@@ -149,6 +857,9 @@ class Table(list):
                 if lookup not in candidates:
                     candidates[lookup] = set()
                 candidates[lookup].add(feature.tag)
+            if budget.exhausted(len(lookupOrder)):
+                budget.skip("globalLookups")
+                return
         # store all lookups that occur in > 1 features
         usedNames = set()
         lookups = {}
@@ -156,15 +867,7 @@ class Table(list):
             features = candidates[lookup]
             if len(features) == 1:
                 continue
-            lookupName = nameLookup(features)
-            counter = 1
-            while 1:
-                name = lookupName + "_" + str(counter)
-                counter += 1
-                if name not in usedNames:
-                    lookupName = name
-                    usedNames.add(lookupName)
-                    break
+            lookupName = _makeUniqueName(nameLookup(features), usedNames)
             lookups[lookupName] = lookup
         for name, lookup in sorted(lookups.items()):
             self.lookups.append(lookup)
@@ -180,36 +883,33 @@ class Table(list):
         # trying to find duplicate lookups
         for name, lookup in lookups.items():
             lookup.name = name
-        # compress feature level lookups
-        for feature in self:
-            feature._compressLookups()
 
-    def _compressClasses(self):
+    def _compressClasses(self, featureCandidates=None, budget=None):
+        if budget is None:
+            budget = _CompressionBudget()
         # find all potential classes
         classOrder = []
         potentialClasses = {}
-        for feature in self:
-            candidates = feature._findPotentialClasses()
+        for index, feature in enumerate(self):
+            if featureCandidates is None:
+                candidates = feature._findPotentialClasses()
+            else:
+                candidates = featureCandidates[index]
             for candidate in candidates:
                 if candidate not in potentialClasses:
                     potentialClasses[candidate] = []
                     classOrder.append(candidate)
                 potentialClasses[candidate].append(feature.tag)
+            if budget.exhausted(len(classOrder)):
+                budget.skip("classes")
+                return
         # name the classes
         usedNames = set()
         classes = {}
         featureClasses = {}
         for members in classOrder:
             features = potentialClasses[members]
-            className = nameClass(features, members)
-            counter = 1
-            while 1:
-                name = className + "_" + str(counter)
-                counter += 1
-                if name not in usedNames:
-                    className = name
-                    usedNames.add(className)
-                    break
+            className = _makeUniqueName(nameClass(features, members), usedNames)
             classes[members] = className
             if len(features) > 1:
                 self.classes[className] = Class(members)
@@ -222,13 +922,382 @@ class Table(list):
         for feature in self:
             feature._populateClasses(classes, featureClasses.get(feature.tag, {}))
 
+    # compression in processes
+
+    def _canCompressInProcesses(self):
+        # the potential classes come back from the processes
+        # marshalled as they are, which class references can't
+        # be, and subtables that remember removed substitutions
+        # are not the same as the others when packed
+        if len(self) < 2 or self.classes:
+            return False
+        for feature in self:
+            if feature.classes:
+                return False
+            for lookup in feature._findInlineLookups():
+                for subtable in lookup.subtables:
+                    if subtable._manipulationResultedInEmptySubstitution:
+                        return False
+        return True
+
+    def _compressLookupsInProcesses(self, processes):
+        """
+        Do the same as _compressLookups. The lookups are compared
+        by their packed form instead of their digests, so the
+        uncompressed lookups are never hashed in this process.
+        Each feature is compressed in a pool of processes. Returns
+        a list of the potential classes of each feature.
+        """
+        import marshal
+        from multiprocessing import Pool
+        from feaTools2.serialization import _Packer, _Unpacker
+        packer = _Packer()
+        packedFeatures = [packer.packFeature(feature) for feature in self]
+        # find all potential lookups. the dicts in
+        # _compressLookups are keyed by the lookup
+        # name and content and the lists by content.
+        lookupOrder = []
+        seen = set()
+        candidates = {}
+        for tag, classes, scripts in packedFeatures:
+            featureLookups = []
+            featureSeen = set()
+            for scriptTag, languages in scripts:
+                for languageTag, includeDefault, lookups in languages:
+                    for lookup in lookups:
+                        # references are packed as names
+                        if not isinstance(lookup, tuple):
+                            continue
+                        content = lookup[1:]
+                        if content not in featureSeen:
+                            featureSeen.add(content)
+                            featureLookups.append(lookup)
+            for lookup in featureLookups:
+                content = lookup[1:]
+                if content not in seen:
+                    seen.add(content)
+                    lookupOrder.append(lookup)
+                key = (lookup[0], content)
+                if key not in candidates:
+                    candidates[key] = set()
+                candidates[key].add(tag)
+        # store all lookups that occur in > 1 features
+        usedNames = set()
+        lookups = {}
+        for lookup in lookupOrder:
+            features = candidates[lookup[0], lookup[1:]]
+            if len(features) == 1:
+                continue
+            lookupName = _makeUniqueName(nameLookup(features), usedNames)
+            lookups[lookupName] = lookup
+        # populate global lookups
+        flippedLookups = {}
+        for name, lookup in lookups.items():
+            flippedLookups[lookup[0], lookup[1:]] = packer.packString(name)
+        tasks = []
+        for tag, classes, scripts in packedFeatures:
+            newScripts = []
+            for scriptTag, languages in scripts:
+                newLanguages = []
+                for languageTag, includeDefault, languageLookups in languages:
+                    newLookups = []
+                    for lookup in languageLookups:
+                        if isinstance(lookup, tuple):
+                            lookup = flippedLookups.get((lookup[0], lookup[1:]), lookup)
+                        newLookups.append(lookup)
+                    newLanguages.append((languageTag, includeDefault, tuple(newLookups)))
+                newScripts.append((scriptTag, tuple(newLanguages)))
+            tasks.append((tag, classes, tuple(newScripts)))
+        strings = tuple(packer.strings)
+        tasks = [marshal.dumps((strings, task)) for task in tasks]
+        # compress feature level lookups
+        pool = Pool(processes)
+        try:
+            results = pool.map(_compressPackedFeature, tasks)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        unpacker = _Unpacker(strings)
+        for name, lookup in sorted(lookups.items()):
+            lookup = unpacker.unpackLookup(lookup)
+            lookup.name = name
+            self.lookups.append(lookup)
+        features = []
+        featureCandidates = []
+        for result in results:
+            featureStrings, packedFeature, candidates = marshal.loads(result)
+            features.append(_Unpacker(featureStrings).unpackFeature(packedFeature))
+            featureCandidates.append(candidates)
+        self[:] = features
+        return featureCandidates
+
+    # incremental compression
+
+    def _recompress(self):
+        dirty = set([id(feature) for feature in self if feature._isDirty()])
+        if not dirty:
+            return
+        previousClasses = {}
+        for feature in self:
+            if id(feature) in dirty:
+                previousClasses[id(feature)] = feature._decompress(self.classes)
+        # features with lookups that are the same as lookups in the
+        # changed features need to be compressed again too
+        while 1:
+            found = self._findFeaturesSharingLookups(dirty)
+            if not found:
+                break
+            for feature in found:
+                previousClasses[id(feature)] = feature._decompress(self.classes)
+                dirty.add(id(feature))
+        dirtyFeatures = [feature for feature in self if id(feature) in dirty]
+        self._recompressGlobalLookups(dirtyFeatures)
+        for feature in dirtyFeatures:
+            feature._recompressLookups()
+        self._recompressClasses(dirtyFeatures, previousClasses)
+
+    def _findFeaturesSharingLookups(self, dirty):
+        # the lookups in the changed features have been
+        # decompressed so they are compared to the others
+        # with the class references expanded. the structure
+        # is compared first so that this only has to be
+        # done for lookups that could be the same.
+        structures = {}
+        for feature in self:
+            if id(feature) not in dirty:
+                continue
+            for lookup in feature._findLookups():
+                structure = _lookupStructure(lookup)
+                if structure not in structures:
+                    structures[structure] = []
+                structures[structure].append(_expandedLookupKey(lookup, {}))
+        found = []
+        for feature in self:
+            if id(feature) in dirty:
+                continue
+            classes = None
+            for lookup in feature._findLookups():
+                keys = structures.get(_lookupStructure(lookup))
+                if not keys:
+                    continue
+                if classes is None:
+                    classes = dict(self.classes)
+                    classes.update(feature.classes)
+                if _expandedLookupKey(lookup, classes) in keys:
+                    found.append(feature)
+                    break
+        return found
+
+    def _recompressGlobalLookups(self, dirtyFeatures):
+        # find the lookups in the changed features
+        buckets = {}
+        candidates = []
+        for feature in dirtyFeatures:
+            for lookup in feature._findLookups():
+                signature = _lookupSignature(lookup)
+                if signature not in buckets:
+                    buckets[signature] = []
+                for candidate in buckets[signature]:
+                    if candidate[0] == lookup:
+                        candidate[1].add(feature.tag)
+                        break
+                else:
+                    candidate = (lookup, set([feature.tag]))
+                    buckets[signature].append(candidate)
+                    candidates.append(candidate)
+        # use existing global lookups or make new
+        # ones for lookups in more than one feature
+        globalLookups = {}
+        for lookup in self.lookups:
+            signature = _lookupSignature(lookup)
+            if signature not in globalLookups:
+                globalLookups[signature] = []
+            globalLookups[signature].append(lookup)
+        usedNames = set([lookup.name for lookup in self.lookups])
+        replacements = {}
+        newLookups = {}
+        for lookup, features in candidates:
+            signature = _lookupSignature(lookup)
+            name = None
+            for globalLookup in globalLookups.get(signature, []):
+                if globalLookup == lookup:
+                    name = globalLookup.name
+                    break
+            if name is None:
+                if len(features) == 1:
+                    continue
+                name = _makeUniqueName(nameLookup(features), usedNames)
+                newLookups[name] = lookup
+            if signature not in replacements:
+                replacements[signature] = []
+            replacements[signature].append((lookup, name))
+        for name, lookup in sorted(newLookups.items()):
+            self.lookups.append(lookup)
+        for feature in dirtyFeatures:
+            feature._replaceLookups(replacements)
+        # name after replacing, see _compressLookups
+        for name, lookup in newLookups.items():
+            lookup.name = name
+
+    def _recompressClasses(self, dirtyFeatures, previousClasses):
+        dirty = set([id(feature) for feature in dirtyFeatures])
+        # find all potential classes
+        classOrder = []
+        potentialClasses = {}
+        for feature in dirtyFeatures:
+            for candidate in feature._findPotentialClasses():
+                if candidate not in potentialClasses:
+                    potentialClasses[candidate] = []
+                    classOrder.append(candidate)
+                potentialClasses[candidate].append(feature)
+        # reuse the names of global classes and of
+        # the classes that the features had before
+        usedNames = set(self.classes.keys())
+        for feature in self:
+            if id(feature) not in dirty:
+                usedNames.update(feature.classes.keys())
+        globalClasses = {}
+        for name, members in self.classes.items():
+            globalClasses[tuple(members)] = name
+        classes = {}
+        featureClasses = {}
+        for members in classOrder:
+            features = potentialClasses[members]
+            if members in globalClasses:
+                classes[members] = globalClasses[members]
+            elif len(features) == 1:
+                name = previousClasses[id(features[0])].get(members)
+                if name is not None and name not in usedNames:
+                    usedNames.add(name)
+                    classes[members] = name
+                    featureClasses.setdefault(id(features[0]), {})[name] = members
+        # name the new classes
+        for members in classOrder:
+            if members in classes:
+                continue
+            features = potentialClasses[members]
+            name = _makeUniqueName(nameClass([feature.tag for feature in features], members), usedNames)
+            classes[members] = name
+            if len(features) > 1:
+                self.classes[name] = Class(members)
+            else:
+                featureClasses.setdefault(id(features[0]), {})[name] = members
+        # populate the classes
+        for feature in dirtyFeatures:
+            feature._populateClasses(classes, featureClasses.get(id(feature), {}))
+
+
+class LookupGraph(object):
+
+    """
+    The references between the features and the lookups in a table.
+    The nodes are the global lookups and the named lookups within
+    features. Nested lookups in contextual subtables are resolved
+    when the binary is parsed, so they are not part of the graph.
+    """
+
+    def __init__(self, table):
+        self._globalLookups = [lookup.name for lookup in table.lookups]
+        self._featureLookups = {}
+        self._referencesTo = {}
+        self._referencesFrom = {}
+        self._unnamedLookupCount = 0
+        for feature in table:
+            if feature.tag not in self._referencesFrom:
+                self._referencesFrom[feature.tag] = []
+            names = self._referencesFrom[feature.tag]
+            for script in feature.scripts:
+                for language in script.languages:
+                    for lookup in language.lookups:
+                        name = lookup.name
+                        if isinstance(lookup, LookupReference):
+                            if name not in self._referencesTo:
+                                self._referencesTo[name] = []
+                            self._referencesTo[name].append((feature.tag, script.tag, language.tag))
+                        elif name is None:
+                            self._unnamedLookupCount += 1
+                            continue
+                        else:
+                            self._featureLookups[name] = feature.tag
+                        if name not in names:
+                            names.append(name)
+
+    def getGlobalLookups(self):
+        return list(self._globalLookups)
+
+    def getFeatureLookups(self):
+        """
+        Get a dict of {lookup name : feature tag} for the
+        named lookups that are defined within features.
+        """
+        return dict(self._featureLookups)
+
+    def getReferencesTo(self, lookupName):
+        """
+        Get a list of (feature tag, script tag, language tag)
+        for the lookup references to lookupName.
+        """
+        return list(self._referencesTo.get(lookupName, []))
 
-class Feature(object):
+    def getReferencesFrom(self, featureTag):
+        """
+        Get a list of the names of the lookups that are defined
+        within or referenced by a feature, in the order in which
+        they first occur.
+        """
+        return list(self._referencesFrom.get(featureTag, []))
+
+    def getReachableLookups(self):
+        reachable = set()
+        for names in self._referencesFrom.values():
+            reachable.update(names)
+        return reachable
+
+    def getUnusedLookups(self):
+        """
+        Get a list of global lookups that are not referenced by any feature.
+        """
+        reachable = self.getReachableLookups()
+        return [name for name in self._globalLookups if name not in reachable]
+
+    def getDanglingReferences(self):
+        """
+        Get a list of lookup names that are referenced but not defined.
+        """
+        defined = set(self._globalLookups) | set(self._featureLookups)
+        return sorted([name for name in self._referencesTo if name not in defined])
+
+    def getStats(self):
+        references = 0
+        for referrers in self._referencesTo.values():
+            references += len(referrers)
+        return dict(
+            globalLookups=len(self._globalLookups),
+            featureLookups=len(self._featureLookups) + self._unnamedLookupCount,
+            references=references,
+            reachableGlobalLookups=len(self._globalLookups) - len(self.getUnusedLookups()),
+            unusedLookups=len(self.getUnusedLookups()),
+            danglingReferences=len(self.getDanglingReferences())
+        )
+
+
+class Feature(_Observable, _Node):
+
+    _listAttributes = ("scripts",)
 
     def __init__(self):
         self.tag = None
         self.classes = Classes()
         self.scripts = []
+        self._dirty = True
+
+    # digest
+
+    def _computeDigest(self):
+        return hash((self.tag, self._childDigest(self.classes), tuple([self._childDigest(script) for script in self.scripts])))
 
     # writing
 
@@ -243,9 +1312,11 @@ class Feature(object):
     # writer API
 
     def addClassDefinition(self, name, members):
+        self._dirty = True
         self.classes[name] = Class(members)
 
     def addScript(self, name):
+        self._dirty = True
         # prevent direct duplication
         if not self.scripts or self.scripts[-1].tag != name:
             script = Script()
@@ -253,11 +1324,13 @@ class Feature(object):
             self.scripts.append(script)
 
     def addLanguage(self, name, includeDefault=True):
+        self._dirty = True
         if not self.scripts:
             raise FeaToolsError, "A script must be defined before adding a language."
         self.scripts[-1].addLanguage(name, includeDefault=includeDefault)
 
     def addLookup(self, name):
+        self._dirty = True
         if not self.scripts:
             raise FeaToolsError, "A script must be defined before adding a lookup."
         if not self.scripts[-1].languages:
@@ -265,6 +1338,7 @@ class Feature(object):
         return self.scripts[-1].languages[-1].addLookup(name)
 
     def addLookupReference(self, name):
+        self._dirty = True
         if not self.scripts:
             raise FeaToolsError, "A script must be defined before adding a lookup reference."
         if not self.scripts[-1].languages:
@@ -274,49 +1348,119 @@ class Feature(object):
     # manipulation
 
     def removeGlyphs(self, glyphNames):
+        self._dirty = True
         self.classes.removeGlyphs(glyphNames)
         for script in self.scripts:
             script.removeGlyphs(glyphNames)
 
     def renameGlyphs(self, glyphMapping):
+        self._dirty = True
         self.classes.renameGlyphs(glyphMapping)
         for script in self.scripts:
             script.renameGlyphs(glyphMapping)
 
-    def cleanup(self):
-        # remove empty local classes
-        removedClasses = set()
+    # dirty tracking
+
+    def markDirty(self):
+        """
+        Flag the feature for compression. The object API does
+        this automatically. This is only needed after the lists
+        in the feature have been changed directly.
+        """
+        self._dirty = True
+
+    def _isDirty(self):
+        if self._dirty:
+            return True
+        for lookup in self._findInlineLookups():
+            if lookup._isDirty():
+                return True
+        return False
+
+    def _clearDirty(self):
+        self._dirty = False
+        for lookup in self._findInlineLookups():
+            lookup._clearDirty()
+
+    def _copy(self, copyLookup, copyClass):
+        feature = Feature()
+        feature.tag = self.tag
         for name, members in self.classes.items():
-            if not members:
-                removedClasses.add(name)
-                del self.classes[name]
-        # handle the script
-        toRemove = []
-        for index, script in enumerate(self.scripts):
-            # remove class references
-            script._removeClassReferences(removedClasses)
-            # clean up
-            script.cleanup()
-            # flag it for removal
-            if script._shouldBeRemoved():
-                toRemove.append(index)
-        # remove scripts
-        for index in reversed(toRemove):
-            del self.scripts[index]
-
-    def _removeClassReferences(self, removedClasses):
+            feature.classes[name] = copyClass(members)
+        feature.scripts = [script._copy(copyLookup) for script in self.scripts]
+        feature._dirty = self._dirty
+        return feature
+
+    def _share(self):
+        self._shared = True
+        self.classes._share()
         for script in self.scripts:
-            script._removeClassReferences(removedClasses)
+            script._share()
 
-    def _removeLookupReferences(self, removedLookups):
+    def _unshare(self, copies):
+        for name, members in self.classes.items():
+            if members._shared:
+                self.classes[name] = members._copy()
         for script in self.scripts:
-            script._removeLookupReferences(removedLookups)
+            for language in script.languages:
+                language.lookups = [_unshareLookup(lookup, copies) for lookup in language.lookups]
 
-    def _shouldBeRemoved(self):
+    def _findInlineLookups(self):
         for script in self.scripts:
-            if not script._shouldBeRemoved():
-                return False
-        return True
+            for language in script.languages:
+                for lookup in language.lookups:
+                    if not isinstance(lookup, LookupReference):
+                        yield lookup
+
+    def cleanup(self):
+        self._cleanup(set(), set(), {}, True)
+
+    def _cleanup(self, removedClasses, removedLookups, classReferences, compressed):
+        """
+        Returns False if the feature should be removed.
+        """
+        # remove empty local classes
+        localRemovedClasses = self.classes._removeEmptyClasses()
+        if localRemovedClasses:
+            removedClasses = removedClasses | localRemovedClasses
+        # handle the languages
+        hasLookups = {}
+        for script in self.scripts:
+            for language in script.languages:
+                hasLookups[id(language)] = language._cleanup(removedClasses, removedLookups, classReferences)
+        # in a compressed feature the languages without lookups
+        # of their own are kept if they get the default lookups
+        hasDefaultLookups = False
+        for script in self.scripts:
+            for language in script.languages:
+                if script.tag == "DFLT" and language.tag is None:
+                    hasDefaultLookups = hasLookups[id(language)]
+        hasScriptDefaultLookups = {}
+        for script in self.scripts:
+            for language in script.languages:
+                if script.tag != "DFLT" and language.tag is None:
+                    hasScriptDefaultLookups[script.tag] = hasLookups[id(language)] or hasDefaultLookups
+        scripts = []
+        for script in self.scripts:
+            languages = []
+            for language in script.languages:
+                keep = hasLookups[id(language)]
+                if keep or not compressed:
+                    pass
+                elif language.tag is None:
+                    keep = script.tag != "DFLT" and hasDefaultLookups
+                elif language.includeDefault:
+                    keep = hasScriptDefaultLookups.get(script.tag, hasDefaultLookups)
+                if keep:
+                    languages.append(language)
+            if len(languages) != len(script.languages):
+                script.languages = languages
+            if languages:
+                scripts.append(script)
+        self.scripts = scripts
+        # local classes that are no longer referenced
+        self.classes._removeUnreferencedClasses(classReferences)
+        return bool(self.scripts)
 
     # compress lookups
 
@@ -332,10 +1476,125 @@ class Feature(object):
         for script in self.scripts:
             script._populateGlobalLookups(flippedLookups)
 
-    def _compressLookups(self):
-        self._compressFeatureLookups()
+    def _compressLookups(self, budget=None):
+        """
+        Returns the number of lookups in the feature.
+        """
+        count = self._compressFeatureLookups()
+        # the default lookups are folded by name
+        # so this needs the names given above
+        if budget is not None and budget.exhausted():
+            budget.skip("defaultLookups")
+            self._excludeDefaultLookups()
+        else:
+            self._compressDefaultLookups()
+        return count
+
+    def _recompressLookups(self):
+        # this is the same as _compressFeatureLookups
+        # except that existing names are kept
+        prefix = nameLookup([self.tag]) + "_"
+        lookups = self._findLookups()
+        usedNames = set()
+        names = [None] * len(lookups)
+        for index, lookup in enumerate(lookups):
+            name = lookup.name
+            if name is not None and name.startswith(prefix) and name[len(prefix):].isdigit() and name not in usedNames:
+                names[index] = name
+                usedNames.add(name)
+        counter = 1
+        for index, name in enumerate(names):
+            if name is None:
+                while prefix + str(counter) in usedNames:
+                    counter += 1
+                names[index] = prefix + str(counter)
+                usedNames.add(names[index])
+        # populate
+        indexes = {}
+        for index, lookup in enumerate(lookups):
+            indexes[id(lookup)] = index
+        haveSeen = set()
+        for script in self.scripts:
+            for language in script.languages:
+                new = []
+                for lookup in language.lookups:
+                    if not isinstance(lookup, LookupReference):
+                        index = indexes.get(id(lookup))
+                        if index is None:
+                            # an equal lookup is named and
+                            # written in place of this one
+                            index = lookups.index(lookup)
+                            lookup = lookups[index]
+                        name = names[index]
+                        if name in haveSeen:
+                            lookup = LookupReference()
+                            lookup.name = name
+                        else:
+                            haveSeen.add(name)
+                    new.append(lookup)
+                language.lookups = new
+        # name
+        for index, lookup in enumerate(lookups):
+            lookup.name = names[index]
         self._compressDefaultLookups()
 
+    def _replaceLookups(self, replacements):
+        for script in self.scripts:
+            for language in script.languages:
+                language._replaceLookups(replacements)
+
+    def _decompress(self, tableClasses):
+        """
+        Undo the compression of this feature. Returns a dict of
+        {members : name} for the classes that were in the feature.
+        """
+        self._dirty = True
+        self._unshare({})
+        # expand the class references
+        classes = dict(tableClasses)
+        classes.update(self.classes)
+        previousClasses = {}
+        for name, members in self.classes.items():
+            previousClasses[tuple(members)] = name
+        self.classes = Classes()
+        localLookups = {}
+        for lookup in self._findInlineLookups():
+            if lookup.name not in localLookups:
+                lookup._expandClassReferences(classes)
+            if lookup.name is not None:
+                localLookups[lookup.name] = lookup
+        # expand the references to lookups in this feature
+        # and the lookups that are included from the defaults
+        expanded = []
+        for script in self.scripts:
+            for language in script.languages:
+                lookups = []
+                for lookup in language.lookups:
+                    if isinstance(lookup, LookupReference) and lookup.name in localLookups:
+                        lookup = localLookups[lookup.name]
+                    lookups.append(lookup)
+                expanded.append((script.tag, language, lookups))
+        defaultLookups = []
+        scriptDefaultLookups = {}
+        for scriptTag, language, lookups in expanded:
+            if scriptTag == "DFLT" and language.tag is None:
+                defaultLookups = lookups
+        for scriptTag, language, lookups in expanded:
+            if scriptTag != "DFLT" and language.tag is None:
+                if language.includeDefault:
+                    lookups = defaultLookups + lookups
+                scriptDefaultLookups[scriptTag] = lookups
+        for scriptTag, language, lookups in expanded:
+            if scriptTag == "DFLT" and language.tag is None:
+                pass
+            elif language.tag is None:
+                lookups = scriptDefaultLookups[scriptTag]
+            elif language.includeDefault:
+                lookups = scriptDefaultLookups.get(scriptTag, defaultLookups) + lookups
+            language.lookups = lookups
+            language.includeDefault = True
+        return previousClasses
+
     def _compressFeatureLookups(self):
         # find
         lookups = {}
@@ -351,6 +1610,39 @@ class Feature(object):
         # name
         for lookup, name in lookups.items():
             lookup.name = name
+        return len(lookups)
+
+    def _nameLookups(self):
+        # this is what is left of _compressFeatureLookups
+        # when a compression budget has run out. the lookups
+        # are not compared so only a lookup that is used
+        # again is replaced by a reference.
+        prefix = nameLookup([self.tag]) + "_"
+        names = {}
+        for script in self.scripts:
+            for language in script.languages:
+                new = []
+                for lookup in language.lookups:
+                    if not isinstance(lookup, LookupReference):
+                        name = names.get(id(lookup))
+                        if name is None:
+                            name = prefix + str(len(names) + 1)
+                            names[id(lookup)] = name
+                            lookup.name = name
+                        else:
+                            lookup = LookupReference()
+                            lookup.name = name
+                    new.append(lookup)
+                language.lookups = new
+        self._excludeDefaultLookups()
+
+    def _excludeDefaultLookups(self):
+        # the default lookups haven't been folded so
+        # each language already has all of its lookups
+        for script in self.scripts:
+            for language in script.languages:
+                if script.tag != "DFLT" or language.tag is not None:
+                    language.includeDefault = False
 
     def _compressDefaultLookups(self):
         # group the lookups based on script and language
@@ -429,12 +1721,19 @@ class Feature(object):
             script._populateClasses(allClasses)
 
 
-class Script(object):
+class Script(_Node):
+
+    _listAttributes = ("languages",)
 
     def __init__(self):
         self.tag = None
         self.languages = []
 
+    # digest
+
+    def _computeDigest(self):
+        return hash((self.tag, tuple([self._childDigest(language) for language in self.languages])))
+
     # writing
 
     def write(self, writer):
@@ -464,31 +1763,24 @@ class Script(object):
             language.renameGlyphs(glyphMapping)
 
     def cleanup(self):
-        # handle the languages
-        toRemove = []
-        for index, language in enumerate(self.languages):
-            # clean up
-            language.cleanup()
-            # flag it for removal
-            if language._shouldBeRemoved():
-                toRemove.append(index)
-        # remove scripts
-        for index in reversed(toRemove):
-            del self.languages[index]
-
-    def _removeClassReferences(self, removedClasses):
-        for language in self.languages:
-            language._removeClassReferences(removedClasses)
+        self._cleanup(set(), set(), {})
 
-    def _removeLookupReferences(self, removedLookups):
-        for language in self.languages:
-            language._removeLookupReferences(removedLookups)
+    def _cleanup(self, removedClasses, removedLookups, classReferences):
+        self.languages = [language for language in self.languages if language._cleanup(removedClasses, removedLookups, classReferences)]
+        return bool(self.languages)
 
-    def _shouldBeRemoved(self):
+    # sharing
+
+    def _copy(self, copyLookup):
+        script = Script()
+        script.tag = self.tag
+        script.languages = [language._copy(copyLookup) for language in self.languages]
+        return script
+
+    def _share(self):
+        self._shared = True
         for language in self.languages:
-            if not language._shouldBeRemoved():
-                return False
-        return True
+            language._share()
 
     # compression
 
@@ -523,13 +1815,22 @@ class Script(object):
             language._populateClasses(classes)
 
 
-class Language(object):
+class Language(_Node):
+
+    _listAttributes = ("lookups",)
 
     def __init__(self):
         self.tag = None
         self.includeDefault = True
         self.lookups = []
 
+    # digest
+
+    def _computeDigest(self):
+        # inline lookups can be referenced by name
+        lookups = tuple([(lookup.name, self._childDigest(lookup)) for lookup in self.lookups])
+        return hash((self.tag, self.includeDefault, lookups))
+
     # writing
 
     def write(self, writer):
@@ -558,53 +1859,54 @@ class Language(object):
     # manipulation
 
     def removeGlyphs(self, glyphNames):
-        for lookup in self.lookups:
-            if isinstance(lookup, LookupReference):
+        for index in range(len(self.lookups)):
+            if isinstance(self.lookups[index], LookupReference):
                 continue
-            lookup.removeGlyphs(glyphNames)
+            lookup = _editable(self.lookups, index, glyphNames)
+            if lookup is not None:
+                lookup.removeGlyphs(glyphNames)
 
     def renameGlyphs(self, glyphMapping):
-        for lookup in self.lookups:
-            if isinstance(lookup, LookupReference):
+        for index in range(len(self.lookups)):
+            if isinstance(self.lookups[index], LookupReference):
                 continue
-            lookup.renameGlyphs(glyphMapping)
+            lookup = _editable(self.lookups, index, glyphMapping)
+            if lookup is not None:
+                lookup.renameGlyphs(glyphMapping)
 
     def cleanup(self):
-        # handle the lookups
-        toRemove = []
-        for index, lookup in enumerate(self.lookups):
-            if isinstance(lookup, LookupReference):
-                continue
-            # clean up
-            lookup.cleanup()
-            # flag it for removal
-            if lookup._shouldBeRemoved():
-                toRemove.append(index)
-        # remove scripts
-        for index in reversed(toRemove):
-            del self.lookups[index]
-
-    def _removeClassReferences(self, removedClasses):
+        self._cleanup(set(), set(), {})
+
+    def _cleanup(self, removedClasses, removedLookups, classReferences):
+        lookups = []
         for lookup in self.lookups:
             if isinstance(lookup, LookupReference):
-                continue
-            lookup._removeClassReferences(removedClasses)
+                if lookup.name in removedLookups:
+                    continue
+            else:
+                lookup, keep = _cleanupCopy(lookup, removedClasses, removedLookups, classReferences)
+                if not keep:
+                    # named lookups may be referenced later in the feature
+                    if lookup.name is not None:
+                        removedLookups.add(lookup.name)
+                    continue
+            lookups.append(lookup)
+        self.lookups = lookups
+        return bool(self.lookups)
 
-    def _removeLookupReferences(self, removedLookups):
-        toRemove = []
-        for index, lookup in enumerate(self.lookups):
-            if isinstance(lookup, LookupReference) and lookup.name in removedLookups:
-                toRemove.append(index)
-        for index in reversed(toRemove):
-            del self.lookups[index]
+    # sharing
 
-    def _shouldBeRemoved(self):
+    def _copy(self, copyLookup):
+        language = Language()
+        language.tag = self.tag
+        language.includeDefault = self.includeDefault
+        language.lookups = [copyLookup(lookup) for lookup in self.lookups]
+        return language
+
+    def _share(self):
+        self._shared = True
         for lookup in self.lookups:
-            if isinstance(lookup, LookupReference):
-                return False
-            if not lookup._shouldBeRemoved():
-                return False
-        return True
+            lookup._share()
 
     # compress lookups
 
@@ -618,6 +1920,18 @@ class Language(object):
             lookups.append(lookup)
         self.lookups = lookups
 
+    def _replaceLookups(self, replacements):
+        lookups = []
+        for lookup in self.lookups:
+            if not isinstance(lookup, LookupReference):
+                for candidate, name in replacements.get(_lookupSignature(lookup), []):
+                    if candidate == lookup:
+                        lookup = LookupReference()
+                        lookup.name = name
+                        break
+            lookups.append(lookup)
+        self.lookups = lookups
+
     def _populateFeatureLookups(self, flippedLookups, haveSeen):
         lookups = []
         for lookup in self.lookups:
@@ -652,12 +1966,15 @@ class Language(object):
             lookup._populateClasses(classes)
 
 
-class Lookup(object):
+class Lookup(_Observable, _Node):
+
+    _listAttributes = ("subtables",)
 
     def __init__(self):
         self.name = None
         self.flag = LookupFlag()
         self.subtables = []
+        self._dirty = True
 
     # writing
 
@@ -671,6 +1988,7 @@ class Lookup(object):
     # writer API
 
     def addLookupFlag(self, rightToLeft=False, ignoreBaseGlyphs=False, ignoreLigatures=False, ignoreMarks=False, markAttachmentType=None):
+        self._dirty = True
         lookupFlag = LookupFlag()
         lookupFlag.rightToLeft = rightToLeft
         lookupFlag.ignoreBaseGlyphs = ignoreBaseGlyphs
@@ -680,19 +1998,20 @@ class Lookup(object):
         self.flag = lookupFlag
 
     def _convertSequence(self, sequence):
-        newSequence = Sequence()
+        newSequence = []
         for group in sequence:
-            newGroup = Class()
+            newGroup = []
             for member in group:
                 if member.startswith("@"):
                     m = ClassReference()
                     m.name = member
                     member = m
                 newGroup.append(member)
-            newSequence.append(newGroup)
-        return newSequence
+            newSequence.append(Class(newGroup))
+        return Sequence(newSequence)
 
     def addGSUBSubtable(self, target, substitution, type, backtrack=[], lookahead=[]):
+        self._dirty = True
         subtable = GSUBSubtable()
         subtable.type = type
         subtable.target = [self._convertSequence(i) for i in target]
@@ -710,35 +2029,92 @@ class Lookup(object):
     # manipulation
 
     def removeGlyphs(self, glyphNames):
-        for subtable in self.subtables:
-            subtable.removeGlyphs(glyphNames)
+        self._dirty = True
+        for index in range(len(self.subtables)):
+            subtable = _editable(self.subtables, index, glyphNames)
+            if subtable is not None:
+                subtable.removeGlyphs(glyphNames)
 
     def renameGlyphs(self, glyphMapping):
+        self._dirty = True
+        for index in range(len(self.subtables)):
+            subtable = _editable(self.subtables, index, glyphMapping)
+            if subtable is not None:
+                subtable.renameGlyphs(glyphMapping)
+
+    def _usesGlyphs(self, glyphNames):
         for subtable in self.subtables:
-            subtable.renameGlyphs(glyphMapping)
+            if subtable._usesGlyphs(glyphNames):
+                return True
+        return False
+
+    def _usesOtherGlyphs(self, glyphs, classes):
+        for subtable in self.subtables:
+            if subtable._usesOtherGlyphs(glyphs, classes):
+                return True
+        return False
+
+    # dirty tracking
+
+    def markDirty(self):
+        self._dirty = True
+
+    def _isDirty(self):
+        if self._dirty:
+            return True
+        for subtable in self.subtables:
+            if subtable._dirty:
+                return True
+        return False
+
+    def _clearDirty(self):
+        self._dirty = False
+        for subtable in self.subtables:
+            subtable._dirty = False
 
     def cleanup(self):
-        # handle the subtables
-        toRemove = []
-        for index, subtable in enumerate(self.subtables):
-            # clean up
-            subtable.cleanup()
-            # flag it for removal
-            if subtable._shouldBeRemoved():
-                toRemove.append(index)
-        # remove scripts
-        for index in reversed(toRemove):
-            del self.subtables[index]
-
-    def _removeClassReferences(self, removedClasses):
+        self._cleanup(set(), set(), {})
+
+    def _cleanup(self, removedClasses, removedLookups, classReferences):
+        subtables = []
         for subtable in self.subtables:
-            subtable._removeClassReferences(removedClasses)
+            subtable, keep = _cleanupCopy(subtable, removedClasses, classReferences)
+            if keep:
+                subtables.append(subtable)
+        if len(subtables) != len(self.subtables) or [a for a, b in zip(subtables, self.subtables) if a is not b]:
+            self.subtables = subtables
+        return bool(self.subtables)
+
+    def _cleanupShared(self, removedClasses, removedLookups, classReferences):
+        # clean up a copy and only use it if it changed
+        copy = self._copy()
+        keep = copy._cleanup(removedClasses, removedLookups, classReferences)
+        if copy == self:
+            return self, keep
+        return copy, keep
+
+    # sharing
+
+    def _copy(self):
+        # the subtables are shared with the copy
+        lookup = Lookup()
+        lookup.name = self.name
+        lookup.flag = self.flag._copy()
+        lookup.subtables = self.subtables
+        lookup._dirty = self._dirty
+        return lookup
 
-    def _shouldBeRemoved(self):
+    def _share(self):
+        if self._shared:
+            return
+        self._shared = True
+        self.flag._share()
+        self._shareSubtables()
+
+    def _shareSubtables(self):
         for subtable in self.subtables:
-            if not subtable._shouldBeRemoved():
-                return False
-        return True
+            subtable._share()
+            _routes[id(subtable)] = self.subtables
 
     # compression
 
@@ -754,28 +2130,33 @@ class Lookup(object):
         for subtable in self.subtables:
             subtable._populateClasses(classes)
 
+    def _expandClassReferences(self, classes):
+        for subtable in self.subtables:
+            subtable._expandClassReferences(classes)
+
+    def _computeDigest(self):
+        # the name is not part of the content
+        return hash((self._childDigest(self.flag), tuple([self._childDigest(subtable) for subtable in self.subtables])))
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
-        if self.flag != other.flag:
-            return False
-        if self.subtables != other.subtables:
+        if self is other:
+            return True
+        # different digests mean different content but the
+        # same digests can come from hashes that collide
+        if self.digest() != other.digest():
             return False
-        return True
+        return self.flag == other.flag and self.subtables == other.subtables
 
     def __ne__(self, other):
         return not self == other
 
     def __hash__(self):
-        s = "Lookup | name=%s flag=%s subtables=%s" % (
-            self.name,
-            str(hash(self.flag)),
-            " ".join([str(hash(i)) for i in self.subtables])
-        )
-        return hash(s)
+        return hash((self.name, self.digest()))
 
 
-class LookupReference(object):
+class LookupReference(_Node):
 
     def __init__(self):
         self.name = None
@@ -783,6 +2164,14 @@ class LookupReference(object):
     def write(self, writer):
         writer.addLookupReference(self.name)
 
+    def _copy(self):
+        reference = LookupReference()
+        reference.name = self.name
+        return reference
+
+    def _computeDigest(self):
+        return hash(("LookupReference", self.name))
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
@@ -792,11 +2181,10 @@ class LookupReference(object):
         return not self == other
 
     def __hash__(self):
-        s = "LookupReference | name=%s" % self.name
-        return hash(s)
+        return self.digest()
 
 
-class LookupFlag(object):
+class LookupFlag(_Node):
 
     def __init__(self):
         self.rightToLeft = False
@@ -833,25 +2221,38 @@ class LookupFlag(object):
         return not self == other
 
     def __hash__(self):
-        s = "LookupFlag | rightToLeft=%s ignoreBaseGlyphs=%s ignoreLigatures=%s ignoreMarks=%s markAttachmentType=%s" % (
+        return self.digest()
+
+    def _copy(self):
+        flag = LookupFlag()
+        flag.rightToLeft = self.rightToLeft
+        flag.ignoreBaseGlyphs = self.ignoreBaseGlyphs
+        flag.ignoreLigatures = self.ignoreLigatures
+        flag.ignoreMarks = self.ignoreMarks
+        flag.markAttachmentType = self.markAttachmentType
+        return flag
+
+    def _computeDigest(self):
+        return hash((
             self.rightToLeft,
             self.ignoreBaseGlyphs,
             self.ignoreLigatures,
             self.ignoreMarks,
             self.markAttachmentType
-        )
-        return hash(s)
+        ))
 
 
-class GSUBSubtable(object):
+class GSUBSubtable(_Observable, _Node):
 
     def __init__(self):
         self.type = None
         self._backtrack = Sequence()
         self._lookahead = Sequence()
-        self._target = Sequence()
-        self._substitution = Sequence()
+        self._target = _NodeList(self, name="target")
+        self._substitution = _NodeList(self, name="substitution")
         self._manipulationResultedInEmptySubstitution = False
+        self._ligatureTrie = None
+        self._dirty = True
 
     # attribute setting
 
@@ -859,6 +2260,7 @@ class GSUBSubtable(object):
         return self._backtrack
 
     def _set_backtrack(self, value):
+        self._dirty = True
         self._backtrack = Sequence(value)
 
     backtrack = property(_get_backtrack, _set_backtrack)
@@ -867,6 +2269,7 @@ class GSUBSubtable(object):
         return self._lookahead
 
     def _set_lookahead(self, value):
+        self._dirty = True
         self._lookahead = Sequence(value)
 
     lookahead = property(_get_lookahead, _set_lookahead)
@@ -875,7 +2278,8 @@ class GSUBSubtable(object):
         return self._target
 
     def _set_target(self, value):
-        self._target = value
+        self._dirty = True
+        self._target = _NodeList(self, value, "target")
 
     target = property(_get_target, _set_target)
 
@@ -886,10 +2290,65 @@ class GSUBSubtable(object):
         # any setting of the value causes the flag
         # as a result of a manipulation to go away
         self._manipulationResultedInEmptySubstitution = False
-        self._substitution = value
+        self._dirty = True
+        self._substitution = _NodeList(self, value, "substitution")
 
     substitution = property(_get_substitution, _set_substitution)
 
+    def _rewriteSubstitution(self, value):
+        # compression and cleanup only rewrite the
+        # substitution so the flag is kept
+        emptied = self._manipulationResultedInEmptySubstitution
+        self.substitution = value
+        self._manipulationResultedInEmptySubstitution = emptied
+
+    # ligatures
+
+    def getLigatureTrie(self):
+        """
+        Get a LigatureTrie for a type 4 subtable. The trie is
+        cached until the subtable or anything in it changes.
+        """
+        if self.type != 4:
+            raise FeaToolsError, "Ligature tries can only be made for type 4 subtables."
+        if self._ligatureTrie is None:
+            trie = LigatureTrie()
+            for index, sequence in enumerate(self.target):
+                components = []
+                for group in sequence:
+                    if len(group) != 1 or isinstance(group[0], ClassReference):
+                        raise FeaToolsError, "Ligature components must be single glyphs."
+                    components.append(group[0])
+                ligature = self.substitution[index][0][0]
+                trie.addLigature(components, ligature)
+            # the digest registers the subtable with its
+            # children so that changes in them reach
+            # _invalidate and clear the trie
+            self.digest()
+            self._ligatureTrie = trie
+        return self._ligatureTrie
+
+    def _invalidate(self):
+        self._ligatureTrie = None
+        _Node._invalidate(self)
+
+    def pruneLigatures(self, glyphNames):
+        """
+        Remove all ligatures from a type 4 subtable that
+        have a component or ligature glyph in glyphNames.
+        """
+        removed = self.getLigatureTrie().removeGlyphs(glyphNames)
+        if removed:
+            removed = set(removed)
+            target = [sequence for index, sequence in enumerate(self.target) if index not in removed]
+            substitution = [sequence for index, sequence in enumerate(self.substitution) if index not in removed]
+            self.target = target
+            self.substitution = substitution
+        return len(removed)
+
+    def markDirty(self):
+        self._dirty = True
+
     # write
 
     def write(self, writer):
@@ -934,7 +2393,13 @@ class GSUBSubtable(object):
         self.lookahead = self._populateClassesInSequence(self.lookahead, classes)
         self.target = [self._populateClassesInSequence(i, classes) for i in self.target]
         if self.type != 3:
-            self.substitution = [self._populateClassesInSequence(i, classes) for i in self.substitution]
+            self._rewriteSubstitution([self._populateClassesInSequence(i, classes) for i in self.substitution])
+
+    def _expandClassReferences(self, classes):
+        self.backtrack = _expandClassReferencesInSequence(self.backtrack, classes)
+        self.lookahead = _expandClassReferencesInSequence(self.lookahead, classes)
+        self.target = [_expandClassReferencesInSequence(i, classes) for i in self.target]
+        self._rewriteSubstitution([_expandClassReferencesInSequence(i, classes) for i in self.substitution])
 
     def _populateClassesInSequence(self, sequence, classes):
         newSequence = Sequence()
@@ -947,9 +2412,25 @@ class GSUBSubtable(object):
             newSequence.append(member)
         return newSequence
 
+    def _computeDigest(self):
+        return hash((
+            self.type,
+            self._childDigest(self._backtrack),
+            self._childDigest(self._lookahead),
+            tuple([self._childDigest(sequence) for sequence in self._target]),
+            tuple([self._childDigest(sequence) for sequence in self._substitution])
+        ))
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
+        if self is other:
+            return True
+        # see Lookup.__eq__
+        if self.digest() != other.digest():
+            return False
+        if self.type != other.type:
+            return False
         if self.backtrack != other.backtrack:
             return False
         if self.lookahead != other.lookahead:
@@ -964,18 +2445,12 @@ class GSUBSubtable(object):
         return not self == other
 
     def __hash__(self):
-        s = "GSUBSubtable | type=%d backtrack=%s lookahead=%s target=%s substitution=%s" % (
-            self.type,
-            " ".join([str(i) for i in self.backtrack]),
-            " ".join([str(i) for i in self.lookahead]),
-            " ".join([str(i) for i in self.target]),
-            " ".join([str(i) for i in self.substitution])
-        )
-        return hash(s)
+        return self.digest()
 
     # manipulation
 
     def removeGlyphs(self, glyphNames):
+        self._dirty = True
         self._removeGlyphsFromSequence(self.backtrack, glyphNames)
         self._removeGlyphsFromSequence(self.lookahead, glyphNames)
         for sequence in self.target:
@@ -983,7 +2458,8 @@ class GSUBSubtable(object):
         hadSubstitution = bool(self.substitution)
         for sequence in self.substitution:
             self._removeGlyphsFromSequence(sequence, glyphNames)
-        if not self.substitution and hadSubstitution:
+        # the empty groups are removed by cleanup
+        if hadSubstitution and not [group for sequence in self.substitution for group in sequence if group]:
             self._manipulationResultedInEmptySubstitution = True
 
     def _removeGlyphsFromSequence(self, sequence, glyphNames):
@@ -991,6 +2467,7 @@ class GSUBSubtable(object):
             member.removeGlyphs(glyphNames)
 
     def renameGlyphs(self, glyphMapping):
+        self._dirty = True
         self._renameGlyphsInSequence(self.backtrack, glyphMapping)
         self._renameGlyphsInSequence(self.lookahead, glyphMapping)
         for sequence in self.target:
@@ -1002,36 +2479,153 @@ class GSUBSubtable(object):
         for member in sequence:
             member.renameGlyphs(glyphMapping)
 
+    def _usesGlyphs(self, glyphNames):
+        for sequence in [self._backtrack, self._lookahead] + list(self._target) + list(self._substitution):
+            if sequence._usesGlyphs(glyphNames):
+                return True
+        return False
+
+    # subsetting
+
+    def _usesOtherGlyphs(self, glyphs, classes):
+        for sequence in [self._backtrack, self._lookahead] + list(self._target) + list(self._substitution):
+            for group in sequence:
+                for member in _resolveClass(group, classes):
+                    if member not in glyphs:
+                        return True
+        return False
+
+    def _findClassNames(self):
+        names = set()
+        for sequence in [self._backtrack, self._lookahead] + list(self._target) + list(self._substitution):
+            for group in sequence:
+                for member in group:
+                    if isinstance(member, ClassReference):
+                        names.add(member.name)
+        return names
+
+    def _subset(self, glyphs):
+        # the class references must be expanded first
+        backtrack = _subsetSequence(self.backtrack, glyphs)
+        lookahead = _subsetSequence(self.lookahead, glyphs)
+        if not all(backtrack) or not all(lookahead):
+            self.target = []
+            return
+        self.backtrack = backtrack
+        self.lookahead = lookahead
+        target = []
+        substitution = []
+        for index, targetSequence in enumerate(self.target):
+            substitutionSequence = None
+            if self.substitution:
+                substitutionSequence = self.substitution[index]
+            if substitutionSequence is None:
+                newTarget = _subsetSequence(targetSequence, glyphs)
+            elif self.type != 3 and [len(group) for group in targetSequence] == [len(group) for group in substitutionSequence]:
+                # the members are substituted one to one
+                newTarget = Sequence()
+                newSubstitution = Sequence()
+                for targetGroup, substitutionGroup in zip(targetSequence, substitutionSequence):
+                    pairs = [(t, s) for t, s in zip(targetGroup, substitutionGroup) if t in glyphs and s in glyphs]
+                    newTarget.append(Class([t for t, s in pairs]))
+                    newSubstitution.append(Class([s for t, s in pairs]))
+            else:
+                newTarget = _subsetSequence(targetSequence, glyphs)
+                newSubstitution = _subsetSequence(substitutionSequence, glyphs)
+                # only alternates can be left out
+                if self.type != 3 and newSubstitution != substitutionSequence:
+                    continue
+            if not all(newTarget):
+                continue
+            target.append(newTarget)
+            if substitutionSequence is not None:
+                if not all(newSubstitution):
+                    target.pop()
+                    continue
+                substitution.append(newSubstitution)
+        self.target = target
+        self.substitution = substitution
+
+    # sharing
+
+    def _copy(self):
+        subtable = GSUBSubtable()
+        subtable.type = self.type
+        subtable._backtrack = self._backtrack._copy()
+        subtable._lookahead = self._lookahead._copy()
+        subtable._target = _NodeList(subtable, [sequence._copy() for sequence in self._target], "target")
+        subtable._substitution = _NodeList(subtable, [sequence._copy() for sequence in self._substitution], "substitution")
+        subtable._manipulationResultedInEmptySubstitution = self._manipulationResultedInEmptySubstitution
+        subtable._dirty = self._dirty
+        return subtable
+
+    def _share(self):
+        if self._shared:
+            return
+        self._shared = True
+        for sequence in [self._backtrack, self._lookahead]:
+            sequence._share()
+        for sequences in (self._target, self._substitution):
+            for sequence in sequences:
+                sequence._share()
+                _routes[id(sequence)] = sequences
+
     def cleanup(self):
-        self.backtrack.cleanup()
-        self.lookahead.cleanup()
-        new = []
-        for sequence in self.target:
-            sequence.cleanup()
-            if sequence:
-                new.append(sequence)
-        self.target = new
+        self._cleanup(set(), {})
+
+    def _cleanup(self, removedClasses, classReferences):
+        """
+        Remove references to removedClasses and empty classes and
+        sequences. The class references that remain are counted
+        in classReferences. Returns False if the subtable should
+        be removed.
+        """
+        classNames = []
+        self.backtrack._cleanup(removedClasses, classNames)
+        self.lookahead._cleanup(removedClasses, classNames)
+        self.target = self._cleanupSequences(self.target, removedClasses, classNames)
+        self._rewriteSubstitution(self._cleanupSequences(self.substitution, removedClasses, classNames))
+        keep = not self._shouldBeRemoved()
+        _countClassReferences(classNames, classReferences, keep)
+        return keep
+
+    def _cleanupShared(self, removedClasses, classReferences):
+        classNames = []
+        if self._isClean(removedClasses, classNames):
+            _countClassReferences(classNames, classReferences, True)
+            return self, True
+        copy = self._copy()
+        return copy, copy._cleanup(removedClasses, classReferences)
+
+    def _isClean(self, removedClasses, classNames):
+        """
+        Returns True if _cleanup wouldn't change the subtable.
+        The names of the referenced classes are added to classNames.
+        """
+        if self._shouldBeRemoved():
+            return False
+        sequences = list(self._target) + list(self._substitution)
+        for sequence in sequences:
+            if not sequence:
+                return False
+        for sequence in [self._backtrack, self._lookahead] + sequences:
+            for group in sequence:
+                if not group:
+                    return False
+                for member in group:
+                    if isinstance(member, ClassReference):
+                        if member.name in removedClasses:
+                            return False
+                        classNames.append(member.name)
+        return True
+
+    def _cleanupSequences(self, sequences, removedClasses, classNames):
         new = []
-        for sequence in self.substitution:
-            sequence.cleanup()
+        for sequence in sequences:
+            sequence._cleanup(removedClasses, classNames)
             if sequence:
                 new.append(sequence)
-        self.substitution = new
-
-    def _removeClassReferences(self, removedClasses):
-        self._removeClassReferencesInSequence(self.backtrack, removedClasses)
-        self._removeClassReferencesInSequence(self.lookahead, removedClasses)
-        for sequence in self.target:
-            self._removeClassReferencesInSequence(sequence, removedClasses)
-        hadSubstitution = bool(self.substitution)
-        for sequence in self.substitution:
-            self._removeClassReferencesInSequence(sequence, removedClasses)
-        if not self.substitution and hadSubstitution:
-            self._manipulationResultedInEmptySubstitution = True
-
-    def _removeClassReferencesInSequence(self, sequence, removedClasses):
-        for member in sequence:
-            member._removeClassReferences(removedClasses)
+        return new
 
     def _shouldBeRemoved(self):
         if not self.target:
@@ -1041,18 +2635,277 @@ class GSUBSubtable(object):
         return False
 
 
-class Classes(dict):
+class LigatureTrie(object):
+
+    """
+    The ligatures of a type 4 subtable keyed on their component
+    glyphs. This is a view of the subtable. The subtable's target
+    and substitution are still what is written.
+
+    Each ligature keeps the index of the rule that it came from.
+    When components appear more than once, the first rule wins,
+    as it would in a shaping engine. The indexes of the others
+    are in duplicates.
+    """
+
+    def __init__(self):
+        self._root = _LigatureTrieNode()
+        self._rules = []
+        self._glyphRules = {}
+        self._ruleCount = 0
+        self.duplicates = []
+
+    def __len__(self):
+        return self._ruleCount
+
+    def __contains__(self, components):
+        return self.get(components) is not None
+
+    def __iter__(self):
+        duplicates = set(self.duplicates)
+        for index, rule in enumerate(self._rules):
+            if rule is not None and index not in duplicates:
+                yield rule
+
+    def _getNode(self, components):
+        node = self._root
+        for glyphName in components:
+            if node.children is None or glyphName not in node.children:
+                return None
+            node = node.children[glyphName]
+        return node
+
+    def addLigature(self, components, ligature):
+        components = tuple(components)
+        index = len(self._rules)
+        self._rules.append((components, ligature))
+        self._ruleCount += 1
+        for glyphName in components + (ligature,):
+            if glyphName not in self._glyphRules:
+                self._glyphRules[glyphName] = set()
+            self._glyphRules[glyphName].add(index)
+        node = self._root
+        for glyphName in components:
+            if node.children is None:
+                node.children = {}
+            if glyphName not in node.children:
+                node.children[glyphName] = _LigatureTrieNode()
+            node = node.children[glyphName]
+        if node.index is None:
+            node.index = index
+        else:
+            self.duplicates.append(index)
+            self._ruleCount -= 1
+        return index
+
+    def get(self, components, default=None):
+        node = self._getNode(components)
+        if node is None or node.index is None:
+            return default
+        return self._rules[node.index][1]
+
+    def longestMatch(self, glyphs, start=0):
+        """
+        Find the longest ligature that matches glyphs at start.
+        Returns (components, ligature) or None.
+        """
+        found = None
+        node = self._root
+        for index in xrange(start, len(glyphs)):
+            if node.children is None:
+                break
+            node = node.children.get(glyphs[index])
+            if node is None:
+                break
+            if node.index is not None:
+                found = node.index
+        if found is None:
+            return None
+        return self._rules[found]
+
+    def getLigaturesWithPrefix(self, prefix):
+        """
+        Get a list of (components, ligature) for all ligatures
+        with components that start with prefix, in rule order.
+        """
+        node = self._getNode(prefix)
+        if node is None:
+            return []
+        indexes = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.index is not None:
+                indexes.append(node.index)
+            if node.children:
+                stack.extend(node.children.values())
+        return [self._rules[index] for index in sorted(indexes)]
 
     def removeGlyphs(self, glyphNames):
-        for group in self.values():
-            group.removeGlyphs(glyphNames)
+        """
+        Remove all ligatures that have a component or ligature
+        glyph in glyphNames. Returns a sorted list of the indexes
+        of the rules that were removed.
+        """
+        removed = set()
+        for glyphName in glyphNames:
+            removed.update(self._glyphRules.pop(glyphName, ()))
+        duplicates = set(self.duplicates)
+        for index in removed:
+            components, ligature = self._rules[index]
+            self._rules[index] = None
+            for glyphName in components + (ligature,):
+                if glyphName in self._glyphRules:
+                    self._glyphRules[glyphName].discard(index)
+            if index in duplicates:
+                duplicates.remove(index)
+                continue
+            self._ruleCount -= 1
+            self._removePath(components)
+        self.duplicates = sorted(duplicates)
+        return sorted(removed)
+
+    def _removePath(self, components):
+        path = [self._root]
+        for glyphName in components:
+            path.append(path[-1].children[glyphName])
+        path[-1].index = None
+        for depth in reversed(xrange(len(components))):
+            node = path[depth + 1]
+            if node.index is not None or node.children:
+                break
+            parent = path[depth]
+            del parent.children[components[depth]]
+            if not parent.children:
+                parent.children = None
+
+
+class _LigatureTrieNode(object):
+
+    __slots__ = ("index", "children")
+
+    def __init__(self):
+        self.index = None
+        self.children = None
+
+
+class Classes(_Node, dict):
+
+    def __getitem__(self, name):
+        members = dict.__getitem__(self, name)
+        if members._shared:
+            _routes[id(members)] = self
+        return members
+
+    def __setitem__(self, name, members):
+        if self._shared:
+            _raiseSharedError(self)
+        dict.__setitem__(self, name, members)
+        self._invalidate()
+        if _observedCount:
+            _postChange(self, name)
+
+    def __delitem__(self, name):
+        if self._shared:
+            _raiseSharedError(self)
+        dict.__delitem__(self, name)
+        self._invalidate()
+        if _observedCount:
+            _postChange(self, name)
+
+    def pop(self, *args):
+        if self._shared:
+            _raiseSharedError(self)
+        members = dict.pop(self, *args)
+        self._invalidate()
+        if _observedCount:
+            _postChange(self, args[0])
+        return members
+
+    def popitem(self):
+        if self._shared:
+            _raiseSharedError(self)
+        item = dict.popitem(self)
+        self._invalidate()
+        if _observedCount:
+            _postChange(self, item[0])
+        return item
+
+    def clear(self):
+        if self._shared:
+            _raiseSharedError(self)
+        dict.clear(self)
+        self._invalidate()
+        if _observedCount:
+            _postChange(self, None)
+
+    def update(self, *args, **kwargs):
+        for name, members in dict(*args, **kwargs).items():
+            self[name] = members
+
+    def setdefault(self, name, members=None):
+        if name not in self:
+            self[name] = members
+        return self[name]
+
+    def _computeDigest(self):
+        return hash(tuple(sorted([(name, self._childDigest(members)) for name, members in self.items()])))
+
+    def _share(self):
+        self._shared = True
+        self._shareMembers()
+
+    def _shareMembers(self):
+        for members in self.values():
+            members._share()
+            _routes[id(members)] = self
+
+    def _removeEmptyClasses(self):
+        removed = set([name for name, members in self.items() if not members])
+        for name in removed:
+            del self[name]
+        return removed
+
+    def _removeUnreferencedClasses(self, classReferences):
+        # classes that were referenced before a cleanup
+        # but are not referenced after it
+        for name in self.keys():
+            if classReferences.get(name) == 0:
+                del self[name]
+
+    def removeGlyphs(self, glyphNames):
+        for name in self.keys():
+            group = _editable(self, name, glyphNames)
+            if group is not None:
+                group.removeGlyphs(glyphNames)
 
     def renameGlyphs(self, glyphMapping):
-        for group in self.values():
-            group.renameGlyphs(glyphMapping)
+        for name in self.keys():
+            group = _editable(self, name, glyphMapping)
+            if group is not None:
+                group.renameGlyphs(glyphMapping)
+
+
+class Sequence(_NotifyingList, _Node, list):
+
+    __slots__ = ("_digest", "_owners", "_shared", "__weakref__")
+
+    __setattr__ = list.__setattr__
+
+    def __init__(self, groups=()):
+        self._digest = None
+        self._owners = None
+        self._shared = False
+        list.__init__(self, groups)
 
+    def __getitem__(self, index):
+        group = list.__getitem__(self, index)
+        if getattr(group, "_shared", False):
+            _routes[id(group)] = self
+        return group
 
-class Sequence(list):
+    def _computeDigest(self):
+        return hash(tuple([self._childDigest(group) for group in self]))
 
     def removeGlyphs(self, glyphNames):
         for group in self:
@@ -1062,20 +2915,56 @@ class Sequence(list):
         for group in self:
             group.removeGlyphs(glyphMapping)
 
+    def _usesGlyphs(self, glyphNames):
+        for group in self:
+            if group._usesGlyphs(glyphNames):
+                return True
+        return False
+
+    def _copy(self):
+        return Sequence([group._copy() for group in self])
+
+    def _share(self):
+        if self._shared:
+            return
+        self._shared = True
+        for group in self:
+            group._share()
+            _routes[id(group)] = self
+
     def cleanup(self):
+        self._cleanup(set(), [])
+
+    def _cleanup(self, removedClasses, classNames):
         new = []
         for group in self:
+            group._cleanup(removedClasses, classNames)
             if group:
                 new.append(group)
-        del self[:]
-        self.extend(new)
+        if len(new) != len(self):
+            self[:] = new
 
-    def _removeClassReferences(self, removedClasses):
-        for group in self:
-            group._removeClassReferences(removedClasses)
 
+class Class(_NotifyingList, _Node, list):
+
+    __slots__ = ("_digest", "_owners", "_shared", "__weakref__")
 
-class Class(list):
+    __setattr__ = list.__setattr__
+
+    def __init__(self, members=()):
+        self._digest = None
+        self._owners = None
+        self._shared = False
+        list.__init__(self, members)
+
+    def _computeDigest(self):
+        # most members are glyph names
+        members = []
+        for member in self:
+            if isinstance(member, _Node):
+                member = self._childDigest(member)
+            members.append(member)
+        return hash(tuple(members))
 
     def removeGlyphs(self, glyphNames):
         new = [member for member in self if member not in glyphNames]
@@ -1089,22 +2978,58 @@ class Class(list):
             del self[:]
             self.extend(new)
 
-    def _removeClassReferences(self, removedClasses):
+    def _usesGlyphs(self, glyphNames):
+        for member in self:
+            if member in glyphNames:
+                return True
+        return False
+
+    def _copy(self):
+        members = []
+        for member in self:
+            if isinstance(member, ClassReference):
+                member = member._copy()
+            members.append(member)
+        return Class(members)
+
+    def _share(self):
+        if self._shared:
+            return
+        self._shared = True
+        for member in self:
+            if isinstance(member, ClassReference):
+                member._share()
+
+    def _cleanup(self, removedClasses, classNames):
         new = []
         for member in self:
-            if isinstance(member, ClassReference) and member.name in removedClasses:
-                continue
+            if isinstance(member, ClassReference):
+                if member.name in removedClasses:
+                    continue
+                classNames.append(member.name)
             new.append(member)
-        if new != self:
-            del self[:]
-            self.extend(new)
+        if len(new) != len(self):
+            self[:] = new
 
 
-class ClassReference(object):
+class ClassReference(_Node):
+
+    __slots__ = ("name", "_digest", "_owners", "_shared", "__weakref__")
 
     def __init__(self):
+        self._digest = None
+        self._owners = None
+        self._shared = False
         self.name = None
 
+    def _computeDigest(self):
+        return hash(("ClassReference", self.name))
+
+    def _copy(self):
+        reference = ClassReference()
+        reference.name = self.name
+        return reference
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
@@ -1118,6 +3043,46 @@ class ClassReference(object):
         return hash(s)
 
 
+# ------------------
+# Compression Budget
+# ------------------
+
+_compressionStages = ["globalLookups", "featureLookups", "defaultLookups", "classes"]
+
+
+class _CompressionBudget(object):
+
+    """
+    The time and the number of candidates that each stage
+    of a compression may use. skipped lists the stages
+    that were skipped or not finished.
+    """
+
+    def __init__(self, timeBudget=None, maxCandidates=None):
+        self.end = None
+        if timeBudget is not None:
+            self.end = time.time() + timeBudget
+        self.maxCandidates = maxCandidates
+        self.skipped = []
+
+    def isLimited(self):
+        return self.end is not None or self.maxCandidates is not None
+
+    def exhausted(self, candidates=0):
+        """
+        Returns True if the current stage has looked at more than
+        maxCandidates candidates or if the time has run out.
+        """
+        if self.maxCandidates is not None and candidates > self.maxCandidates:
+            return True
+        return self.end is not None and time.time() > self.end
+
+    def skip(self, stage):
+        if stage not in self.skipped:
+            self.skipped.append(stage)
+            self.skipped.sort(key=_compressionStages.index)
+
+
 # ---------
 # Utilities
 # ---------
@@ -1128,3 +3093,322 @@ def nameClass(features, members):
 
 def nameLookup(features):
     return "_".join(features)
+
+def _makeUniqueName(baseName, usedNames):
+    counter = 1
+    while 1:
+        name = baseName + "_" + str(counter)
+        counter += 1
+        if name not in usedNames:
+            usedNames.add(name)
+            return name
+
+def _raiseSharedError(node):
+    raise FeaToolsError, "Shared %s objects can't be changed. Use Table.unshare to make private copies." % node.__class__.__name__
+
+# the list or classes that each shared object was last
+# taken from and the private copies that replaced shared
+# objects, by id, see _Node and _privateCopy
+_routes = weakref.WeakValueDictionary()
+_privateCopies = weakref.WeakValueDictionary()
+
+def _privateCopy(node):
+    """
+    Replace a shared node with a private copy in the list or
+    the classes that it was last taken from. A shared object
+    that holds those is replaced first. A node that has been
+    replaced already gets the same copy again. None is
+    returned if there is no such place that can be changed.
+    """
+    items = _routes.get(id(node))
+    if items is None:
+        return None
+    if isinstance(items, dict):
+        keys = [key for key, value in items.iteritems() if value is node]
+        owner = items
+    else:
+        keys = [index for index, item in enumerate(items) if item is node]
+        owner = items._getNode()
+    if not keys:
+        copy = _privateCopies.get(id(node))
+        if isinstance(items, dict):
+            values = items.itervalues()
+        else:
+            values = items
+        for value in values:
+            if value is copy:
+                return copy
+        return None
+    if owner._shared:
+        ownerCopy = _privateCopy(owner)
+        if ownerCopy is None:
+            return None
+        if owner is items:
+            items = ownerCopy
+        else:
+            items = getattr(ownerCopy, items._getName())
+        # the copy of the owner may have a copy of the node
+        if isinstance(items, dict):
+            copy = dict.__getitem__(items, keys[0])
+        else:
+            copy = list.__getitem__(items, keys[0])
+        if copy is not node and not copy._shared:
+            _privateCopies[id(node)] = copy
+            return copy
+    copy = _copyNode(node)
+    for key in keys:
+        items[key] = copy
+    _privateCopies[id(node)] = copy
+    return copy
+
+def _copyNode(node):
+    if isinstance(node, Feature):
+        return node._copy(_sharedLookup, _sharedClass)
+    if isinstance(node, (Script, Language)):
+        return node._copy(_sharedLookup)
+    return node._copy()
+
+def _editable(items, key, glyphNames):
+    """
+    Get items[key] for a change to glyphNames. A shared item
+    is replaced with a private copy if it uses any of the
+    glyphs. None is returned if it doesn't.
+    """
+    item = items[key]
+    if item._shared:
+        if not item._usesGlyphs(glyphNames):
+            return None
+        item = items[key] = item._copy()
+    return item
+
+def _cleanupCopy(node, *args):
+    """
+    Clean up a node. A shared node is replaced with a private
+    copy if the cleanup changes it. Returns (node, keep).
+    """
+    if node._shared:
+        return node._cleanupShared(*args)
+    return node, node._cleanup(*args)
+
+def _unshareLookup(lookup, copies):
+    # copies is {id(lookup) : (lookup, copy)} so that a
+    # lookup that is used more than once has one copy
+    if isinstance(lookup, LookupReference):
+        return lookup
+    if id(lookup) in copies:
+        return copies[id(lookup)][1]
+    copy = lookup
+    if copy._shared:
+        copy = copy._copy()
+    for index, subtable in enumerate(copy.subtables):
+        if subtable._shared:
+            copy.subtables[index] = subtable._copy()
+    copies[id(lookup)] = (lookup, copy)
+    return copy
+
+def _countClassReferences(classNames, classReferences, keep):
+    for name in classNames:
+        if name not in classReferences:
+            classReferences[name] = 0
+        if keep:
+            classReferences[name] += 1
+
+def _sharedLookup(lookup):
+    # lookup references are small and they may be changed
+    if isinstance(lookup, LookupReference):
+        return lookup._copy()
+    return lookup
+
+def _sharedClass(members):
+    return members
+
+def _compressPackedFeature(data):
+    # this runs in a process for Table._compressLookupsInProcesses
+    import marshal
+    from feaTools2.serialization import _Packer, _Unpacker
+    strings, packedFeature = marshal.loads(data)
+    feature = _Unpacker(strings).unpackFeature(packedFeature)
+    feature._compressLookups()
+    candidates = feature._findPotentialClasses()
+    packer = _Packer()
+    packedFeature = packer.packFeature(feature)
+    return marshal.dumps((tuple(packer.strings), packedFeature, candidates))
+
+def _inheritDefaultScript(feature):
+    """
+    Add the lookups of the default language of the DFLT script
+    to the default languages of the other scripts, which inherit
+    them, so that the DFLT script can be removed. Lookups that
+    are defined in the feature are moved to the first language
+    that gets them and the others get references.
+    """
+    defaultLookups = []
+    for script in feature.scripts:
+        if script.tag == "DFLT":
+            for language in script.languages:
+                if language.tag is None:
+                    defaultLookups = language.lookups
+    if not defaultLookups:
+        return
+    moved = set()
+    for script in feature.scripts:
+        if script.tag == "DFLT":
+            continue
+        for language in script.languages:
+            if language.tag is not None:
+                continue
+            lookups = []
+            for lookup in defaultLookups:
+                if isinstance(lookup, Lookup) and lookup.name is not None:
+                    if lookup.name in moved:
+                        reference = LookupReference()
+                        reference.name = lookup.name
+                        lookup = reference
+                    moved.add(lookup.name)
+                lookups.append(lookup)
+            language.lookups = _inheritLookups(lookups, language.lookups)
+
+def _subsetLookup(lookup, glyphs, classes, copies, expandedClasses):
+    # copies is {id(lookup) : (lookup, copy)}, see _unshareLookup
+    if isinstance(lookup, LookupReference):
+        return lookup
+    if id(lookup) in copies:
+        return copies[id(lookup)][1]
+    copy = lookup
+    if lookup._usesOtherGlyphs(glyphs, classes):
+        copy = lookup._copy()
+        for index, subtable in enumerate(copy.subtables):
+            if subtable._usesOtherGlyphs(glyphs, classes):
+                subtable = subtable._copy()
+                expandedClasses.update(subtable._findClassNames())
+                subtable._expandClassReferences(classes)
+                subtable._subset(glyphs)
+                copy.subtables[index] = subtable
+    copies[id(lookup)] = (lookup, copy)
+    return copy
+
+def _subsetSequence(sequence, glyphs):
+    return Sequence([Class([member for member in group if member in glyphs]) for group in sequence])
+
+def _frozenLookup(lookup, copies):
+    # copies is {id(lookup) : (lookup, copy)}, see _unshareLookup
+    if isinstance(lookup, LookupReference):
+        return lookup._copy()
+    if lookup._shared:
+        return lookup
+    if id(lookup) not in copies:
+        copy = lookup._copy()
+        copy.subtables = [subtable if subtable._shared else subtable._copy() for subtable in copy.subtables]
+        copies[id(lookup)] = (lookup, copy)
+    return copies[id(lookup)][1]
+
+def _resolveClass(group, classes):
+    # the glyph names in a group with the class references
+    # replaced by the members of the classes
+    members = []
+    for member in group:
+        if isinstance(member, ClassReference):
+            member = member.name
+        if member.startswith("@"):
+            if member not in classes:
+                raise FeaToolsError, "Unknown class %s." % member
+            members += _resolveClass(classes[member], classes)
+        else:
+            members.append(member)
+    return members
+
+def _resolveSequence(sequence, classes, groupType=tuple):
+    return tuple([groupType(_resolveClass(group, classes)) for group in sequence])
+
+def findFeatureLookups(feature, scriptTag, languageTag):
+    """
+    Get the lookups in the feature that apply to the script
+    and language, including the lookups that are inherited
+    from the default script and language.
+    """
+    defaultLookups = []
+    scriptLookups = None
+    languageLookups = None
+    includeDefault = True
+    for script in feature.scripts:
+        for language in script.languages:
+            if script.tag == "DFLT" and language.tag is None:
+                defaultLookups = language.lookups
+            elif script.tag != scriptTag:
+                continue
+            elif language.tag is None:
+                scriptLookups = language.lookups
+            elif language.tag == languageTag:
+                languageLookups = language.lookups
+                includeDefault = language.includeDefault
+    # DFLT
+    if scriptTag == "DFLT":
+        scriptLookups = defaultLookups
+    elif scriptLookups is not None:
+        scriptLookups = _inheritLookups(defaultLookups, scriptLookups)
+    # default language
+    if languageTag is None:
+        if scriptLookups is None:
+            return []
+        return scriptLookups
+    # specific language
+    if languageLookups is None:
+        return []
+    if includeDefault and scriptLookups:
+        languageLookups = _inheritLookups(scriptLookups, languageLookups)
+    return languageLookups
+
+def _inheritLookups(inherited, lookups):
+    # uncompressed tables repeat the inherited
+    # lookups at the start of every language
+    if lookups[:len(inherited)] == inherited:
+        return lookups
+    return list(inherited) + list(lookups)
+
+def _findLocalLookups(feature, globalLookups):
+    # named lookups within the feature can be referenced
+    # later in the feature
+    localLookups = dict(globalLookups)
+    for script in feature.scripts:
+        for language in script.languages:
+            for lookup in language.lookups:
+                if not isinstance(lookup, LookupReference) and lookup.name is not None:
+                    localLookups[lookup.name] = lookup
+    return localLookups
+
+def _resolveLookupReference(lookup, localLookups):
+    if isinstance(lookup, LookupReference):
+        if lookup.name not in localLookups:
+            raise FeaToolsError, "Unknown lookup %s." % lookup.name
+        lookup = localLookups[lookup.name]
+    return lookup
+
+def _expandClassReferencesInSequence(sequence, classes):
+    return Sequence([Class(_resolveClass(group, classes)) for group in sequence])
+
+def _lookupSignature(lookup):
+    # Lookup.__hash__ includes the name
+    return (hash(lookup.flag), tuple([hash(subtable) for subtable in lookup.subtables]))
+
+def _lookupStructure(lookup):
+    # this is the same before and after class compression
+    structure = []
+    for subtable in lookup.subtables:
+        structure.append((
+            subtable.type,
+            len(subtable.backtrack),
+            len(subtable.lookahead),
+            tuple([len(sequence) for sequence in subtable.target]),
+            tuple([len(sequence) for sequence in subtable.substitution])
+        ))
+    return (hash(lookup.flag), tuple(structure))
+
+def _expandedLookupKey(lookup, classes):
+    subtables = []
+    for subtable in lookup.subtables:
+        sequences = [subtable.backtrack, subtable.lookahead] + list(subtable.target) + list(subtable.substitution)
+        key = [subtable.type, len(subtable.target)]
+        for sequence in sequences:
+            key.append(_resolveSequence(sequence, classes))
+        subtables.append(tuple(key))
+    return (hash(lookup.flag), tuple(subtables))
@@ -1,7 +1,55 @@
-def parseTable(writer, table, tableTag, excludeFeatures=None):
+import marshal
+
+
+def parseTable(writer, table, tableTag, excludeFeatures=None, parsedLookups=None):
+    """
+    parsedLookups may map lookup indexes to ParsedLookup
+    objects, see parseLookupsInProcesses. These are written
+    instead of parsing the lookups again. Otherwise the
+    lookups are parsed here, each of them once.
+    """
+    features = _findFeatureRecords(table, excludeFeatures)
+    if parsedLookups is None:
+        parsedLookups = _parseLookups(table, tableTag, _findLookupIndexes(features))
+    # order the features
+    sorter = []
+    for featureTag, records in features.items():
+        indexes = []
+        for (scriptTag, languageTag, lookupIndexes) in records:
+            indexes += lookupIndexes
+        indexes = tuple(sorted(set(indexes)))
+        sorter.append((indexes, featureTag))
+    featureOrder = [featureTag for (indexes, featureTag) in sorted(sorter)]
+    # sort the script and language records
+    # grab the lookup records
+    for featureTag, records in features.items():
+        _records = []
+        for (scriptTag, languageTag, lookupIndexes) in sorted(records):
+            if scriptTag is None:
+                scriptTag = "DFLT"
+            lookupRecords = [parsedLookups[index] for index in lookupIndexes]
+            _records.append((scriptTag, languageTag, lookupRecords))
+        features[featureTag] = _records
+    # do the official packing
+    for featureTag in featureOrder:
+        records = features[featureTag]
+        feature = writer.addFeature(featureTag)
+        parseFeature(feature, table, tableTag, records)
+
+def _findLookupIndexes(features):
+    indexes = set()
+    for records in features.values():
+        for (scriptTag, languageTag, lookupIndexes) in records:
+            indexes.update(lookupIndexes)
+    return sorted(indexes)
+
+def _findFeatureRecords(table, excludeFeatures):
+    """
+    Get a dict of feature tags to lists of
+    (scriptTag, languageTag, lookupIndexes).
+    """
     if excludeFeatures is None:
         excludeFeatures = []
-    # first pass through the features
     features = {}
     for scriptRecord in table.ScriptList.ScriptRecord:
         scriptTag = scriptRecord.ScriptTag
@@ -32,30 +80,7 @@ def parseTable(writer, table, tableTag, excludeFeatures=None):
                 if featureTag not in features:
                     features[featureTag] = []
                 features[featureTag].append((scriptTag, languageTag, lookupIndexes))
-    # order the features
-    sorter = []
-    for featureTag, records in features.items():
-        indexes = []
-        for (scriptTag, languageTag, lookupIndexes) in records:
-            indexes += lookupIndexes
-        indexes = tuple(sorted(set(indexes)))
-        sorter.append((indexes, featureTag))
-    featureOrder = [featureTag for (indexes, featureTag) in sorted(sorter)]
-    # sort the script and language records
-    # grab the lookup records
-    for featureTag, records in features.items():
-        _records = []
-        for (scriptTag, languageTag, lookupIndexes) in sorted(records):
-            if scriptTag is None:
-                scriptTag = "DFLT"
-            lookupRecords = [table.LookupList.Lookup[index] for index in lookupIndexes]
-            _records.append((scriptTag, languageTag, lookupRecords))
-        features[featureTag] = _records
-    # do the official packing
-    for featureTag in featureOrder:
-        records = features[featureTag]
-        feature = writer.addFeature(featureTag)
-        parseFeature(feature, table, tableTag, records)
+    return features
 
 def parseFeature(writer, table, tableTag, records):
     for (scriptTag, languageTag, lookupRecords) in records:
@@ -69,7 +94,10 @@ def parseScript(writer, table, tableTag, languageTag, lookupRecords):
 def parseLanguage(writer, table, tableTag, lookupRecords):
     for lookupRecord in lookupRecords:
         lookup = writer.addLookup(None)
-        parseLookup(lookup, table, tableTag, lookupRecord)
+        if isinstance(lookupRecord, ParsedLookup):
+            lookupRecord.write(lookup)
+        else:
+            parseLookup(lookup, table, tableTag, lookupRecord)
 
 def parseLookup(writer, table, tableTag, lookupRecord):
     parseLookupFlag(writer, lookupRecord.LookupFlag)
@@ -101,7 +129,7 @@ def parseSubtable(writer, table, tableTag, type, subtableRecord):
         elif type == 6:
             parseGSUBLookupType6(writer, table, tableTag, subtableRecord)
         elif type == 7:
-            parseGSUBLookupType7(writer, subtableRecord)
+            parseGSUBLookupType7(writer, table, tableTag, subtableRecord)
         else:
             raise FeaToolsError, "Unknown GSUB subtable type %d" % type
     else:
@@ -220,8 +248,157 @@ def parseGSUBLookupType6(writer, table, tableTag, subtable):
                 substitution.append(newSubstitutionSequence)
     writer.addGSUBSubtable(target=target, substitution=substitution, type=6, backtrack=backtrack, lookahead=lookahead)
 
+def parseGSUBLookupType7(writer, table, tableTag, subtable):
+    # extension subtables only hold a subtable
+    # that is too far away for a regular offset
+    parseSubtable(writer, table, tableTag, subtable.ExtensionLookupType, subtable.ExtSubTable)
+
 def readCoverage(coverage):
     if not isinstance(coverage, list):
         coverage = coverage.glyphs
     coverage = list(coverage)
-    return coverage
\ No newline at end of file
+    return coverage
+
+
+# ----------------------------
+# Parsing Lookups in Processes
+# ----------------------------
+
+def parseLookupsInProcesses(path, table, tableTag, processes, excludeFeatures=None, fontNumber=-1):
+    """
+    Parse the lookups that parseTable needs for table, which is
+    from the font at path, in a pool of processes. Each lookup
+    is parsed once, no matter how many languages use it. Each
+    process opens the font and parses a share of the lookups.
+    The result maps lookup indexes to ParsedLookup objects.
+    """
+    from multiprocessing import Pool
+    indexes = _findLookupIndexes(_findFeatureRecords(table, excludeFeatures))
+    if not indexes:
+        return {}
+    # more shares than processes balances lookups
+    # that take longer than others
+    shareCount = min(len(indexes), processes * 4)
+    shares = [(path, fontNumber, tableTag, indexes[start::shareCount]) for start in range(shareCount)]
+    pool = Pool(processes)
+    try:
+        results = pool.map(_parseLookupShare, shares)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    parsedLookups = {}
+    for data in results:
+        strings, lookups = marshal.loads(data)
+        for index, flag, subtables in lookups:
+            parsedLookups[index] = ParsedLookup(strings, flag, subtables)
+    return parsedLookups
+
+def _parseLookups(table, tableTag, indexes):
+    strings, lookups = _recordLookups(table, tableTag, indexes)
+    parsedLookups = {}
+    for index, flag, subtables in lookups:
+        parsedLookups[index] = ParsedLookup(strings, flag, subtables)
+    return parsedLookups
+
+def _recordLookups(table, tableTag, indexes):
+    recorder = _LookupRecorder()
+    lookups = []
+    for index in indexes:
+        parseLookup(recorder, table, tableTag, table.LookupList.Lookup[index])
+        lookups.append((index,) + recorder.finishLookup())
+    return tuple(recorder.strings), tuple(lookups)
+
+def _parseLookupShare(share):
+    from fontTools.ttLib import TTFont
+    path, fontNumber, tableTag, indexes = share
+    # lazy loading only reads the lookups in the share
+    font = TTFont(path, fontNumber=fontNumber, lazy=True)
+    try:
+        result = _recordLookups(font[tableTag].table, tableTag, indexes)
+    finally:
+        font.close()
+    return marshal.dumps(result)
+
+
+class _LookupRecorder(object):
+
+    """
+    Records what parseLookup writes. Glyph names are
+    stored as indexes into a list of strings.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._stringIndexes = {}
+        self._flag = None
+        self._subtables = []
+
+    def finishLookup(self):
+        lookup = (self._flag, tuple(self._subtables))
+        self._flag = None
+        self._subtables = []
+        return lookup
+
+    def addLookupFlag(self, **kwargs):
+        self._flag = kwargs
+
+    def addGSUBSubtable(self, target, substitution, type, backtrack=[], lookahead=[]):
+        self._subtables.append((
+            type,
+            tuple([self._packSequence(sequence) for sequence in target]),
+            tuple([self._packSequence(sequence) for sequence in substitution]),
+            self._packSequence(backtrack),
+            self._packSequence(lookahead)
+        ))
+
+    def _packSequence(self, sequence):
+        return tuple([tuple([self._packString(member) for member in group]) for group in sequence])
+
+    def _packString(self, string):
+        index = self._stringIndexes.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self._stringIndexes[string] = index
+        return index
+
+
+class ParsedLookup(object):
+
+    """
+    A lookup that was parsed once, here or in another
+    process. write makes the same writer calls that
+    parseLookup made.
+    """
+
+    def __init__(self, strings, flag, subtables):
+        self.strings = strings
+        self.flag = flag
+        self.subtables = subtables
+        self._arguments = None
+
+    def write(self, writer):
+        # lookups that are used by more than one language
+        # give the same lists to the writer each time.
+        # the writers don't change them.
+        if self._arguments is None:
+            self._arguments = [
+                dict(
+                    target=[self._unpackSequence(sequence) for sequence in target],
+                    substitution=[self._unpackSequence(sequence) for sequence in substitution],
+                    type=type,
+                    backtrack=self._unpackSequence(backtrack),
+                    lookahead=self._unpackSequence(lookahead)
+                )
+                for type, target, substitution, backtrack, lookahead in self.subtables
+            ]
+        writer.addLookupFlag(**self.flag)
+        for arguments in self._arguments:
+            writer.addGSUBSubtable(**arguments)
+
+    def _unpackSequence(self, sequence):
+        strings = self.strings
+        return [[strings[index] for index in group] for group in sequence]
@@ -0,0 +1,211 @@
+"""
+Convert Tables objects to and from plain Python data.
+
+The data only contains tuples, strings, numbers, booleans
+and None so that it can be written quickly with marshal.
+Glyph, class and lookup names are stored once in a string
+table and are referenced by index. A class reference is
+stored as -(index + 1).
+"""
+
+import marshal
+from feaTools2 import FeaToolsError
+from feaTools2.objects import Tables, Table, Feature, Script, Language, Lookup,\
+    LookupReference, LookupFlag, GSUBSubtable, Sequence, Class, ClassReference
+
+
+dataFormatVersion = 2
+
+
+def packTables(tables):
+    packer = _Packer()
+    gsub = packer.packTable(tables["GSUB"])
+    gpos = packer.packTable(tables["GPOS"])
+    return (dataFormatVersion, tuple(packer.strings), gsub, gpos)
+
+def unpackTables(data):
+    version, strings, gsub, gpos = data
+    if version != dataFormatVersion:
+        raise FeaToolsError, "Unsupported data format version %s." % version
+    unpacker = _Unpacker(strings)
+    tables = Tables()
+    unpacker.unpackTable(tables["GSUB"], gsub)
+    unpacker.unpackTable(tables["GPOS"], gpos)
+    return tables
+
+def dumpsTables(tables):
+    return marshal.dumps(packTables(tables))
+
+def loadsTables(text):
+    return unpackTables(marshal.loads(text))
+
+def dumpsTable(table):
+    packer = _Packer()
+    data = packer.packTable(table)
+    return marshal.dumps((dataFormatVersion, tuple(packer.strings), data))
+
+def loadsTable(text):
+    version, strings, data = marshal.loads(text)
+    if version != dataFormatVersion:
+        raise FeaToolsError, "Unsupported data format version %s." % version
+    table = Table()
+    _Unpacker(strings).unpackTable(table, data)
+    return table
+
+
+class _Packer(object):
+
+    def __init__(self):
+        self.strings = []
+        self._stringIndexes = {}
+
+    def packString(self, string):
+        if string is None:
+            return None
+        index = self._stringIndexes.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self._stringIndexes[string] = index
+        return index
+
+    def packTable(self, table):
+        return (
+            table.tag,
+            table._compressed,
+            self.packClasses(table.classes),
+            tuple([self.packLookup(lookup) for lookup in table.lookups]),
+            tuple([self.packFeature(feature) for feature in table])
+        )
+
+    def packClasses(self, classes):
+        return tuple([(self.packString(name), self.packClass(members)) for name, members in sorted(classes.items())])
+
+    def packFeature(self, feature):
+        scripts = []
+        for script in feature.scripts:
+            languages = []
+            for language in script.languages:
+                lookups = []
+                for lookup in language.lookups:
+                    if isinstance(lookup, LookupReference):
+                        lookups.append(self.packString(lookup.name))
+                    else:
+                        lookups.append(self.packLookup(lookup))
+                languages.append((language.tag, language.includeDefault, tuple(lookups)))
+            scripts.append((script.tag, tuple(languages)))
+        return (feature.tag, self.packClasses(feature.classes), tuple(scripts))
+
+    def packLookup(self, lookup):
+        flag = lookup.flag
+        flag = (flag.rightToLeft, flag.ignoreBaseGlyphs, flag.ignoreLigatures, flag.ignoreMarks, flag.markAttachmentType)
+        subtables = []
+        for subtable in lookup.subtables:
+            subtables.append((
+                subtable.type,
+                self.packSequence(subtable.backtrack),
+                self.packSequence(subtable.lookahead),
+                tuple([self.packSequence(sequence) for sequence in subtable.target]),
+                tuple([self.packSequence(sequence) for sequence in subtable.substitution]),
+                subtable._manipulationResultedInEmptySubstitution
+            ))
+        return (self.packString(lookup.name), flag, tuple(subtables))
+
+    def packSequence(self, sequence):
+        return tuple([self.packClass(group) for group in sequence])
+
+    def packClass(self, group):
+        members = []
+        stringIndexes = self._stringIndexes
+        for member in group:
+            if isinstance(member, ClassReference):
+                members.append(-(self.packString(member.name) + 1))
+                continue
+            # most glyph names have been packed before
+            index = stringIndexes.get(member)
+            if index is None:
+                index = self.packString(member)
+            members.append(index)
+        return tuple(members)
+
+
+class _Unpacker(object):
+
+    def __init__(self, strings):
+        self.strings = strings
+
+    def unpackString(self, index):
+        if index is None:
+            return None
+        return self.strings[index]
+
+    def unpackTable(self, table, data):
+        tag, compressed, classes, lookups, features = data
+        table.tag = tag
+        self.unpackClasses(table.classes, classes)
+        table.lookups = [self.unpackLookup(lookup) for lookup in lookups]
+        table.extend([self.unpackFeature(feature) for feature in features])
+        table._compressed = compressed
+        if compressed:
+            table._clearDirty()
+
+    def unpackClasses(self, classes, data):
+        for name, members in data:
+            classes[self.unpackString(name)] = self.unpackClass(members)
+
+    def unpackFeature(self, data):
+        tag, classes, scripts = data
+        feature = Feature()
+        feature.tag = tag
+        self.unpackClasses(feature.classes, classes)
+        for scriptTag, languages in scripts:
+            script = Script()
+            script.tag = scriptTag
+            for languageTag, includeDefault, lookups in languages:
+                language = Language()
+                language.tag = languageTag
+                language.includeDefault = includeDefault
+                for lookup in lookups:
+                    if isinstance(lookup, tuple):
+                        lookup = self.unpackLookup(lookup)
+                    else:
+                        name = self.unpackString(lookup)
+                        lookup = LookupReference()
+                        lookup.name = name
+                    language.lookups.append(lookup)
+                script.languages.append(language)
+            feature.scripts.append(script)
+        return feature
+
+    def unpackLookup(self, data):
+        name, flag, subtables = data
+        lookup = Lookup()
+        lookup.name = self.unpackString(name)
+        lookupFlag = LookupFlag()
+        lookupFlag.rightToLeft, lookupFlag.ignoreBaseGlyphs, lookupFlag.ignoreLigatures, lookupFlag.ignoreMarks, lookupFlag.markAttachmentType = flag
+        lookup.flag = lookupFlag
+        for type, backtrack, lookahead, target, substitution, emptied in subtables:
+            subtable = GSUBSubtable()
+            subtable.type = type
+            subtable.backtrack = self.unpackSequence(backtrack)
+            subtable.lookahead = self.unpackSequence(lookahead)
+            subtable.target = [self.unpackSequence(sequence) for sequence in target]
+            subtable.substitution = [self.unpackSequence(sequence) for sequence in substitution]
+            subtable._manipulationResultedInEmptySubstitution = emptied
+            lookup.subtables.append(subtable)
+        return lookup
+
+    def unpackSequence(self, data):
+        return Sequence([self.unpackClass(group) for group in data])
+
+    def unpackClass(self, data):
+        strings = self.strings
+        group = Class()
+        for index in data:
+            if index < 0:
+                member = ClassReference()
+                member.name = strings[-index - 1]
+            else:
+                member = strings[index]
+            group.append(member)
+        return group
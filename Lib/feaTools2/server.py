@@ -0,0 +1,479 @@
+"""
+A local server that keeps decompiled fonts in memory.
+
+    featools2-server --port 8765
+    curl "http://127.0.0.1:8765/fea?font=/fonts/Text.otf&feature=liga"
+
+Editors and build tools can ask the server instead of starting a
+new process, importing fontTools and parsing the font for every
+question. The queries are GET requests and the font is given
+by its path in the font parameter:
+
+    /fea?font=PATH&feature=TAG      .fea text, feature is optional
+    /lookups?font=PATH              the names of the lookups
+    /lookup?font=PATH&name=NAME     the dump of a lookup
+    /lookup?font=PATH&index=N       the dump of the Nth lookup in /lookups
+    /glyph?font=PATH&glyph=NAME     the lookups that use a glyph
+    /status                         the cached fonts and the counts
+
+The server is stopped with a POST request:
+
+    /shutdown                       stop the server
+
+Text is returned as text/plain and everything else as JSON.
+Errors are JSON objects with an "error" key. Lookups without a
+name are named by their position: feature/script/language/index.
+
+The GSUB tables of up to maxFonts fonts are kept. A font is
+decompiled again when its modification time or size changes.
+Every request checks the file and a watcher thread checks the
+cached fonts every interval seconds, so changed fonts are usually
+decompiled before they are asked for again.
+
+The server only listens on the loopback interface by default
+and it reads any font that the user running it can read. Web
+pages can send requests to it too, so requests are refused with
+403 when their Host header is not the address of the server, as
+happens with DNS rebinding, and POST requests are refused when
+they come from another origin. Other names for the server can
+be given in allowedHosts.
+"""
+
+import os
+import sys
+import json
+import time
+import urlparse
+import threading
+import BaseHTTPServer
+import SocketServer
+from collections import OrderedDict
+from optparse import OptionParser
+from feaTools2 import FeaToolsError
+
+
+# -----
+# Fonts
+# -----
+
+class FontStore(object):
+
+    """
+    A least recently used cache of decompiled fonts. cache is
+    given to decompileBinaryToObject.
+    """
+
+    def __init__(self, maxFonts=8, cache=None):
+        self.maxFonts = maxFonts
+        self.cache = cache
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+        # fonts are decompiled one at a time
+        self._loadLock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fonts)
+
+    def get(self, path):
+        """
+        Get the _FontEntry for a font, decompiling
+        the font if needed.
+        """
+        path = os.path.abspath(path)
+        signature = _getSignature(path)
+        if signature is None:
+            self.remove(path)
+            raise FeaToolsError, "There is no font at %s." % path
+        entry = self._getEntry(path, signature)
+        if entry is not None:
+            return entry
+        self._loadLock.acquire()
+        try:
+            # another thread may have loaded it
+            entry = self._getEntry(path, signature)
+            if entry is not None:
+                return entry
+            return self._load(path, signature)
+        finally:
+            self._loadLock.release()
+
+    def _getEntry(self, path, signature):
+        self._lock.acquire()
+        try:
+            entry = self._fonts.get(path)
+            if entry is None or entry.signature != signature:
+                return None
+            del self._fonts[path]
+            self._fonts[path] = entry
+            self.hits += 1
+            return entry
+        finally:
+            self._lock.release()
+
+    def _load(self, path, signature):
+        from fontTools.ttLib import TTFont
+        from feaTools2 import decompileBinaryToObject
+        start = time.time()
+        font = TTFont(path)
+        try:
+            tables = decompileBinaryToObject(font, cache=self.cache)
+        finally:
+            font.close()
+        entry = _FontEntry(path, signature, tables["GSUB"], time.time() - start)
+        self._lock.acquire()
+        try:
+            self._fonts.pop(path, None)
+            self._fonts[path] = entry
+            self.loads += 1
+            while len(self._fonts) > self.maxFonts:
+                self._fonts.popitem(last=False)
+                self.evictions += 1
+        finally:
+            self._lock.release()
+        return entry
+
+    def remove(self, path):
+        self._lock.acquire()
+        try:
+            self._fonts.pop(os.path.abspath(path), None)
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        """
+        Decompile the cached fonts that have changed and
+        remove the ones that don't exist anymore.
+        """
+        self._lock.acquire()
+        try:
+            entries = self._fonts.values()
+        finally:
+            self._lock.release()
+        for entry in entries:
+            signature = _getSignature(entry.path)
+            if signature is None:
+                self.remove(entry.path)
+            elif signature != entry.signature:
+                try:
+                    self.get(entry.path)
+                except Exception:
+                    # the font may be half written
+                    self.remove(entry.path)
+
+    def getStatus(self):
+        self._lock.acquire()
+        try:
+            fonts = [dict(path=entry.path, seconds=entry.loadTime, features=len(entry.table)) for entry in self._fonts.values()]
+        finally:
+            self._lock.release()
+        return dict(fonts=fonts, hits=self.hits, loads=self.loads, evictions=self.evictions, maxFonts=self.maxFonts)
+
+
+def _getSignature(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return (info.st_mtime, info.st_size)
+
+
+class _FontEntry(object):
+
+    """
+    A decompiled font and the answers that have been
+    made from it. The table is not changed.
+    """
+
+    def __init__(self, path, signature, table, loadTime):
+        self.path = path
+        self.signature = signature
+        self.table = table
+        self.loadTime = loadTime
+        self._lookups = None
+        self._glyphs = None
+        self._fea = {}
+        self._lock = threading.Lock()
+
+    def getFea(self, featureTag=None):
+        from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+        self._lock.acquire()
+        try:
+            if featureTag not in self._fea:
+                table = self.table
+                if featureTag is not None:
+                    if featureTag not in [feature.tag for feature in table]:
+                        raise FeaToolsError, "There is no %s feature." % featureTag
+                    table = table.subset(features=[featureTag])
+                writer = FeaSyntaxWriter(filterRedundancies=True)
+                table.write(writer)
+                self._fea[featureTag] = writer.write()
+            return self._fea[featureTag]
+        finally:
+            self._lock.release()
+
+    def getLookups(self):
+        """
+        Get an OrderedDict of lookup names to (lookup, classes).
+        """
+        self._lock.acquire()
+        try:
+            if self._lookups is None:
+                self._lookups = _findLookups(self.table)
+            return self._lookups
+        finally:
+            self._lock.release()
+
+    def getLookupDump(self, name=None, index=None):
+        from feaTools2.writers.dumpWriter import DumpWriter
+        lookups = self.getLookups()
+        if index is not None:
+            if not 0 <= index < len(lookups):
+                raise FeaToolsError, "There is no lookup %d." % index
+            name = lookups.keys()[index]
+        if name not in lookups:
+            raise FeaToolsError, "There is no lookup named %s." % name
+        lookup = lookups[name][0]
+        writer = DumpWriter()
+        lookup.write(writer.addLookup(name))
+        return writer.dump()
+
+    def getGlyphLookups(self, glyphName):
+        lookups = self.getLookups()
+        self._lock.acquire()
+        try:
+            if self._glyphs is None:
+                self._glyphs = _indexGlyphs(lookups)
+            return self._glyphs.get(glyphName, [])
+        finally:
+            self._lock.release()
+
+
+def _findLookups(table):
+    from feaTools2.objects import LookupReference
+    lookups = OrderedDict()
+    for lookup in table.lookups:
+        lookups[lookup.name] = (lookup, table.classes)
+    for feature in table:
+        classes = dict(table.classes)
+        classes.update(feature.classes)
+        for script in feature.scripts:
+            for language in script.languages:
+                for index, lookup in enumerate(language.lookups):
+                    if isinstance(lookup, LookupReference):
+                        continue
+                    name = lookup.name
+                    if name is None:
+                        name = "%s/%s/%s/%d" % (feature.tag, script.tag, (language.tag or "dflt").strip(), index)
+                    lookups[name] = (lookup, classes)
+    return lookups
+
+def _indexGlyphs(lookups):
+    from feaTools2.objects import _resolveClass
+    glyphs = {}
+    for name, (lookup, classes) in lookups.items():
+        used = set()
+        for subtable in lookup.subtables:
+            for sequence in [subtable.backtrack, subtable.lookahead] + list(subtable.target) + list(subtable.substitution):
+                for group in sequence:
+                    used.update(_resolveClass(group, classes))
+        for glyphName in used:
+            glyphs.setdefault(glyphName, []).append(name)
+    return glyphs
+
+
+# ------
+# Server
+# ------
+
+class FeaToolsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, store=None, interval=1.0, verbose=False, allowedHosts=None):
+        BaseHTTPServer.HTTPServer.__init__(self, address, _RequestHandler)
+        if store is None:
+            store = FontStore()
+        self.store = store
+        self.verbose = verbose
+        # the Host headers that requests may have
+        host, port = self.server_address[:2]
+        names = [host]
+        if host.startswith("127.") or host == "::1":
+            names.append("localhost")
+        if allowedHosts:
+            names += allowedHosts
+        self.allowedHosts = set()
+        for name in names:
+            if ":" in name:
+                name = "[%s]" % name
+            self.allowedHosts.add("%s:%d" % (name, port))
+        self._watcher = None
+        if interval:
+            self._watcher = _Watcher(store, interval)
+            self._watcher.start()
+
+    def getURL(self):
+        host, port = self.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def server_close(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher.join()
+        BaseHTTPServer.HTTPServer.server_close(self)
+
+
+class _Watcher(threading.Thread):
+
+    def __init__(self, store, interval):
+        threading.Thread.__init__(self, name="feaTools2 font watcher")
+        self.daemon = True
+        self.store = store
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.store.refresh()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self._handle("get")
+
+    def do_POST(self):
+        # browsers send the origin of cross site posts
+        origin = self.headers.get("Origin")
+        if origin is not None and urlparse.urlparse(origin).netloc not in self.server.allowedHosts:
+            self._send(403, dict(error="Requests from %s are not allowed." % origin))
+            return
+        self._handle("post")
+
+    def _handle(self, requestType):
+        if self.headers.get("Host") not in self.server.allowedHosts:
+            self._send(403, dict(error="The host %s is not allowed." % self.headers.get("Host")))
+            return
+        url = urlparse.urlparse(self.path)
+        parameters = dict([(key, values[-1]) for key, values in urlparse.parse_qs(url.query).items()])
+        name = url.path.strip("/")
+        method = getattr(self, "_%s_%s" % (requestType, name), None)
+        if method is None:
+            otherType = dict(get="post", post="get")[requestType]
+            if hasattr(self, "_%s_%s" % (otherType, name)):
+                self._send(405, dict(error="%s needs a %s request." % (url.path, otherType.upper())))
+            else:
+                self._send(404, dict(error="Unknown request %s." % url.path))
+            return
+        try:
+            result = method(parameters)
+        except FeaToolsError, error:
+            self._send(400, dict(error=str(error)))
+            return
+        except Exception, error:
+            self._send(500, dict(error="%s: %s" % (error.__class__.__name__, error)))
+            return
+        self._send(200, result)
+
+    def _send(self, status, result):
+        if isinstance(result, basestring):
+            contentType = "text/plain; charset=utf-8"
+            if isinstance(result, unicode):
+                result = result.encode("utf-8")
+        else:
+            contentType = "application/json"
+            result = json.dumps(result)
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    # requests
+
+    def _getFont(self, parameters):
+        path = parameters.get("font")
+        if not path:
+            raise FeaToolsError, "No font was given."
+        return self.server.store.get(path)
+
+    def _get_fea(self, parameters):
+        return self._getFont(parameters).getFea(parameters.get("feature"))
+
+    def _get_lookups(self, parameters):
+        return self._getFont(parameters).getLookups().keys()
+
+    def _get_lookup(self, parameters):
+        entry = self._getFont(parameters)
+        index = parameters.get("index")
+        if index is not None:
+            try:
+                index = int(index)
+            except ValueError:
+                raise FeaToolsError, "The index %s is not a number." % index
+        elif "name" not in parameters:
+            raise FeaToolsError, "No lookup name or index was given."
+        return entry.getLookupDump(name=parameters.get("name"), index=index)
+
+    def _get_glyph(self, parameters):
+        glyphName = parameters.get("glyph")
+        if not glyphName:
+            raise FeaToolsError, "No glyph was given."
+        return self._getFont(parameters).getGlyphLookups(glyphName)
+
+    def _get_status(self, parameters):
+        return self.server.store.getStatus()
+
+    def _post_shutdown(self, parameters):
+        # shutdown waits for the serving loop
+        # so it can't be called by this thread
+        thread = threading.Thread(target=self.server.shutdown)
+        thread.daemon = True
+        thread.start()
+        return dict(stopping=True)
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options] [font ...]")
+    parser.add_option("--host", default="127.0.0.1",
+        help="The address to listen on. The default is 127.0.0.1.")
+    parser.add_option("-p", "--port", type="int", default=8765,
+        help="The port to listen on. 0 picks a free port. The default is 8765.")
+    parser.add_option("--max-fonts", dest="maxFonts", type="int", default=8,
+        help="The number of decompiled fonts to keep. The default is 8.")
+    parser.add_option("--interval", type="float", default=1.0,
+        help="Seconds between checks for changed fonts. 0 turns the checks off. The default is 1.")
+    parser.add_option("--cache", default=None,
+        help="A directory for a feaTools2.cache.DiskCache.")
+    parser.add_option("--allow-host", dest="allowedHosts", action="append", default=[],
+        help="Another name for the server that requests may use in their Host header. Can be given more than once.")
+    parser.add_option("-v", "--verbose", action="store_true", default=False,
+        help="Log the requests.")
+    options, arguments = parser.parse_args(args)
+    store = FontStore(maxFonts=options.maxFonts, cache=options.cache)
+    # the fonts that were given are decompiled before serving
+    for path in arguments:
+        store.get(path)
+    server = FeaToolsServer((options.host, options.port), store, interval=options.interval, verbose=options.verbose, allowedHosts=options.allowedHosts)
+    sys.stderr.write("Serving on %s\n" % server.getURL())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Apply the GSUB lookups in a Table object to glyph runs.
+
+This is not a complete shaping engine. It exists so that
+large corpora can be pushed through two versions of a table
+to find the runs that are substituted differently.
+
+- Features are applied in the order that they occur in the
+  table. A lookup that is referenced by more than one of the
+  features is only applied once.
+- Lookup flags are ignored. The objects don't have glyph
+  class definitions so there is no way to honor them.
+- Alternate substitutions (type 3) use the first alternate.
+"""
+
+from feaTools2 import FeaToolsError
+from feaTools2.objects import _resolveClass, _resolveSequence, findFeatureLookups, _findLocalLookups,\
+    _resolveLookupReference
+
+
+# rule actions
+
+_SINGLE = 0
+_LIGATURE = 1
+_IGNORE = 2
+
+
+class CompiledTable(object):
+
+    """
+    A GSUB table compiled for one script and language.
+    Every lookup is compiled once into a dict of rules
+    keyed by the first glyph in each rule's input.
+    """
+
+    def __init__(self, table, features=None, script="DFLT", language=None):
+        if table.tag != "GSUB":
+            raise FeaToolsError, "Only GSUB tables can be compiled."
+        script, language = _findLanguageSystem(table, script, language)
+        self.script = script
+        self.language = language
+        self.lookups = []
+        compiled = {}
+        for lookup, classes in findLookups(table, features, script, language):
+            key = id(lookup)
+            if key not in compiled:
+                compiled[key] = CompiledLookup(lookup, classes)
+            self.lookups.append(compiled[key])
+
+    def apply(self, glyphs):
+        glyphs = list(glyphs)
+        for lookup in self.lookups:
+            lookup.apply(glyphs)
+        return tuple(glyphs)
+
+
+class CompiledLookup(object):
+
+    def __init__(self, lookup, classes):
+        self.name = lookup.name
+        self.rules = {}
+        for subtable in lookup.subtables:
+            for firstGlyphs, rule in _compileSubtable(subtable, classes):
+                for glyphName in firstGlyphs:
+                    if glyphName not in self.rules:
+                        self.rules[glyphName] = []
+                    self.rules[glyphName].append(rule)
+
+    def apply(self, glyphs):
+        """
+        Apply the lookup to the list of glyph names in place.
+        """
+        rules = self.rules
+        if not rules:
+            return
+        index = 0
+        while index < len(glyphs):
+            advance = 1
+            candidates = rules.get(glyphs[index])
+            if candidates:
+                for rule in candidates:
+                    matched = _applyRule(rule, glyphs, index)
+                    if matched:
+                        advance = matched
+                        break
+            index += advance
+
+
+# ------------
+# Lookup Order
+# ------------
+
+def findLookups(table, features=None, script="DFLT", language=None):
+    """
+    Get a list of (lookup, classes) for the features in the table
+    that apply to the given script and language. Lookup references
+    are resolved and a lookup that has already been seen is skipped.
+    """
+    globalLookups = {}
+    for lookup in table.lookups:
+        globalLookups[lookup.name] = lookup
+    result = []
+    seen = set()
+    for feature in table:
+        if features is not None and feature.tag not in features:
+            continue
+        classes = dict(table.classes)
+        classes.update(feature.classes)
+        lookups = findFeatureLookups(feature, script, language)
+        localLookups = _findLocalLookups(feature, globalLookups)
+        for lookup in lookups:
+            lookup = _resolveLookupReference(lookup, localLookups)
+            if id(lookup) in seen:
+                continue
+            seen.add(id(lookup))
+            result.append((lookup, classes))
+    return result
+
+def _findLanguageSystem(table, scriptTag, languageTag):
+    # fall back to DFLT and the default language
+    # in the same way that a shaping engine would
+    languageSystems = {}
+    for feature in table:
+        for script in feature.scripts:
+            if script.tag not in languageSystems:
+                languageSystems[script.tag] = set()
+            for language in script.languages:
+                languageSystems[script.tag].add(language.tag)
+    if scriptTag not in languageSystems:
+        scriptTag = "DFLT"
+    if languageTag not in languageSystems.get(scriptTag, ()):
+        languageTag = None
+    return scriptTag, languageTag
+
+
+# -----------
+# Compilation
+# -----------
+
+def _compileSingle(targetSequence, substitutionSequence, classes):
+    target = _resolveClass(targetSequence[0], classes)
+    substitution = _resolveClass(substitutionSequence[0], classes)
+    if len(substitution) == 1:
+        substitution = substitution * len(target)
+    return dict(zip(target, substitution))
+
+def _compileSubtable(subtable, classes):
+    rules = []
+    if subtable.type in (1, 3):
+        mapping = {}
+        for index, targetSequence in enumerate(subtable.target):
+            substitutionSequence = subtable.substitution[index]
+            if subtable.type == 3:
+                target = _resolveClass(targetSequence[0], classes)
+                alternates = _resolveClass(substitutionSequence[0], classes)
+                for glyphName in target:
+                    mapping[glyphName] = alternates[0]
+            else:
+                mapping.update(_compileSingle(targetSequence, substitutionSequence, classes))
+        rule = ((), (), (), _SINGLE, mapping)
+        rules.append((mapping.keys(), rule))
+    elif subtable.type == 4:
+        for index, targetSequence in enumerate(subtable.target):
+            target = _resolveSequence(targetSequence, classes, frozenset)
+            ligature = _resolveClass(subtable.substitution[index][0], classes)[0]
+            rule = ((), target[1:], (), _LIGATURE, ligature)
+            rules.append((target[0], rule))
+    elif subtable.type == 6:
+        backtrack = _resolveSequence(subtable.backtrack, classes, frozenset)
+        lookahead = _resolveSequence(subtable.lookahead, classes, frozenset)
+        for index, targetSequence in enumerate(subtable.target):
+            target = _resolveSequence(targetSequence, classes, frozenset)
+            # ignore
+            if not subtable.substitution:
+                rule = (backtrack, target[1:], lookahead, _IGNORE, None)
+                rules.append((target[0], rule))
+            # single
+            elif len(targetSequence) == 1:
+                mapping = _compileSingle(targetSequence, subtable.substitution[index], classes)
+                rule = (backtrack, (), lookahead, _SINGLE, mapping)
+                rules.append((mapping.keys(), rule))
+            # ligature
+            else:
+                ligature = _resolveClass(subtable.substitution[index][0], classes)[0]
+                rule = (backtrack, target[1:], lookahead, _LIGATURE, ligature)
+                rules.append((target[0], rule))
+    else:
+        raise FeaToolsError, "Can't apply GSUB subtable type %s." % subtable.type
+    return rules
+
+def _applyRule(rule, glyphs, index):
+    """
+    Returns the number of glyphs to advance
+    or 0 if the rule doesn't match.
+    """
+    backtrack, input, lookahead, action, value = rule
+    end = index + 1 + len(input)
+    if end + len(lookahead) > len(glyphs) or index < len(backtrack):
+        return 0
+    for offset, members in enumerate(input):
+        if glyphs[index + 1 + offset] not in members:
+            return 0
+    for offset, members in enumerate(reversed(backtrack)):
+        if glyphs[index - 1 - offset] not in members:
+            return 0
+    for offset, members in enumerate(lookahead):
+        if glyphs[end + offset] not in members:
+            return 0
+    if action == _SINGLE:
+        glyphs[index] = value[glyphs[index]]
+    elif action == _LIGATURE:
+        glyphs[index:end] = [value]
+        return 1
+    return end - index
+
+
+# ----------
+# Batch APIs
+# ----------
+
+def shapeCorpus(table, corpus, features=None, script="DFLT", language=None, processes=None, chunkSize=1000):
+    """
+    Apply the table to every glyph run in corpus. Returns
+    a dict of {run : output} with the runs as tuples.
+    """
+    compiledTables = [CompiledTable(table, features=features, script=script, language=language)]
+    result = {}
+    for run, outputs in _processCorpus(compiledTables, corpus, processes, chunkSize, False):
+        result[run] = outputs[0]
+    return result
+
+def diffCorpus(table1, table2, corpus, features=None, script="DFLT", language=None, processes=None, chunkSize=1000):
+    """
+    Apply both tables to every glyph run in corpus. Returns
+    a list of (run, output1, output2) for the runs that are
+    shaped differently by the two tables. The list is in the
+    order in which the runs first occur in the corpus.
+    """
+    compiledTables = [
+        CompiledTable(table1, features=features, script=script, language=language),
+        CompiledTable(table2, features=features, script=script, language=language)
+    ]
+    result = []
+    for run, (output1, output2) in _processCorpus(compiledTables, corpus, processes, chunkSize, True):
+        result.append((run, output1, output2))
+    return result
+
+def _processCorpus(compiledTables, corpus, processes, chunkSize, changedOnly):
+    # remove duplicate runs
+    runs = []
+    seen = set()
+    for run in corpus:
+        run = tuple(run)
+        if run in seen:
+            continue
+        seen.add(run)
+        runs.append(run)
+    del seen
+    chunks = [runs[i:i + chunkSize] for i in xrange(0, len(runs), chunkSize)]
+    # serial
+    if not processes or processes == 1 or len(chunks) < 2:
+        for chunk in chunks:
+            for item in _shapeRuns(compiledTables, chunk, changedOnly):
+                yield item
+    # parallel
+    else:
+        from multiprocessing import Pool
+        pool = Pool(processes, initializer=_initWorker, initargs=(compiledTables, changedOnly))
+        try:
+            for result in pool.imap(_shapeWorkerChunk, chunks):
+                for item in result:
+                    yield item
+        finally:
+            pool.terminate()
+
+def _shapeRuns(compiledTables, runs, changedOnly):
+    result = []
+    for run in runs:
+        outputs = [compiledTable.apply(run) for compiledTable in compiledTables]
+        if changedOnly and outputs.count(outputs[0]) == len(outputs):
+            continue
+        result.append((run, outputs))
+    return result
+
+_workerState = None
+
+def _initWorker(compiledTables, changedOnly):
+    global _workerState
+    _workerState = (compiledTables, changedOnly)
+
+def _shapeWorkerChunk(runs):
+    compiledTables, changedOnly = _workerState
+    return _shapeRuns(compiledTables, runs, changedOnly)
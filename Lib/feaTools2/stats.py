@@ -0,0 +1,160 @@
+"""
+Timing and counters for decompiling.
+
+    stats = DecompileStats()
+    tables = decompileBinaryToObject(path, stats=stats)
+    print stats.report()
+
+Nothing is timed or counted unless a DecompileStats object is
+given. The __eq__ and __hash__ methods of the lookup and subtable
+objects are only replaced with counting versions while a call
+that was given a DecompileStats object is running. Calls that
+are made in other threads at the same time are counted too.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class DecompileStats(object):
+
+    """
+    times maps phase names to seconds, in the order that the
+    phases started. counts maps names to numbers. skipped lists
+    the phases that were skipped. callback is called with the
+    name and the time of each phase when the phase ends.
+    """
+
+    def __init__(self, callback=None):
+        self.times = OrderedDict()
+        self.counts = OrderedDict()
+        self.skipped = []
+        self.callback = callback
+        self._phase = None
+        self._phaseStart = None
+        self._callCounts = None
+
+    def startPhase(self, name):
+        """
+        Start a phase. The current phase, if any, is ended.
+        The times of a phase that runs more than once are added.
+        """
+        self.stopPhase()
+        self._phase = name
+        self._phaseStart = time.time()
+
+    def stopPhase(self):
+        if self._phase is None:
+            return
+        name = self._phase
+        seconds = time.time() - self._phaseStart
+        self._phase = None
+        self.times[name] = self.times.get(name, 0) + seconds
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def skipPhase(self, name):
+        """
+        Note that a phase was skipped or not finished.
+        """
+        if name not in self.skipped:
+            self.skipped.append(name)
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def countTable(self, table):
+        """
+        Count the lookups, subtables and rules in a table.
+        """
+        from feaTools2.objects import Lookup
+        lookups = list(table.lookups)
+        for feature in table:
+            for script in feature.scripts:
+                for language in script.languages:
+                    lookups += [lookup for lookup in language.lookups if isinstance(lookup, Lookup)]
+        self.count("lookups", len(lookups))
+        subtables = [subtable for lookup in lookups for subtable in lookup.subtables]
+        self.count("subtables", len(subtables))
+        self.count("rules", sum([len(subtable.target) for subtable in subtables]))
+
+    def countCompression(self, table):
+        self.count("globalLookups", len(table.lookups))
+        self.count("classes", len(table.classes) + sum([len(feature.classes) for feature in table]))
+
+    # method calls
+
+    def startCounting(self):
+        self._callCounts = dict(_callCounts)
+        _install()
+
+    def stopCounting(self):
+        if self._callCounts is None:
+            return
+        _uninstall()
+        for name, value in sorted(_callCounts.items()):
+            self.count(name, value - self._callCounts[name])
+        self._callCounts = None
+
+    # output
+
+    def report(self):
+        lines = []
+        total = sum(self.times.values())
+        for name, seconds in self.times.items():
+            percent = 0
+            if total:
+                percent = 100.0 * seconds / total
+            lines.append("%-20s %9.3fs %5.1f%%" % (name, seconds, percent))
+        lines.append("%-20s %9.3fs" % ("total", total))
+        for name, value in self.counts.items():
+            lines.append("%-20s %10d" % (name, value))
+        for name in self.skipped:
+            lines.append("%-20s %10s" % (name, "skipped"))
+        return "\n".join(lines)
+
+
+# --------------
+# Counting Calls
+# --------------
+
+_callCounts = {"__eq__" : 0, "__hash__" : 0}
+_installLock = threading.Lock()
+_installCount = 0
+_originalMethods = []
+
+def _countingMethod(method, name):
+    def countingMethod(*args):
+        _callCounts[name] += 1
+        return method(*args)
+    return countingMethod
+
+def _install():
+    global _installCount
+    from feaTools2.objects import Lookup, LookupReference, LookupFlag, GSUBSubtable
+    _installLock.acquire()
+    try:
+        _installCount += 1
+        if _installCount > 1:
+            return
+        for cls in (Lookup, LookupReference, LookupFlag, GSUBSubtable):
+            for name in ("__eq__", "__hash__"):
+                method = cls.__dict__[name]
+                _originalMethods.append((cls, name, method))
+                setattr(cls, name, _countingMethod(method, name))
+    finally:
+        _installLock.release()
+
+def _uninstall():
+    global _installCount
+    _installLock.acquire()
+    try:
+        _installCount -= 1
+        if _installCount:
+            return
+        while _originalMethods:
+            cls, name, method = _originalMethods.pop()
+            setattr(cls, name, method)
+    finally:
+        _installLock.release()
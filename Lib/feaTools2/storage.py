@@ -0,0 +1,493 @@
+"""
+A compact binary file format for Tables objects.
+
+The file starts with a header and a directory of named
+sections. Glyph, class, lookup and tag names are stored once
+in the "strings" section. Classes, subtables and lookups are
+stored once in the "groups", "subtables" and "lookups" pools
+and are referenced by index. Each table has a section with its
+classes and global lookups and each feature has a section of
+its own, so single features can be loaded without reading the
+other features. All numbers in the pools and the table and
+feature sections are unsigned varints.
+
+The pools have an offset for every entry so that an entry can
+be read without reading the entries before it. This means that
+a memory mapped file only has the parts that are used read
+from disk.
+"""
+
+import mmap
+import struct
+from feaTools2 import FeaToolsError
+from feaTools2.objects import Tables, Table, Feature, Script, Language, Lookup,\
+    LookupReference, LookupFlag, GSUBSubtable, Sequence, Class, ClassReference
+
+
+fileFormatVersion = 1
+
+_magic = "FTTB"
+_headerFormat = ">4sHH"
+_headerSize = struct.calcsize(_headerFormat)
+_directoryEntryFormat = ">16sII"
+_directoryEntrySize = struct.calcsize(_directoryEntryFormat)
+
+# markAttachmentType codes. Anything
+# higher is a string index plus 3.
+_markAttachmentTypeCodes = {False: 0, True: 1, None: 2}
+_markAttachmentTypeValues = {0: False, 1: True, 2: None}
+
+
+# ---------
+# Functions
+# ---------
+
+def saveTables(tables, stream):
+    _save([tables["GSUB"], tables["GPOS"]], stream)
+
+def loadTables(stream, tables=None, features=None):
+    """
+    features may be a list of feature tags
+    that should be loaded. All of the classes
+    and global lookups are always loaded.
+    """
+    if tables is None:
+        tables = Tables()
+    reader = _Reader(stream)
+    try:
+        for tag in ("GSUB", "GPOS"):
+            if reader.hasSection(tag):
+                reader.readTable(tables[tag], tag, features)
+    finally:
+        reader.close()
+    return tables
+
+def saveTable(table, stream):
+    _save([table], stream)
+
+def loadTable(stream, table=None, features=None):
+    if table is None:
+        table = Table()
+    reader = _Reader(stream)
+    try:
+        tag = table.tag
+        if tag is None:
+            tags = reader.getTableTags()
+            if len(tags) != 1:
+                raise FeaToolsError, "The table tag must be set to load a table from a file with %d tables." % len(tags)
+            tag = tags[0]
+        if not reader.hasSection(tag):
+            raise FeaToolsError, "The file does not contain a %s table." % tag
+        reader.readTable(table, tag, features)
+    finally:
+        reader.close()
+    return table
+
+def _save(tables, stream):
+    writer = _Writer()
+    for table in tables:
+        writer.writeTable(table)
+    stream.write(writer.compile())
+
+
+# -------
+# Varints
+# -------
+
+def _encodeVarints(values):
+    data = bytearray()
+    append = data.append
+    for value in values:
+        while value > 127:
+            append((value & 127) | 128)
+            value >>= 7
+        append(value)
+    return str(data)
+
+def _decodeVarints(data):
+    values = []
+    append = values.append
+    value = shift = 0
+    for byte in bytearray(data):
+        if byte < 128:
+            append(value | (byte << shift))
+            value = shift = 0
+        else:
+            value |= (byte & 127) << shift
+            shift += 7
+    return values
+
+
+# ------
+# Pools
+# ------
+
+class _Pool(object):
+
+    def __init__(self):
+        self.items = []
+        self._indexes = {}
+
+    def add(self, key, data):
+        index = self._indexes.get(key)
+        if index is None:
+            index = len(self.items)
+            self.items.append(data)
+            self._indexes[key] = index
+        return index
+
+    def compile(self):
+        offsets = [0]
+        for data in self.items:
+            offsets.append(offsets[-1] + len(data))
+        header = struct.pack(">I%dI" % len(offsets), len(self.items), *offsets)
+        return header + "".join(self.items)
+
+
+# -------
+# Writing
+# -------
+
+class _Writer(object):
+
+    def __init__(self):
+        self.strings = _Pool()
+        self.groups = _Pool()
+        self.subtables = _Pool()
+        self.lookups = _Pool()
+        self.sections = []
+
+    def compile(self):
+        sections = [
+            ("strings", self.strings.compile()),
+            ("groups", self.groups.compile()),
+            ("subtables", self.subtables.compile()),
+            ("lookups", self.lookups.compile())
+        ] + self.sections
+        header = [struct.pack(_headerFormat, _magic, fileFormatVersion, len(sections))]
+        offset = _headerSize + _directoryEntrySize * len(sections)
+        for name, data in sections:
+            header.append(struct.pack(_directoryEntryFormat, name, offset, len(data)))
+            offset += len(data)
+        return "".join(header + [data for name, data in sections])
+
+    def addSection(self, name, values):
+        if len(name) > 16:
+            raise FeaToolsError, "Section name %s is too long." % name
+        self.sections.append((name, _encodeVarints(values)))
+
+    def packString(self, string):
+        if isinstance(string, unicode):
+            string = string.encode("utf-8")
+        return self.strings.add(string, string)
+
+    def packOptionalString(self, string):
+        if string is None:
+            return 0
+        return self.packString(string) + 1
+
+    def writeTable(self, table):
+        if table.tag is None:
+            raise FeaToolsError, "Tables without a tag can't be saved."
+        values = [int(table._compressed)]
+        self.packClasses(table.classes, values)
+        values.append(len(table.lookups))
+        for lookup in table.lookups:
+            values.append(self.packLookup(lookup))
+        values.append(len(table))
+        for index, feature in enumerate(table):
+            values.append(self.packOptionalString(feature.tag))
+            self.writeFeature(feature, "%s.%d" % (table.tag, index))
+        self.addSection(table.tag, values)
+
+    def writeFeature(self, feature, sectionName):
+        values = []
+        self.packClasses(feature.classes, values)
+        values.append(len(feature.scripts))
+        for script in feature.scripts:
+            values.append(self.packOptionalString(script.tag))
+            values.append(len(script.languages))
+            for language in script.languages:
+                values.append(self.packOptionalString(language.tag))
+                values.append(int(language.includeDefault))
+                values.append(len(language.lookups))
+                for lookup in language.lookups:
+                    if isinstance(lookup, LookupReference):
+                        values.append(self.packString(lookup.name) * 2 + 1)
+                    else:
+                        values.append(self.packLookup(lookup) * 2)
+        self.addSection(sectionName, values)
+
+    def packClasses(self, classes, values):
+        values.append(len(classes))
+        for name, members in sorted(classes.items()):
+            values.append(self.packString(name))
+            values.append(self.packClass(members))
+
+    def packLookup(self, lookup):
+        # lookups are pooled by content like the subtables.
+        # each feature loads its own lookup objects so that
+        # changing a lookup doesn't change other features.
+        flag = lookup.flag
+        bits = 0
+        for bit, value in enumerate((flag.rightToLeft, flag.ignoreBaseGlyphs, flag.ignoreLigatures, flag.ignoreMarks)):
+            if value:
+                bits |= 1 << bit
+        markAttachmentType = flag.markAttachmentType
+        if markAttachmentType is None or isinstance(markAttachmentType, bool):
+            markAttachmentType = _markAttachmentTypeCodes[markAttachmentType]
+        elif isinstance(markAttachmentType, basestring):
+            markAttachmentType = self.packString(markAttachmentType) + 3
+        else:
+            raise FeaToolsError, "Unsupported markAttachmentType %r." % markAttachmentType
+        values = [self.packOptionalString(lookup.name), bits, markAttachmentType, len(lookup.subtables)]
+        for subtable in lookup.subtables:
+            values.append(self.packSubtable(subtable))
+        data = _encodeVarints(values)
+        return self.lookups.add(data, data)
+
+    def packSubtable(self, subtable):
+        if subtable.type is None:
+            values = [0]
+        else:
+            values = [subtable.type + 1]
+        self.packSequence(subtable.backtrack, values)
+        self.packSequence(subtable.lookahead, values)
+        for sequences in (subtable.target, subtable.substitution):
+            values.append(len(sequences))
+            for sequence in sequences:
+                self.packSequence(sequence, values)
+        # files written before this was stored end here
+        values.append(int(subtable._manipulationResultedInEmptySubstitution))
+        data = _encodeVarints(values)
+        return self.subtables.add(data, data)
+
+    def packSequence(self, sequence, values):
+        values.append(len(sequence))
+        for group in sequence:
+            values.append(self.packClass(group))
+
+    def packClass(self, group):
+        values = [len(group)]
+        for member in group:
+            if isinstance(member, ClassReference):
+                values.append(self.packString(member.name) * 2 + 1)
+            else:
+                values.append(self.packString(member) * 2)
+        data = _encodeVarints(values)
+        return self.groups.add(data, data)
+
+
+# -------
+# Reading
+# -------
+
+class _Reader(object):
+
+    def __init__(self, stream):
+        self._map = None
+        try:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._map
+        except (AttributeError, IOError, EnvironmentError, ValueError):
+            self.data = stream.read()
+        if len(self.data) < _headerSize:
+            raise FeaToolsError, "The file is too short."
+        magic, version, sectionCount = struct.unpack(_headerFormat, self.data[:_headerSize])
+        if magic != _magic:
+            raise FeaToolsError, "The file is not a feaTools2 tables file."
+        if version != fileFormatVersion:
+            raise FeaToolsError, "Unsupported file format version %d." % version
+        self.sections = {}
+        self.sectionOrder = []
+        for index in range(sectionCount):
+            start = _headerSize + index * _directoryEntrySize
+            name, offset, length = struct.unpack(_directoryEntryFormat, self.data[start:start + _directoryEntrySize])
+            name = name.rstrip("\0")
+            self.sections[name] = (offset, length)
+            self.sectionOrder.append(name)
+        # the strings are small and almost all of
+        # them are needed so they are read at once
+        self.strings = [self.getPoolItem("strings", index) for index in range(self.getPoolLength("strings"))]
+        self._groups = {}
+        self._subtables = {}
+        self._lookups = {}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def hasSection(self, name):
+        return name in self.sections
+
+    def getTableTags(self):
+        return [name for name in self.sectionOrder if name in ("GSUB", "GPOS")]
+
+    def getSection(self, name):
+        offset, length = self.sections[name]
+        return self.data[offset:offset + length]
+
+    def getPoolLength(self, name):
+        offset, length = self.sections[name]
+        return struct.unpack(">I", self.data[offset:offset + 4])[0]
+
+    def getPoolItem(self, name, index):
+        offset, length = self.sections[name]
+        count = struct.unpack(">I", self.data[offset:offset + 4])[0]
+        if index >= count:
+            raise FeaToolsError, "Invalid %s index %d." % (name, index)
+        position = offset + 4 + index * 4
+        start, end = struct.unpack(">II", self.data[position:position + 8])
+        dataStart = offset + 4 + (count + 1) * 4
+        return self.data[dataStart + start:dataStart + end]
+
+    def getOptionalString(self, value):
+        if value == 0:
+            return None
+        return self.strings[value - 1]
+
+    # tables
+
+    def readTable(self, table, tag, features=None):
+        values = _decodeVarints(self.getSection(tag))
+        table.tag = tag
+        position = 1
+        position = self.readClasses(table.classes, values, position)
+        count = values[position]
+        position += 1
+        self._lookups = {}
+        for index in values[position:position + count]:
+            table.lookups.append(self.readLookup(index))
+        position += count
+        count = values[position]
+        position += 1
+        for index in range(count):
+            featureTag = self.getOptionalString(values[position + index])
+            if features is not None and featureTag not in features:
+                continue
+            feature = self.readFeature("%s.%d" % (tag, index))
+            feature.tag = featureTag
+            table.append(feature)
+        table._compressed = bool(values[0])
+        if table._compressed:
+            table._clearDirty()
+
+    def readFeature(self, sectionName):
+        values = _decodeVarints(self.getSection(sectionName))
+        # lookup identity is only shared within a feature
+        self._lookups = {}
+        feature = Feature()
+        position = self.readClasses(feature.classes, values, 0)
+        scriptCount = values[position]
+        position += 1
+        for scriptIndex in range(scriptCount):
+            script = Script()
+            script.tag = self.getOptionalString(values[position])
+            languageCount = values[position + 1]
+            position += 2
+            for languageIndex in range(languageCount):
+                language = Language()
+                language.tag = self.getOptionalString(values[position])
+                language.includeDefault = bool(values[position + 1])
+                lookupCount = values[position + 2]
+                position += 3
+                for value in values[position:position + lookupCount]:
+                    if value & 1:
+                        lookup = LookupReference()
+                        lookup.name = self.strings[value >> 1]
+                    else:
+                        lookup = self.readLookup(value >> 1)
+                    language.lookups.append(lookup)
+                position += lookupCount
+                script.languages.append(language)
+            feature.scripts.append(script)
+        return feature
+
+    def readClasses(self, classes, values, position):
+        count = values[position]
+        position += 1
+        for index in range(count):
+            name = self.strings[values[position]]
+            classes[name] = self.readClass(values[position + 1])
+            position += 2
+        return position
+
+    # pools
+
+    def readLookup(self, index):
+        lookup = self._lookups.get(index)
+        if lookup is not None:
+            return lookup
+        values = _decodeVarints(self.getPoolItem("lookups", index))
+        lookup = Lookup()
+        lookup.name = self.getOptionalString(values[0])
+        bits = values[1]
+        flag = LookupFlag()
+        flag.rightToLeft = bool(bits & 1)
+        flag.ignoreBaseGlyphs = bool(bits & 2)
+        flag.ignoreLigatures = bool(bits & 4)
+        flag.ignoreMarks = bool(bits & 8)
+        markAttachmentType = values[2]
+        if markAttachmentType in _markAttachmentTypeValues:
+            flag.markAttachmentType = _markAttachmentTypeValues[markAttachmentType]
+        else:
+            flag.markAttachmentType = self.strings[markAttachmentType - 3]
+        lookup.flag = flag
+        for subtableIndex in values[4:4 + values[3]]:
+            lookup.subtables.append(self.readSubtable(subtableIndex))
+        self._lookups[index] = lookup
+        return lookup
+
+    def readSubtable(self, index):
+        # the decoded values are cached but every
+        # subtable gets objects of its own
+        values = self._subtables.get(index)
+        if values is None:
+            values = _decodeVarints(self.getPoolItem("subtables", index))
+            self._subtables[index] = values
+        subtable = GSUBSubtable()
+        if values[0]:
+            subtable.type = values[0] - 1
+        subtable.backtrack, position = self.readSequence(values, 1)
+        subtable.lookahead, position = self.readSequence(values, position)
+        for attribute in ("target", "substitution"):
+            count = values[position]
+            position += 1
+            sequences = []
+            for sequenceIndex in range(count):
+                sequence, position = self.readSequence(values, position)
+                sequences.append(sequence)
+            setattr(subtable, attribute, sequences)
+        if position < len(values):
+            subtable._manipulationResultedInEmptySubstitution = bool(values[position])
+        return subtable
+
+    def readSequence(self, values, position):
+        count = values[position]
+        position += 1
+        sequence = Sequence([self.readClass(index) for index in values[position:position + count]])
+        return sequence, position + count
+
+    def readClass(self, index):
+        members = self._groups.get(index)
+        if members is None:
+            values = _decodeVarints(self.getPoolItem("groups", index))
+            strings = self.strings
+            members = []
+            for value in values[1:]:
+                if value & 1:
+                    member = ClassReference()
+                    member.name = strings[value >> 1]
+                else:
+                    member = strings[value >> 1]
+                members.append(member)
+            self._groups[index] = members
+        group = Class()
+        for member in members:
+            if isinstance(member, ClassReference):
+                reference = ClassReference()
+                reference.name = member.name
+                member = reference
+            group.append(member)
+        return group
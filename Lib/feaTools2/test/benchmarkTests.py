@@ -0,0 +1,30 @@
+from feaTools2.benchmark.generator import makeFeatureText
+from feaTools2.benchmark.runner import runBenchmark, stageNames
+
+def testGenerator():
+    """
+    >>> text = makeFeatureText(glyphCount=50, lookupCount=3, contextualRuleCount=5, classSize=4, rulesPerLookup=5)
+    >>> text == makeFeatureText(glyphCount=50, lookupCount=3, contextualRuleCount=5, classSize=4, rulesPerLookup=5)
+    True
+    >>> text == makeFeatureText(glyphCount=50, lookupCount=3, contextualRuleCount=5, classSize=4, rulesPerLookup=5, seed=1)
+    False
+    >>> [line for line in text.splitlines() if line.startswith("lookup ")]
+    ['lookup single0 {', 'lookup ligature1 {', 'lookup contextual2 {']
+    >>> len([line for line in text.splitlines() if "' lookup " in line])
+    5
+    """
+
+def testBenchmark():
+    """
+    >>> results = runBenchmark(size="small", repeat=2)
+    >>> sorted(results["stages"]) == sorted(stageNames)
+    True
+    >>> len(results["stages"]["parseTable"]["times"])
+    2
+    >>> results["table"]["lookups"]
+    6
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
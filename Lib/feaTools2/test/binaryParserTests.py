@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+from fontTools.ttLib import TTFont
+from feaTools2 import decompileBinaryToObject
+from feaTools2.benchmark.generator import makeFont
+from feaTools2.parsers.binaryParser import parseLookupsInProcesses
+from feaTools2.writers.dumpWriter import DumpWriter
+
+def dumpTable(table):
+    writer = DumpWriter()
+    table.write(writer)
+    return writer.dump()
+
+def testParseLookupsInProcesses():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> path = os.path.join(directory, "a.otf")
+    >>> makeFont(glyphCount=50, lookupCount=6, scriptCount=2, languageCount=2, contextualRuleCount=5, classSize=4, rulesPerLookup=5).save(path)
+    >>> font = TTFont(path)
+    >>> parsedLookups = parseLookupsInProcesses(path, font["GSUB"].table, "GSUB", 2)
+    >>> sorted(parsedLookups.keys())
+    [0, 1, 2, 3, 4, 5]
+    >>> font.close()
+
+    The tables are the same as tables parsed in this process.
+
+    >>> for compress in (False, True):
+    ...     expected = dumpTable(decompileBinaryToObject(path, compress=compress)["GSUB"])
+    ...     print dumpTable(decompileBinaryToObject(path, compress=compress, processes=2)["GSUB"]) == expected
+    True
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
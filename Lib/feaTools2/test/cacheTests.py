@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from feaTools2 import decompileBinaryToObject
+from feaTools2.cache import DiskCache, MemoryCache
+from feaTools2.benchmark.generator import makeFont
+from feaTools2.writers.dumpWriter import DumpWriter
+
+def dumpTables(tables):
+    writer = DumpWriter()
+    tables["GSUB"].write(writer)
+    return writer.dump()
+
+def testDiskCache():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = DiskCache(directory)
+    >>> font = makeFont("small")
+    >>> tables = decompileBinaryToObject(font)
+    >>> key = cache.makeKey(font, compress=True, excludeFeatures=None)
+    >>> print cache.get(key)
+    None
+    >>> cache.set(key, tables)
+    >>> dumpTables(cache.get(key)) == dumpTables(tables)
+    True
+
+    The options are part of the key.
+
+    >>> cache.makeKey(font, compress=False, excludeFeatures=None) == key
+    False
+    >>> cache.makeKey(font, excludeFeatures=["ss02", "ss01"], compress=True) == cache.makeKey(font, compress=True, excludeFeatures=("ss01", "ss02"))
+    True
+
+    A truncated or corrupt entry is removed and counts as a miss.
+
+    >>> path = cache._getPath(key)
+    >>> data = open(path, "rb").read()
+    >>> f = open(path, "wb")
+    >>> f.write(data[:len(data) // 2])
+    >>> f.close()
+    >>> print cache.get(key)
+    None
+    >>> os.path.exists(path)
+    False
+
+    The least recently used entries are removed when
+    the entries are larger than maxSize.
+
+    >>> cache.set("a", tables)
+    >>> os.utime(cache._getPath("a"), (1, 1))
+    >>> cache.maxSize = os.path.getsize(cache._getPath("a")) + 1
+    >>> cache.set("b", tables)
+    >>> sorted(os.listdir(directory))
+    ['b.tables']
+    >>> cache.clear()
+    >>> os.listdir(directory)
+    []
+    >>> shutil.rmtree(directory)
+    """
+
+def testMemoryCache():
+    """
+    >>> cache = MemoryCache(maxEntries=2, maxBytes=10)
+    >>> cache.set("a", "aaaa")
+    >>> cache.set("b", "bbbb")
+    >>> cache.get("a")
+    'aaaa'
+    >>> cache.set("c", "cccc")
+    >>> print cache.get("b")
+    None
+    >>> cache.set("d", "dddddddd")
+    >>> sorted(cache._entries.keys())
+    ['d']
+    >>> cache.set("e", "e" * 11)
+    >>> sorted(cache.getStats().items())
+    [('bytes', 8), ('entries', 1), ('evictions', 3), ('hits', 1), ('misses', 1)]
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -877,3 +877,51 @@ LanguageSystem: DFLT None
                         target: [[[E] [F]]]
                         substitution: [[[G]]]
 """.strip()
+
+# ------
+# Tables
+# ------
+
+def makeTable(singles=(), ligatures=(), features=("smcp", "c2sc"), globalLookup=None, className="@lc", lookupName=None, singleLookups=None, table=None):
+    """
+    Make a small GSUB table for the tests.
+
+    The singles are (target, substitution) pairs and the
+    ligatures are (components, ligature) pairs. Each feature
+    gets a lookup with the singles and the ligatures. When a
+    globalLookup name is given, the singles go into a global
+    lookup that uses a class of the targets instead and the
+    features reference it. "%(tag)s" in a substitution is
+    replaced by the feature tag. singleLookups maps feature
+    tags to (targets, substitutions) rules and each rule gets
+    a lookup of its own in that feature.
+    """
+    from feaTools2.objects import Table
+    if table is None:
+        table = Table()
+        table.tag = "GSUB"
+    if globalLookup is not None:
+        table.addClassDefinition(className, [glyphName for glyphName, replacement in singles])
+        lookup = table.addLookup(globalLookup)
+        lookup.addGSUBSubtable(target=[[[className]]], substitution=[[[replacement for glyphName, replacement in singles]]], type=1)
+    for tag in features:
+        feature = table.addFeature(tag)
+        feature.addScript("DFLT")
+        feature.addLanguage(None)
+        if globalLookup is not None:
+            feature.addLookupReference(globalLookup)
+        if singleLookups is not None:
+            for target, substitution in singleLookups.get(tag, ()):
+                lookup = feature.addLookup(None)
+                lookup.addGSUBSubtable(target=[[target]], substitution=[[substitution]], type=1)
+        if (singles and globalLookup is None) or ligatures:
+            lookup = feature.addLookup(lookupName)
+        if singles and globalLookup is None:
+            glyphs = [glyphName for glyphName, replacement in singles]
+            replacements = [replacement.replace("%(tag)s", tag) for glyphName, replacement in singles]
+            lookup.addGSUBSubtable(target=[[glyphs]], substitution=[[replacements]], type=1)
+        if ligatures:
+            target = [[[glyphName] for glyphName in components] for components, ligature in ligatures]
+            substitution = [[[ligature]] for components, ligature in ligatures]
+            lookup.addGSUBSubtable(target=target, substitution=substitution, type=4)
+    return table
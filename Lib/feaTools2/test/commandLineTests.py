@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+from feaTools2.benchmark.generator import makeFont
+from feaTools2.commandLine import main, findFonts
+
+def testCommandLine():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> os.mkdir(os.path.join(directory, "fonts"))
+    >>> font = makeFont(glyphCount=50, lookupCount=3, scriptCount=1, languageCount=2, contextualRuleCount=5, classSize=4, rulesPerLookup=5)
+    >>> font.save(os.path.join(directory, "fonts", "a.otf"))
+    >>> font.save(os.path.join(directory, "fonts", "b.ttf"))
+    >>> open(os.path.join(directory, "fonts", "notes.txt"), "w").close()
+    >>> fonts = findFonts([os.path.join(directory, "fonts"), os.path.join(directory, "fonts", "*.otf")])
+    >>> [relativePath for path, relativePath in fonts]
+    ['a.otf', 'b.ttf']
+    >>> output = os.path.join(directory, "output")
+    >>> main([os.path.join(directory, "fonts"), "-o", output, "-q", "--check", "hash", "--jobs", "2"])
+    0
+    >>> sorted(os.listdir(output))
+    ['.featools2', 'a.fea', 'b.fea']
+    >>> open(os.path.join(output, "a.fea")).readline().strip()
+    'languagesystem DFLT dflt;'
+    >>> os.remove(os.path.join(output, "b.fea"))
+    >>> main([os.path.join(directory, "fonts"), "-o", output, "-q", "--check", "hash"])
+    0
+    >>> sorted(os.listdir(output))
+    ['.featools2', 'a.fea', 'b.fea']
+    >>> main([os.path.join(directory, "fonts", "a.otf"), "-o", output, "-q", "--format", "dump", "--scripts", "latn"])
+    0
+    >>> "Script: DFLT" in open(os.path.join(output, "a.dump")).read()
+    False
+
+    Outputs that are newer than the fonts are made again
+    when the options change.
+
+    >>> main([os.path.join(directory, "fonts", "a.otf"), "-o", output, "-q", "--format", "dump"])
+    0
+    >>> "Script: DFLT" in open(os.path.join(output, "a.dump")).read()
+    True
+    >>> shutil.rmtree(directory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
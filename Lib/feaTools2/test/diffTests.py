@@ -0,0 +1,67 @@
+from feaTools2.test import cases
+
+def makeTable(singles, ligatures, className="@lc"):
+    return cases.makeTable(singles, ligatures, features=["liga"], globalLookup="singles", className=className)
+
+def testDiff():
+    """
+    >>> table1 = makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i"), (("f", "l"), "f_l")])
+    >>> table2 = makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i"), (("f", "l"), "f_l")], className="@renamed")
+    >>> bool(table1.diff(table2))
+    False
+    >>> table2 = makeTable([("a", "A"), ("b", "B.sc")], [(("f", "i"), "f_i"), (("f", "f"), "f_f")])
+    >>> print table1.diff(table2).dump()
+    ~ feature liga
+      ~ language DFLT None
+        ~ lookup singles -> singles
+          ~ type 1: b -> B
+            type 1: b -> B.sc
+        ~ lookup None -> None
+          + type 4: f f -> f_f
+          - type 4: f l -> f_l
+
+    Tables with the same digests are still compared.
+
+    >>> table2 = makeTable([("a", "A"), ("b", "B.sc")], [(("f", "i"), "f_i"), (("f", "l"), "f_l")])
+    >>> table2.lookups[0].subtables[0]._digest = table1.lookups[0].subtables[0].digest()
+    >>> table2.lookups[0]._digest = table1.lookups[0].digest()
+    >>> table2[0]._digest = table1[0].digest()
+    >>> table2._digest = table1.digest()
+    >>> print table1.diff(table2).dump()
+    ~ feature liga
+      ~ language DFLT None
+        ~ lookup singles -> singles
+          ~ type 1: b -> B
+            type 1: b -> B.sc
+    """
+
+def addClassFeature(table, members):
+    feature = table.addFeature("smcp")
+    feature.addClassDefinition("@lc", members)
+    feature.addScript("DFLT")
+    feature.addLanguage(None)
+    feature.addLookupReference("singles")
+
+def testFeatureClasses():
+    """
+    A lookup that is referenced by features with
+    different classes is resolved for each of them.
+
+    >>> table1 = makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i")])
+    >>> addClassFeature(table1, ["a"])
+    >>> table2 = makeTable([("a", "A"), ("b", "B")], [(("f", "l"), "f_l")])
+    >>> addClassFeature(table2, ["b"])
+    >>> print table1.diff(table2).dump()
+    ~ feature liga
+      ~ language DFLT None
+        + lookup None
+        - lookup None
+    ~ feature smcp
+      ~ language DFLT None
+        + lookup singles
+        - lookup singles
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
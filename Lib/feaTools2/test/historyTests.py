@@ -0,0 +1,50 @@
+from feaTools2.history import TableHistory
+from feaTools2.test import cases
+
+def makeTable():
+    table = cases.makeTable([("a", "A.%(tag)s")])
+    table.compress()
+    return table
+
+def testHistory():
+    """
+    >>> history = TableHistory(makeTable())
+    >>> first = history.table
+    >>> subtable = first[0].scripts[0].languages[0].lookups[0].subtables[0]
+    >>> second = history.setSequences(subtable, substitution=[[["A.sc"]]])
+    >>> second[0].scripts[0].languages[0].lookups[0].subtables[0].substitution
+    [[['A.sc']]]
+    >>> subtable.substitution
+    [[['A.smcp']]]
+    >>> second[1] is first[1]
+    True
+    >>> second[0].scripts[0].languages[0].lookups[0].flag is first[0].scripts[0].languages[0].lookups[0].flag
+    True
+    >>> history.undo() is first
+    True
+    >>> history.canUndo(), history.canRedo()
+    (False, True)
+    >>> history.redo() is second
+    True
+    >>> language = second[1].scripts[0].languages[0]
+    >>> third = history.setLookups(language, [])
+    >>> third[1].scripts[0].languages[0].lookups
+    []
+    >>> third[0] is second[0]
+    True
+    >>> table = history.table.thaw()
+    >>> table.cleanup()
+    >>> fourth = history.commit(table)
+    >>> [feature.tag for feature in fourth]
+    ['smcp']
+    >>> history.undo() is third
+    True
+    >>> history.setScripts(first[0], [])
+    Traceback (most recent call last):
+        ...
+    FeaToolsError: The Feature is not in the current version.
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
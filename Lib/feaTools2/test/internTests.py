@@ -0,0 +1,74 @@
+from feaTools2.interning import InternPool
+from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+from feaTools2.test import cases
+
+def makeTable():
+    table = cases.makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i"), (("f", "l"), "f_l")], features=["liga"], globalLookup="singles", lookupName="ligatures")
+    table.compress()
+    return table
+
+def writeTable(table):
+    writer = FeaSyntaxWriter()
+    table.write(writer)
+    return writer.write()
+
+def testInternPool():
+    """
+    >>> pool = InternPool()
+    >>> table1 = makeTable()
+    >>> table2 = makeTable()
+    >>> pool.internTable(table1)
+    >>> pool.internTable(table2)
+    >>> table1.lookups[0] is table2.lookups[0]
+    True
+    >>> table1.classes["@lc"] is table2.classes["@lc"]
+    True
+    >>> text = writeTable(table2)
+    >>> table1.removeGlyphs(["l"])
+    >>> table1.compress()
+    >>> writeTable(table2) == text
+    True
+    >>> table1.lookups[0] is table2.lookups[0]
+    True
+
+    A shared object that is changed directly is replaced
+    with a private copy in the table that it was taken from.
+
+    >>> table1.lookups[0].subtables[0].target[0][0].append("c")
+    >>> table1.lookups[0].subtables[0].target[0][0][-1]
+    'c'
+    >>> table1.lookups[0] is table2.lookups[0]
+    False
+    >>> writeTable(table2) == text
+    True
+
+    Later changes to the same object go to the same copy.
+
+    >>> members = table1.classes["@lc"]
+    >>> members.removeGlyphs(["a"])
+    >>> members.append("x")
+    >>> table1.classes["@lc"], table2.classes["@lc"]
+    (['b', 'x'], ['a', 'b'])
+    >>> table1.unshare()
+    >>> table1.lookups[0].flag.rightToLeft = True
+    >>> writeTable(table2) == text
+    True
+
+    Objects that only have the same digest are not shared.
+
+    >>> pool = InternPool()
+    >>> table1 = makeTable()
+    >>> table2 = makeTable()
+    >>> table2.classes["@lc"].append("c")
+    >>> table2.classes["@lc"]._digest = table1.classes["@lc"].digest()
+    >>> pool.internTable(table1)
+    >>> pool.internTable(table2)
+    >>> table1.classes["@lc"] is table2.classes["@lc"]
+    False
+    >>> table2.classes["@lc"]
+    ['a', 'b', 'c']
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
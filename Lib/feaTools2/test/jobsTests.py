@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+from feaTools2 import decompileBinaryToObject, decompileBinaryToFeaSyntax
+from feaTools2.objects import Table
+from feaTools2.benchmark.generator import makeFont
+from feaTools2.jobs import submitDecompile, submitCompress, submitWrite, JobCancelled
+
+def testJobs():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> path = os.path.join(directory, "a.otf")
+    >>> makeFont(glyphCount=50, lookupCount=4, scriptCount=1, languageCount=2, contextualRuleCount=5, classSize=4, rulesPerLookup=5).save(path)
+    >>> expected = decompileBinaryToFeaSyntax(path)
+    >>> for executor in ("thread", "process"):
+    ...     tables = submitDecompile(path, executor=executor).result()
+    ...     chunks = list(submitWrite(tables["GSUB"], chunkSize=100, executor=executor).iterChunks())
+    ...     print executor, len(chunks) > 1, "".join(chunks) == expected
+    thread True True
+    process True True
+    >>> table = decompileBinaryToObject(path, compress=False)["GSUB"]
+    >>> submitCompress(table, executor="process").result() is table
+    False
+    >>> ended = []
+    >>> called = threading.Event()
+    >>> def doneCallback(job):
+    ...     ended.append(job)
+    ...     called.set()
+    >>> job = submitCompress(table)
+    >>> job.addDoneCallback(doneCallback)
+    >>> job.result() is table, table._compressed
+    (True, True)
+    >>> called.wait(10)
+    True
+    >>> ended == [job]
+    True
+
+    A job stops at the next checkpoint after it is cancelled.
+
+    >>> chunks = []
+    >>> submitted = threading.Event()
+    >>> def chunkCallback(chunk):
+    ...     chunks.append(chunk)
+    ...     submitted.wait()
+    ...     job.cancel()
+    >>> job = submitWrite(table, chunkSize=10, chunkCallback=chunkCallback)
+    >>> submitted.set()
+    >>> job.wait()
+    True
+    >>> len(chunks), job.cancelled()
+    (1, True)
+    >>> job.result()
+    Traceback (most recent call last):
+        ...
+    JobCancelled: The job was cancelled.
+    >>> job.cancel()
+    False
+    >>> shutil.rmtree(directory)
+    """
+
+def testManipulatedSubtables():
+    """
+    A contextual subtable that loses its substitution is removed
+    by cleanup instead of becoming an ignore rule, in both kinds
+    of job.
+
+    >>> for executor in ("thread", "process"):
+    ...     table = Table()
+    ...     table.tag = "GSUB"
+    ...     feature = table.addFeature("calt")
+    ...     feature.addScript("DFLT")
+    ...     feature.addLanguage(None)
+    ...     lookup = feature.addLookup(None)
+    ...     lookup.addGSUBSubtable(target=[[["a"]]], substitution=[[["x"]]], type=6, backtrack=[["b"]])
+    ...     lookup.addGSUBSubtable(target=[[["c"]]], substitution=[[["y"]]], type=6, backtrack=[["b"]])
+    ...     table.removeGlyphs(["x"])
+    ...     table = submitCompress(table, executor=executor).result()
+    ...     table.cleanup()
+    ...     print executor, len(table[0].scripts[0].languages[0].lookups[0].subtables)
+    thread 1
+    process 1
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,31 @@
+from feaTools2.interning import InternPool
+from feaTools2.test.cases import makeTable
+
+def testMemoryReport():
+    """
+    >>> table = makeTable([("a", "A"), ("b", "B")])
+    >>> report = table.memoryReport()
+    >>> report.types["Class"][0], report.types["Sequence"][0], report.types["LookupFlag"][0]
+    (4, 8, 2)
+    >>> [tag for tag, size in report.features]
+    ['smcp', 'c2sc']
+    >>> [name for name, size in report.lookups]
+    ['smcp/DFLT/dflt/0', 'c2sc/DFLT/dflt/0']
+    >>> report.total > sum([size for tag, size in report.features])
+    True
+    >>> [(name, count) for name, (count, size) in report.duplicates.items()]
+    [('classes', 2), ('sequences', 5), ('subtables', 1), ('glyph names', 0)]
+    >>> report.glyphNameReferences
+    8
+    >>> table.compress()
+    >>> InternPool().internTable(table)
+    >>> report = table.memoryReport()
+    >>> [(name, count) for name, (count, size) in report.duplicates.items()]
+    [('classes', 0), ('sequences', 0), ('subtables', 0), ('glyph names', 0)]
+    >>> report.dump().splitlines()[0] == "Total: %d bytes" % report.total
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
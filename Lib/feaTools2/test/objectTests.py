@@ -0,0 +1,436 @@
+import re
+from feaTools2.objects import Table, Lookup
+from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+from feaTools2.stats import DecompileStats
+from feaTools2.test.cases import makeTable
+
+def makeLigatureSubtable(ligatures):
+    lookup = Lookup()
+    target = [[[glyphName] for glyphName in components] for components, ligature in ligatures]
+    substitution = [[[ligature]] for components, ligature in ligatures]
+    lookup.addGSUBSubtable(target=target, substitution=substitution, type=4)
+    return lookup.subtables[0]
+
+# --------------
+# Ligature Tries
+# --------------
+
+def testLigatureTrie():
+    """
+    >>> subtable = makeLigatureSubtable([
+    ...     (("f", "f", "i"), "f_f_i"),
+    ...     (("f", "f"), "f_f"),
+    ...     (("f", "i"), "f_i"),
+    ...     (("f", "i"), "f_i.alt"),
+    ...     (("t", "t"), "t_t")
+    ... ])
+    >>> trie = subtable.getLigatureTrie()
+    >>> len(trie)
+    4
+    >>> trie.duplicates
+    [3]
+    >>> trie.get(("f", "i"))
+    'f_i'
+    >>> ("f", "t") in trie
+    False
+    >>> trie.longestMatch(["a", "f", "f", "i", "x"], 1)
+    (('f', 'f', 'i'), 'f_f_i')
+    >>> trie.longestMatch(["f", "f", "x"])
+    (('f', 'f'), 'f_f')
+    >>> trie.longestMatch(["x"]) is None
+    True
+    >>> trie.getLigaturesWithPrefix(["f", "f"])
+    [(('f', 'f', 'i'), 'f_f_i'), (('f', 'f'), 'f_f')]
+
+    A change in a class of the subtable makes a new trie.
+
+    >>> subtable.target[4][1][0] = "t.alt"
+    >>> subtable.getLigatureTrie() is trie
+    False
+    >>> subtable.getLigatureTrie().get(("t", "t.alt"))
+    't_t'
+    """
+
+def testPruneLigatures():
+    """
+    >>> subtable = makeLigatureSubtable([
+    ...     (("f", "f", "i"), "f_f_i"),
+    ...     (("f", "i"), "f_i"),
+    ...     (("t", "t"), "t_t")
+    ... ])
+    >>> subtable.pruneLigatures(["i", "x"])
+    2
+    >>> subtable.target
+    [[['t'], ['t']]]
+    >>> subtable.substitution
+    [[['t_t']]]
+    >>> list(subtable.getLigatureTrie())
+    [(('t', 't'), 't_t')]
+    """
+
+# -------
+# Cleanup
+# -------
+
+def testCleanup():
+    """
+    >>> table = Table()
+    >>> table.addClassDefinition("@X", ["a", "b"])
+    >>> table.addClassDefinition("@Y", ["c"])
+    >>> table.addClassDefinition("@Unused", ["d"])
+    >>> lookup = table.addLookup("Global")
+    >>> lookup.addGSUBSubtable(target=[[["@X"]]], substitution=[[["x"]]], type=6, backtrack=[["@Y"]])
+    >>> feature = table.addFeature("TST1")
+    >>> feature.addScript("DFLT")
+    >>> feature.addLanguage(None)
+    >>> feature.addLookupReference("Global")
+    >>> lookup = feature.addLookup("TST1_1")
+    >>> lookup.addGSUBSubtable(target=[[["a"]]], substitution=[[["b"]]], type=1)
+    >>> feature.addLookupReference("TST1_1")
+    >>> feature = table.addFeature("TST2")
+    >>> feature.addScript("DFLT")
+    >>> feature.addLanguage(None)
+    >>> lookup = feature.addLookup(None)
+    >>> lookup.addGSUBSubtable(target=[[["c"]]], substitution=[[["d"]]], type=1)
+    >>> table.removeGlyphs(["a", "b"])
+    >>> table.cleanup()
+    >>> sorted(table.classes.keys())
+    ['@Unused']
+    >>> table.lookups
+    []
+    >>> [feature.tag for feature in table]
+    ['TST2']
+    """
+
+# ------------
+# Lookup Graph
+# ------------
+
+def testLookupGraph():
+    """
+    >>> table = Table()
+    >>> lookup = table.addLookup("Used")
+    >>> lookup.addGSUBSubtable(target=[[["a"]]], substitution=[[["b"]]], type=1)
+    >>> lookup = table.addLookup("Unused")
+    >>> lookup.addGSUBSubtable(target=[[["c"]]], substitution=[[["d"]]], type=1)
+    >>> feature = table.addFeature("TST1")
+    >>> feature.addScript("DFLT")
+    >>> feature.addLanguage(None)
+    >>> feature.addLookupReference("Used")
+    >>> lookup = feature.addLookup("TST1_1")
+    >>> lookup.addGSUBSubtable(target=[[["e"]]], substitution=[[["f"]]], type=1)
+    >>> feature.addScript("latn")
+    >>> feature.addLanguage("TRK ")
+    >>> feature.addLookupReference("TST1_1")
+    >>> feature.addLookupReference("Missing")
+    >>> graph = table.getLookupGraph()
+    >>> graph.getReferencesFrom("TST1")
+    ['Used', 'TST1_1', 'Missing']
+    >>> graph.getReferencesTo("TST1_1")
+    [('TST1', 'latn', 'TRK ')]
+    >>> graph.getUnusedLookups()
+    ['Unused']
+    >>> graph.getDanglingReferences()
+    ['Missing']
+    >>> sorted(graph.getStats().items())
+    [('danglingReferences', 1), ('featureLookups', 1), ('globalLookups', 2), ('reachableGlobalLookups', 1), ('references', 3), ('unusedLookups', 1)]
+    >>> table.pruneUnreachable()
+    ['Unused']
+    >>> [lookup.name for lookup in table.lookups]
+    ['Used']
+    >>> table.getLookupGraph().getReferencesFrom("TST1")
+    ['Used', 'TST1_1']
+    """
+
+# -----------------------
+# Incremental Compression
+# -----------------------
+
+def findUndefinedLookups(table):
+    writer = FeaSyntaxWriter()
+    table.write(writer)
+    undefined = []
+    defined = set()
+    for name, block in re.findall(r"lookup (\S+)( \{|;)", writer.write()):
+        if block:
+            defined.add(name)
+        elif name not in defined:
+            undefined.append(name)
+    return undefined
+
+def testIncrementalCompression():
+    """
+    >>> table = makeTable(features=["ss01", "ss02"], singleLookups={
+    ...     "ss01": [(["a", "b"], ["A", "B"]), (["c"], ["C"])],
+    ...     "ss02": [(["a", "b"], ["A", "B"]), (["d", "e"], ["D", "E"])],
+    ... })
+    >>> table.compress()
+    >>> [lookup.name for lookup in table.lookups]
+    ['ss02_ss01_1']
+    >>> sorted(table[1].classes.keys())
+    ['@ss02_1', '@ss02_2']
+    >>> language = table[1].scripts[0].languages[0]
+    >>> [lookup.name for lookup in language.lookups]
+    ['ss02_ss01_1', 'ss02_1']
+
+    Change one feature. Only that feature is compressed again
+    and the names that were already there are kept.
+
+    >>> lookup = table[1].addLookup(None)
+    >>> lookup.addGSUBSubtable(target=[[["f", "g"]]], substitution=[[["F", "G"]]], type=1)
+    >>> table.compress()
+    >>> [lookup.name for lookup in language.lookups]
+    ['ss02_ss01_1', 'ss02_1', 'ss02_2']
+    >>> sorted(table[1].classes.keys())
+    ['@ss02_1', '@ss02_2', '@ss02_3', '@ss02_4']
+    >>> table[1]._isDirty()
+    False
+    """
+
+def testCompressInProcesses():
+    """
+    >>> lookups = {
+    ...     "ss01": [(["a", "b"], ["A", "B"]), (["c"], ["C"])],
+    ...     "ss02": [(["a", "b"], ["A", "B"]), (["d", "e"], ["D", "E"])],
+    ...     "ss03": [(["d", "e"], ["D", "E"]), (["a", "b"], ["A", "B"])],
+    ... }
+    >>> table1 = makeTable(features=["ss01", "ss02", "ss03"], singleLookups=lookups)
+    >>> table1.compress()
+    >>> table2 = makeTable(features=["ss01", "ss02", "ss03"], singleLookups=lookups)
+    >>> table2.compress(processes=2)
+    >>> [lookup.name for lookup in table2.lookups]
+    ['ss02_ss03_1', 'ss02_ss03_ss01_1']
+    >>> table1.digest() == table2.digest()
+    True
+    >>> [sorted(feature.classes.keys()) for feature in table1] == [sorted(feature.classes.keys()) for feature in table2]
+    True
+    >>> table2[2]._isDirty()
+    False
+    """
+
+def testCompressionBudget():
+    """
+    >>> lookups = {
+    ...     "ss01": [(["a", "b"], ["A", "B"]), (["c"], ["C"])],
+    ...     "ss02": [(["a", "b"], ["A", "B"]), (["d", "e"], ["D", "E"])],
+    ...     "ss03": [(["d", "e"], ["D", "E"]), (["a", "b"], ["A", "B"])],
+    ... }
+    >>> table = makeTable(features=["ss01", "ss02", "ss03"], singleLookups=lookups)
+    >>> table.compress(timeBudget=60, maxCandidates=3)
+    []
+    >>> [lookup.name for lookup in table.lookups]
+    ['ss02_ss03_1', 'ss02_ss03_ss01_1']
+
+    When the budget runs out the table is left partially
+    compressed. The lookups are still named.
+
+    >>> stats = DecompileStats()
+    >>> table = makeTable(features=["ss01", "ss02", "ss03"], singleLookups=lookups)
+    >>> table.compress(stats=stats, maxCandidates=2)
+    ['globalLookups', 'featureLookups', 'defaultLookups', 'classes']
+    >>> stats.skipped
+    ['globalLookups', 'featureLookups', 'defaultLookups', 'classes']
+    >>> table.lookups
+    []
+    >>> [lookup.name for lookup in table[0]._findLookups()]
+    ['ss01_1', 'ss01_2']
+    >>> table._compressed
+    True
+
+    The features that weren't finished are compressed by
+    the next call, also after the table has been edited.
+
+    >>> [feature._isDirty() for feature in table]
+    [True, True, True]
+    >>> table[1].markDirty()
+    >>> table.compress()
+    >>> [lookup.name for lookup in table.lookups]
+    ['ss02_ss03_1', 'ss02_ss03_ss01_1']
+    >>> [feature._isDirty() for feature in table]
+    [False, False, False]
+    >>> findUndefinedLookups(table)
+    []
+    """
+
+def testDigest():
+    """
+    >>> table1 = makeTable([("a", "A"), ("b", "B")], features=["smcp"])
+    >>> table2 = makeTable([("a", "A"), ("b", "B")], features=["smcp"])
+    >>> table1.digest() == table2.digest()
+    True
+    >>> lookup1 = table1[0].scripts[0].languages[0].lookups[0]
+    >>> lookup2 = table2[0].scripts[0].languages[0].lookups[0]
+    >>> lookup2.name = "renamed"
+    >>> lookup1 == lookup2
+    True
+    >>> lookup2.subtables[0].substitution[0][0].append("C")
+    >>> lookup1 == lookup2
+    False
+    >>> table1.digest() == table2.digest()
+    False
+    >>> lookup2.subtables[0].substitution[0][0].remove("C")
+    >>> lookup2.name = None
+    >>> table1.digest() == table2.digest()
+    True
+    >>> table2[0].scripts[0].languages[0].includeDefault = False
+    >>> table1.digest() == table2.digest()
+    False
+
+    The content is compared when the digests are the same.
+
+    >>> lookup2.subtables[0].substitution[0][0].append("C")
+    >>> lookup2.subtables[0]._digest = lookup1.subtables[0].digest()
+    >>> lookup2._digest = lookup1.digest()
+    >>> lookup1 == lookup2
+    False
+    >>> lookup1.subtables[0] == lookup2.subtables[0]
+    False
+    """
+
+# ----------------
+# Frozen Snapshots
+# ----------------
+
+def testFreeze():
+    """
+    >>> from feaTools2.writers.dumpWriter import DumpWriter
+    >>> def dump(table):
+    ...     writer = DumpWriter()
+    ...     table.write(writer)
+    ...     return writer.dump()
+    >>> table = makeTable([("a", "A"), ("b", "B")])
+    >>> table.compress()
+    >>> frozen = table.freeze()
+    >>> dump(frozen) == dump(table)
+    True
+    >>> frozen.digest() == table.digest()
+    True
+    >>> table.removeGlyphs(["a"])
+    >>> dump(frozen) == dump(table)
+    False
+    >>> frozen.lookups[0].subtables[0].target[0][0].append("c")
+    Traceback (most recent call last):
+        ...
+    FeaToolsError: Shared Class objects can't be changed. Use Table.unshare to make private copies.
+    >>> thawed = frozen.thaw()
+    >>> thawed.lookups[0] is frozen.lookups[0]
+    True
+    >>> thawed.removeGlyphs(["a"])
+    >>> thawed.compress()
+    >>> dump(thawed) == dump(table)
+    True
+    >>> thawed.lookups[0] is frozen.lookups[0]
+    False
+    >>> frozen.digest() == frozen.thaw().digest()
+    True
+    """
+
+# -------------------
+# Copying and Subsets
+# -------------------
+
+def testSubset():
+    """
+    >>> table = Table()
+    >>> table.tag = "GSUB"
+    >>> table.addClassDefinition("@lc", ["a", "b", "c"])
+    >>> lookup = table.addLookup("singles")
+    >>> lookup.addGSUBSubtable(target=[[["a", "b", "c"]]], substitution=[[["A", "B", "C"]]], type=1)
+    >>> for tag, ligature in (("smcp", "f_i"), ("c2sc", "f_l")):
+    ...     feature = table.addFeature(tag)
+    ...     feature.addScript("DFLT")
+    ...     feature.addLanguage(None)
+    ...     feature.addLookupReference("singles")
+    ...     lookup = feature.addLookup(None)
+    ...     lookup.addGSUBSubtable(target=[[["f"], [ligature[-1]]]], substitution=[[[ligature]]], type=4)
+    ...     lookup.addGSUBSubtable(target=[[["@lc"]]], substitution=[[["x"]]], type=6, backtrack=[["x"]])
+    >>> table.compress()
+    >>> singles = table.lookups[0]
+    >>> copy = table.copy()
+    >>> copy.lookups[0] is singles
+    False
+    >>> copy.lookups[0].subtables[0] is singles.subtables[0]
+    True
+    >>> subset = table.subset(glyphs=["a", "c", "A", "C", "f", "i", "f_i", "x"], features=["smcp"])
+    >>> [feature.tag for feature in subset]
+    ['smcp']
+    >>> subtable = subset.lookups[0].subtables[0]
+    >>> subtable.target, subtable.substitution
+    ([[['a', 'c']]], [[['A', 'C']]])
+    >>> table.lookups[0].subtables[0].target
+    [[['a', 'b', 'c']]]
+    >>> lookup = subset[0].scripts[0].languages[0].lookups[1]
+    >>> lookup.subtables[0] is table[0].scripts[0].languages[0].lookups[1].subtables[0]
+    True
+    >>> lookup.subtables[1].target
+    [[['a', 'c']]]
+    >>> sorted(subset.classes.keys())
+    []
+
+    The lookups of the DFLT script are inherited by the
+    default languages of the other scripts.
+
+    >>> feature = table[0]
+    >>> feature.addScript("latn")
+    >>> feature.addLanguage(None)
+    >>> feature.addLanguage("TRK")
+    >>> feature.addLookupReference("singles")
+    >>> subset = table.subset(scripts=["latn"])
+    >>> [(script.tag, language.tag, len(language.lookups)) for script in subset[0].scripts for language in script.languages]
+    [('latn', None, 2), ('latn', 'TRK', 1)]
+    >>> [lookup.__class__.__name__ for lookup in subset[0].scripts[0].languages[0].lookups]
+    ['LookupReference', 'Lookup']
+
+    The lookups of the table can still be changed. The objects
+    in them are shared with the copies, so they are replaced
+    with private copies when they change.
+
+    >>> singles.addGSUBSubtable(target=[[["d"]]], substitution=[[["D"]]], type=1)
+    >>> len(singles.subtables), len(copy.lookups[0].subtables)
+    (2, 1)
+    >>> singles.subtables[0].target[0][0].append("d")
+    >>> table.lookups[0].subtables[0].target
+    [[['a', 'b', 'c', 'd']]]
+    >>> copy.lookups[0].subtables[0].target
+    [[['a', 'b', 'c']]]
+    """
+
+# ---------
+# Observers
+# ---------
+
+def testObservers():
+    """
+    >>> table = makeTable([("a", "A"), ("b", "B")], features=["smcp"])
+    >>> table.compress()
+    >>> reported = []
+    >>> table.addObserver(reported.append)
+    >>> lookup = table[0].scripts[0].languages[0].lookups[0]
+    >>> lookup.addLookupFlag(ignoreMarks=True)
+    >>> lookup.flag.rightToLeft = True
+    >>> reported
+    [[<ChangeEvent Lookup flag>], [<ChangeEvent LookupFlag rightToLeft>]]
+    >>> [node.__class__.__name__ for node in reported[-1][0].path]
+    ['Table', 'Feature', 'Script', 'Language', 'Lookup', 'LookupFlag']
+    >>> del reported[:]
+    >>> with table.transaction():
+    ...     lookup.subtables[0].target[0][0].append("c")
+    ...     lookup.subtables[0].substitution[0][0].append("C")
+    ...     lookup.subtables.append(lookup.subtables[0]._copy())
+    ...     del lookup.subtables[-1]
+    >>> reported
+    [[<ChangeEvent Class None>, <ChangeEvent Class None>, <ChangeEvent Lookup subtables>]]
+    >>> del reported[:]
+    >>> table.renameGlyphs({"c" : "d"})
+    >>> reported[0][-1].glyphMapping
+    {'c': 'd'}
+    >>> table.removeObserver(reported.append)
+    >>> del reported[:]
+    >>> lookup.flag.rightToLeft = False
+    >>> reported
+    []
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
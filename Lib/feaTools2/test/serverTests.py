@@ -0,0 +1,96 @@
+import os
+import json
+import shutil
+import urllib
+import urllib2
+import tempfile
+import threading
+from feaTools2.benchmark.generator import makeFont
+from feaTools2.server import FeaToolsServer, FontStore
+
+def makeTestFont(path, lookupCount):
+    font = makeFont(glyphCount=50, lookupCount=lookupCount, scriptCount=1, languageCount=2, contextualRuleCount=5, classSize=4, rulesPerLookup=5)
+    font.save(path)
+
+def query(server, request, data=None, headers={}, **parameters):
+    url = server.getURL() + "/" + request + "?" + urllib.urlencode(parameters)
+    try:
+        response = urllib2.urlopen(urllib2.Request(url, data, headers))
+    except urllib2.HTTPError, error:
+        return error.code, json.loads(error.read())
+    text = response.read()
+    if response.info().gettype() == "application/json":
+        return response.code, json.loads(text)
+    return response.code, text
+
+def testServer():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> path = os.path.join(directory, "a.otf")
+    >>> makeTestFont(path, 4)
+    >>> server = FeaToolsServer(("127.0.0.1", 0), FontStore(maxFonts=2), interval=0)
+    >>> thread = threading.Thread(target=server.serve_forever)
+    >>> thread.start()
+    >>> status, text = query(server, "fea", font=path, feature="ss01")
+    >>> status, text.splitlines()[0]
+    (200, 'languagesystem DFLT dflt;')
+    >>> query(server, "lookups", font=path)
+    (200, [u'ss01_1', u'ss01_2', u'ss01_3', u'ss01_4'])
+    >>> status, text = query(server, "lookup", font=path, index=1)
+    >>> text.splitlines()[0]
+    'Lookup: ss01_2'
+    >>> query(server, "glyph", font=path, glyph="g00012")
+    (200, [u'ss01_1', u'ss01_2'])
+    >>> query(server, "lookup", font=path, name="missing")
+    (400, {u'error': u'There is no lookup named missing.'})
+    >>> query(server, "fea", font=path, feature="liga")
+    (400, {u'error': u'There is no liga feature.'})
+    >>> query(server, "unknown")
+    (404, {u'error': u'Unknown request /unknown.'})
+
+    A font is decompiled again when it changes.
+
+    >>> makeTestFont(path, 2)
+    >>> query(server, "lookups", font=path)
+    (200, [u'ss01_1', u'ss01_2', u'ss01_3'])
+    >>> status, result = query(server, "status")
+    >>> result["loads"], len(result["fonts"])
+    (2, 1)
+
+    The server only answers requests for its own address and
+    it is only stopped by a POST request from no other origin.
+
+    >>> query(server, "status", headers={"Host": "example.com"})
+    (403, {u'error': u'The host example.com is not allowed.'})
+    >>> status, result = query(server, "status", headers={"Host": "localhost:%d" % server.server_address[1]})
+    >>> status
+    200
+    >>> query(server, "shutdown")
+    (405, {u'error': u'/shutdown needs a POST request.'})
+    >>> query(server, "shutdown", data="", headers={"Origin": "http://example.com"})
+    (403, {u'error': u'Requests from http://example.com are not allowed.'})
+    >>> query(server, "shutdown", data="")
+    (200, {u'stopping': True})
+    >>> thread.join()
+    >>> server.server_close()
+    >>> shutil.rmtree(directory)
+    """
+
+def testFontStore():
+    """
+    >>> directory = tempfile.mkdtemp()
+    >>> path = os.path.join(directory, "a.otf")
+    >>> makeTestFont(path, 2)
+    >>> store = FontStore(maxFonts=1)
+    >>> store.get(path) is store.get(path)
+    True
+    >>> os.remove(path)
+    >>> store.refresh()
+    >>> len(store)
+    0
+    >>> shutil.rmtree(directory)
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,44 @@
+from feaTools2.shaper import CompiledTable, shapeCorpus, diffCorpus
+from feaTools2.test import cases
+
+def makeTable(ligatures):
+    table = cases.makeTable(ligatures=ligatures, features=["liga"])
+    return cases.makeTable([("a", "A"), ("b", "B")], features=["smcp"], table=table)
+
+def testCompiledTable():
+    """
+    >>> table = makeTable([(("f", "f", "i"), "f_f_i"), (("f", "i"), "f_i")])
+    >>> compiled = CompiledTable(table)
+    >>> compiled.apply(["a", "f", "f", "i", "b"])
+    ('A', 'f_f_i', 'B')
+    >>> compiled.apply(["f", "i", "f"])
+    ('f_i', 'f')
+    >>> compiled = CompiledTable(table, features=["smcp"])
+    >>> compiled.apply(["f", "i", "a"])
+    ('f', 'i', 'A')
+    """
+
+def testShapeCorpus():
+    """
+    >>> table = makeTable([(("f", "i"), "f_i")])
+    >>> result = shapeCorpus(table, [["f", "i"], ["a"], ["f", "i"]])
+    >>> sorted(result.items())
+    [(('a',), ('A',)), (('f', 'i'), ('f_i',))]
+    """
+
+def testDiffCorpus():
+    """
+    >>> table1 = makeTable([(("f", "f", "i"), "f_f_i"), (("f", "i"), "f_i")])
+    >>> table2 = makeTable([(("f", "i"), "f_i")])
+    >>> corpus = [["f", "f", "i"], ["f", "i"], ["a", "f", "f", "i"]] * 10
+    >>> for run, output1, output2 in diffCorpus(table1, table2, corpus):
+    ...     print run, output1, output2
+    ('f', 'f', 'i') ('f_f_i',) ('f', 'f_i')
+    ('a', 'f', 'f', 'i') ('A', 'f_f_i') ('A', 'f', 'f_i')
+    >>> diffCorpus(table1, table2, corpus, processes=2, chunkSize=1) == diffCorpus(table1, table2, corpus)
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,32 @@
+from feaTools2.objects import Lookup
+from feaTools2.stats import DecompileStats
+from feaTools2.test.cases import makeTable
+
+def testStats():
+    """
+    >>> phases = []
+    >>> stats = DecompileStats(callback=lambda name, seconds: phases.append(name))
+    >>> table = makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i"), (("f", "l"), "f_l")])
+    >>> stats.countTable(table)
+    >>> method = Lookup.__dict__["__hash__"]
+    >>> stats.startCounting()
+    >>> Lookup.__dict__["__hash__"] is method
+    False
+    >>> table.compress(stats=stats)
+    >>> stats.stopCounting()
+    >>> Lookup.__dict__["__hash__"] is method
+    True
+    >>> stats.countCompression(table)
+    >>> phases
+    ['_compressLookups', '_compressClasses']
+    >>> list(stats.times.keys()) == phases
+    True
+    >>> [(name, stats.counts[name]) for name in ("lookups", "subtables", "rules", "globalLookups")]
+    [('lookups', 2), ('subtables', 4), ('rules', 6), ('globalLookups', 1)]
+    >>> stats.counts["__hash__"] > 0
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,66 @@
+from StringIO import StringIO
+from feaTools2.objects import Tables, Table
+from feaTools2.writers.dumpWriter import DumpWriter
+from feaTools2.test.cases import makeTable
+
+def makeTables():
+    tables = Tables()
+    table = makeTable([("a", "A"), ("b", "B")], [(("f", "i"), "f_i")], globalLookup="shared", table=tables["GSUB"])
+    table.lookups[0].addLookupFlag(ignoreMarks=True)
+    return tables
+
+def dump(table):
+    writer = DumpWriter()
+    table.write(writer)
+    return writer.dump()
+
+def testSaveLoad():
+    """
+    >>> tables = makeTables()
+    >>> stream = StringIO()
+    >>> tables.save(stream)
+    >>> loaded = Tables()
+    >>> loaded.load(StringIO(stream.getvalue()))
+    >>> dump(loaded["GSUB"]) == dump(tables["GSUB"])
+    True
+
+    Lookups with the same content are only stored once but
+    each feature loads lookups of its own.
+
+    >>> features = loaded["GSUB"]
+    >>> lookup1 = features[0].scripts[0].languages[0].lookups[1]
+    >>> lookup2 = features[1].scripts[0].languages[0].lookups[1]
+    >>> lookup1 == lookup2
+    True
+    >>> lookup1 is lookup2
+    False
+    >>> lookup1.addGSUBSubtable(target=[[["x"]]], substitution=[[["X"]]], type=1)
+    >>> len(lookup2.subtables)
+    1
+
+    >>> table = Table()
+    >>> table.load(StringIO(stream.getvalue()), features=["c2sc"])
+    Traceback (most recent call last):
+        ...
+    FeaToolsError: The table tag must be set to load a table from a file with 2 tables.
+    >>> table.tag = "GSUB"
+    >>> table.load(StringIO(stream.getvalue()), features=["c2sc"])
+    >>> [feature.tag for feature in table]
+    ['c2sc']
+    >>> [lookup.name for lookup in table.lookups]
+    ['shared']
+
+    Subtables remember that their substitution was removed.
+
+    >>> tables["GSUB"].removeGlyphs(["f_i"])
+    >>> stream = StringIO()
+    >>> tables.save(stream)
+    >>> loaded = Tables()
+    >>> loaded.load(StringIO(stream.getvalue()))
+    >>> loaded["GSUB"][0].scripts[0].languages[0].lookups[1].subtables[0]._manipulationResultedInEmptySubstitution
+    True
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
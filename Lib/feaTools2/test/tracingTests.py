@@ -0,0 +1,41 @@
+from feaTools2 import decompileBinaryToObject
+from feaTools2.objects import Feature
+from feaTools2.writers.dumpWriter import DumpWriter
+from feaTools2.tracing import Tracer
+from feaTools2.benchmark.generator import makeFont
+
+def testTracer():
+    """
+    >>> font = makeFont("small")
+    >>> method = Feature.__dict__["write"]
+    >>> tracer = Tracer()
+    >>> tracer.start()
+    >>> Feature.__dict__["write"] is method
+    False
+    >>> Tracer().start()
+    Traceback (most recent call last):
+        ...
+    FeaToolsError: Another tracer is running.
+    >>> table = decompileBinaryToObject(font)["GSUB"]
+    >>> writer = DumpWriter()
+    >>> table.write(writer)
+    >>> text = writer.dump()
+    >>> tracer.stop()
+    >>> Feature.__dict__["write"] is method
+    True
+    >>> names = set([event["name"].split(" ")[0] for event in tracer.events])
+    >>> sorted([name for name in names if name.startswith("parse")])
+    ['parseFeature', 'parseGSUBLookupType1', 'parseGSUBLookupType4', 'parseGSUBLookupType6', 'parseLookup', 'parseTable']
+    >>> sorted([event["name"] for event in tracer.events if event["name"].startswith("writeFeature")])
+    ['writeFeature ss01', 'writeFeature ss02']
+    >>> sorted([event["name"] for event in tracer.events if event["name"].startswith("compressLookups")])
+    ['compressLookups ss01', 'compressLookups ss02']
+    >>> [event["args"]["characters"] for event in tracer.events if event["name"] == "DumpWriter.dump"] == [len(text)]
+    True
+    >>> sorted(tracer.getChromeTrace()["traceEvents"][0].keys())
+    ['args', 'cat', 'dur', 'name', 'ph', 'pid', 'tid', 'ts']
+    """
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,223 @@
+"""
+Trace the parsing, compression and writing of tables.
+
+    tracer = Tracer()
+    tracer.start()
+    tables = decompileBinaryToObject(path)
+    text = decompileBinaryToFeaSyntax(path)
+    tracer.stop()
+    tracer.save("trace.json")
+
+The file is in the Chrome trace event format. It can be opened
+in about:tracing, chrome://tracing, Perfetto or speedscope.
+There are spans for parsing each feature, lookup and subtable,
+for compressing the lookups of each feature and for writing
+each feature and lookup, annotated with the feature tag, the
+lookup index and the number of rules.
+
+While a tracer is running the traced functions and methods are
+replaced with versions that record spans. Nothing is replaced
+when no tracer is running. Only one tracer can run at a time
+and calls in all threads are recorded.
+"""
+
+import json
+import time
+import thread
+import threading
+from feaTools2 import FeaToolsError
+
+
+class Tracer(object):
+
+    def __init__(self):
+        self.events = []
+        self._startTime = None
+        self._lookupIndexes = {}
+
+    def start(self):
+        if self._startTime is None:
+            self._startTime = time.time()
+        _install(self)
+
+    def stop(self):
+        _uninstall(self)
+        self._lookupIndexes = {}
+
+    # output
+
+    def getChromeTrace(self):
+        """
+        Get the trace as a dict that can be written as JSON.
+        """
+        return dict(traceEvents=list(self.events), displayTimeUnit="ms")
+
+    def save(self, path):
+        f = open(path, "w")
+        try:
+            json.dump(self.getChromeTrace(), f)
+        finally:
+            f.close()
+
+    # spans
+
+    def addSpan(self, name, category, start, end, args=None):
+        """
+        Add a span. start and end are time.time() values.
+        """
+        event = dict(
+            name=name,
+            cat=category,
+            ph="X",
+            ts=(start - self._startTime) * 1000000,
+            dur=(end - start) * 1000000,
+            pid=1,
+            tid=thread.get_ident()
+        )
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def _getLookupIndex(self, table, lookupRecord):
+        # the lookup records are not numbered
+        # so the indexes are found once per table
+        key = id(table)
+        if key not in self._lookupIndexes:
+            indexes = dict([(id(record), index) for index, record in enumerate(table.LookupList.Lookup)])
+            self._lookupIndexes[key] = (table, indexes)
+        return self._lookupIndexes[key][1].get(id(lookupRecord))
+
+
+# -----------
+# Annotations
+# -----------
+
+# Each function gets the tracer, the arguments and the
+# result of a call and returns the name and the arguments
+# of the span.
+
+def _annotateParseTable(tracer, args, result):
+    return "parseTable %s" % args[2], dict(lookups=len(args[1].LookupList.Lookup))
+
+def _annotateParseFeature(tracer, args, result):
+    tag = getattr(args[0], "tag", None)
+    return "parseFeature %s" % tag, dict(feature=tag, languages=len(args[3]))
+
+def _annotateParseLookup(tracer, args, result):
+    writer, table, tableTag, lookupRecord = args
+    index = tracer._getLookupIndex(table, lookupRecord)
+    info = dict(lookup=index, type=lookupRecord.LookupType, subtables=len(lookupRecord.SubTable))
+    return "parseLookup %s" % index, info
+
+def _annotateParseSubtable(tracer, args, result):
+    writer = args[0]
+    subtable = args[-1]
+    info = dict(format=getattr(subtable, "Format", None))
+    subtables = getattr(writer, "subtables", None)
+    if subtables:
+        info["rules"] = len(subtables[-1].target)
+    return None, info
+
+def _annotateTableMethod(tracer, args, result):
+    return None, dict(features=len(args[0]), globalLookups=len(args[0].lookups))
+
+def _annotateFeatureCompression(tracer, args, result):
+    feature = args[0]
+    return "compressLookups %s" % feature.tag, dict(feature=feature.tag)
+
+def _annotateFeatureWrite(tracer, args, result):
+    feature, writer = args
+    return "writeFeature %s" % feature.tag, dict(feature=feature.tag, writer=writer.__class__.__name__)
+
+def _annotateLookupWrite(tracer, args, result):
+    lookup, writer = args
+    info = dict(
+        lookup=lookup.name,
+        writer=writer.__class__.__name__,
+        subtables=len(lookup.subtables),
+        rules=sum([len(subtable.target) for subtable in lookup.subtables])
+    )
+    return "writeLookup %s" % lookup.name, info
+
+def _annotateOutput(tracer, args, result):
+    return None, dict(characters=len(result))
+
+
+def _getTracedFunctions():
+    from feaTools2.parsers import binaryParser
+    from feaTools2.objects import Table, Feature, Lookup
+    from feaTools2.writers.feaSyntaxWriter import FeaSyntaxWriter
+    from feaTools2.writers.dumpWriter import DumpWriter
+    traced = [
+        (binaryParser, "parseTable", "parse", _annotateParseTable),
+        (binaryParser, "parseFeature", "parse", _annotateParseFeature),
+        (binaryParser, "parseLookup", "parse", _annotateParseLookup),
+        (Table, "_compressLookups", "compress", _annotateTableMethod),
+        (Table, "_compressClasses", "compress", _annotateTableMethod),
+        (Table, "_recompress", "compress", _annotateTableMethod),
+        (Feature, "_compressLookups", "compress", _annotateFeatureCompression),
+        (Table, "write", "write", _annotateTableMethod),
+        (Feature, "write", "write", _annotateFeatureWrite),
+        (Lookup, "write", "write", _annotateLookupWrite),
+        (FeaSyntaxWriter, "write", "write", _annotateOutput),
+        (DumpWriter, "dump", "write", _annotateOutput)
+    ]
+    for name in sorted(dir(binaryParser)):
+        if name.startswith("parseGSUBLookupType"):
+            traced.append((binaryParser, name, "parse", _annotateParseSubtable))
+    return traced
+
+
+# ----------
+# Installing
+# ----------
+
+_installLock = threading.Lock()
+_activeTracer = None
+_originals = []
+
+def _makeTracingFunction(tracer, function, name, category, annotate):
+    def tracingFunction(*args, **kwargs):
+        start = time.time()
+        result = function(*args, **kwargs)
+        end = time.time()
+        spanName, info = annotate(tracer, args, result)
+        if spanName is None:
+            spanName = name
+        tracer.addSpan(spanName, category, start, end, info)
+        return result
+    return tracingFunction
+
+def _install(tracer):
+    global _activeTracer
+    _installLock.acquire()
+    try:
+        if _activeTracer is tracer:
+            return
+        if _activeTracer is not None:
+            raise FeaToolsError, "Another tracer is running."
+        for owner, name, category, annotate in _getTracedFunctions():
+            if isinstance(owner, type):
+                function = owner.__dict__[name]
+                displayName = "%s.%s" % (owner.__name__, name)
+            else:
+                function = getattr(owner, name)
+                displayName = name
+            _originals.append((owner, name, function))
+            setattr(owner, name, _makeTracingFunction(tracer, function, displayName, category, annotate))
+        _activeTracer = tracer
+    finally:
+        _installLock.release()
+
+def _uninstall(tracer):
+    global _activeTracer
+    _installLock.acquire()
+    try:
+        if _activeTracer is not tracer:
+            return
+        while _originals:
+            owner, name, function = _originals.pop()
+            setattr(owner, name, function)
+        _activeTracer = None
+    finally:
+        _installLock.release()
@@ -49,6 +49,38 @@ class FeaSyntaxWriter(AbstractWriter):
         text += self._handleFinalBreak()
         return text
 
+    def iterWrite(self, chunkSize=65536):
+        """
+        Get the text of write in chunks of at least
+        chunkSize characters. The last chunk may be
+        shorter. The whole text is never joined.
+        """
+        if self._filter:
+            self._preWrite()
+        chunk = []
+        size = 0
+        separator = ""
+        for line in self._iterLines():
+            chunk.append(separator + line)
+            size += len(line) + len(separator)
+            separator = "\n"
+            if size >= chunkSize:
+                yield "".join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield "".join(chunk)
+
+    def _iterLines(self):
+        for item in self._text:
+            if isinstance(item, self.__class__):
+                for line in item._iterLines():
+                    yield line
+            else:
+                yield item
+        for line in self._handleFinalBreak():
+            yield line
+
     def _preWrite(self):
         # filter
         self._filterContent()
@@ -13,6 +13,13 @@ setup(name = "feaTools2",
               "feaTools2",
               "feaTools2.writers",
               "feaTools2.parsers",
+              "feaTools2.benchmark",
       ],
       package_dir = {"":"Lib"},
+      entry_points = {
+              "console_scripts": [
+                      "featools2 = feaTools2.commandLine:main",
+                      "featools2-server = feaTools2.server:main",
+              ],
+      },
 )